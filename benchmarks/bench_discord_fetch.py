@@ -0,0 +1,82 @@
+"""
+Compares cold and warm fetch latency of the two Node 1 backends:
+  - client: discord.py (import, login, fetch_channel, history, close)
+  - rest:   direct REST calls over a pooled keep-alive session
+
+Runs against a local stand-in of the Discord API (with configurable latency)
+so it works offline. Each backend runs in a fresh interpreter so the cold
+numbers include importing its dependencies.
+
+Usage:
+    python -m benchmarks.bench_discord_fetch [--fetches 10] [--messages 50] [--latency-ms 30]
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+import subprocess
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(PROJECT_ROOT)
+
+from benchmarks.fake_discord_api import FakeDiscordAPI, make_messages, CHANNEL_ID
+
+def run_child(backend: str, url: str, fetches: int) -> None:
+    """Measures one backend inside this (fresh) process and prints JSON timings."""
+    os.environ.update({"DISCORD_TOKEN": "benchmark", "DISCORD_CHANNEL_ID": CHANNEL_ID, "DISCORD_API_BASE": url})
+
+    start = time.perf_counter()
+    if backend == "rest":
+        from src.nodes.node1_discord_rest import Node1_Discord_REST_Input as Node1
+    else:
+        import discord.http
+        discord.http.Route.BASE = url
+        from src.nodes.node1_discord_input import Node1_Discord_Input as Node1
+    import_ms = (time.perf_counter() - start) * 1000
+
+    fetch_ms = []
+    count = 0
+    for _ in range(fetches):
+        start = time.perf_counter()
+        # A new node per fetch, as main() does on every invocation
+        messages = asyncio.run(Node1().fetch_recent_messages(limit=100, minutes=60))
+        fetch_ms.append((time.perf_counter() - start) * 1000)
+        count = len(messages)
+
+    print(json.dumps({"import_ms": import_ms, "fetch_ms": fetch_ms, "messages": count}))
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fetches", type=int, default=10)
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=30)
+    parser.add_argument("--child", choices=["client", "rest"], help=argparse.SUPPRESS)
+    parser.add_argument("--url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.url, args.fetches)
+        return
+
+    with FakeDiscordAPI(make_messages(args.messages), latency_ms=args.latency_ms) as api:
+        print(f"Node 1 fetch latency ({args.messages} messages, {args.latency_ms:.0f} ms simulated RTT)")
+        print(f"  {'backend':8} {'import':>10} {'cold fetch':>12} {'warm fetch':>12} {'requests':>9}")
+        for backend in ["client", "rest"]:
+            before = api.request_count
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_discord_fetch", "--child", backend,
+                 "--url", api.url, "--fetches", str(args.fetches)],
+                cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            cold = result["fetch_ms"][0]
+            warm = statistics.median(result["fetch_ms"][1:]) if len(result["fetch_ms"]) > 1 else cold
+            requests_per_fetch = (api.request_count - before) / args.fetches
+            print(f"  {backend:8} {result['import_ms']:8.1f}ms {cold:10.1f}ms {warm:10.1f}ms {requests_per_fetch:9.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Measures the near-duplicate index (see src/near_duplicates.py) at several
+index sizes: bulk insert time, file size, and lookup latency for posts that
+are near duplicates of an indexed one and for new posts.
+
+Indexed posts are synthetic signatures (random values, like unrelated posts
+sharing no shingles); near-duplicate queries copy an indexed signature and
+change a share of its positions. Each size starts from an empty SQLite file
+in a temporary directory.
+
+Usage:
+    python -m benchmarks.bench_near_duplicates [--sizes 10000 100000 1000000]
+        [--queries 1000] [--threshold 0.7] [--changed 0.2]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import statistics
+from typing import Any, Dict, List
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(PROJECT_ROOT)
+
+from src.near_duplicates import NearDuplicateIndex, NUM_HASHES, MASK_64, minhash_signature
+
+SAMPLE_TEXT = ("Breaking: the city council approved the new riverside park plan on Tuesday, "
+               "with construction expected to begin next spring and finish by 2028. ") * 3
+INSERT_CHUNK = 10000
+
+def random_signature(rng: random.Random) -> List[int]:
+    return [rng.getrandbits(64) & MASK_64 for _ in range(NUM_HASHES)]
+
+def percentile(values: List[float], share: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+def run_benchmark(size: int, queries: int = 1000, threshold: float = 0.7,
+                  changed: float = 0.2, seed: int = 0) -> Dict[str, Any]:
+    """
+    Builds an index of `size` posts and times lookups against it.
+
+    Args:
+        size (int): Number of indexed posts.
+        queries (int): Lookups per query kind.
+        threshold (float): Similarity threshold (decides the band layout).
+        changed (float): Share of signature positions changed in near-duplicate queries.
+        seed (int): Random seed.
+
+    Returns:
+        Dict[str, Any]: Insert seconds, file size and per-kind lookup latencies and hit rates.
+    """
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "near_duplicates.sqlite3")
+        index = NearDuplicateIndex(path=path, threshold=threshold)
+        samples = []
+        start = time.perf_counter()
+        for offset in range(0, size, INSERT_CHUNK):
+            chunk = []
+            for i in range(offset, min(size, offset + INSERT_CHUNK)):
+                signature = random_signature(rng)
+                chunk.append((str(i), signature, {'meta': {'title': f"Post {i}", 'url': f"https://drive/{i}"},
+                                                   'file': {'id': str(i)}}))
+            samples.append(chunk[0][1])
+            index.add_many(chunk)
+        insert_seconds = time.perf_counter() - start
+
+        def near_duplicate() -> List[int]:
+            signature = list(rng.choice(samples))
+            for position in rng.sample(range(NUM_HASHES), int(changed * NUM_HASHES)):
+                signature[position] = rng.getrandbits(64)
+            return signature
+
+        lookups = {}
+        for kind, make_query in [("near duplicate", near_duplicate), ("new post", lambda: random_signature(rng))]:
+            timings, hits = [], 0
+            for _ in range(queries):
+                query = make_query()
+                start = time.perf_counter()
+                hits += index.find_signature(query) is not None
+                timings.append((time.perf_counter() - start) * 1000)
+            lookups[kind] = {'p50': statistics.median(timings), 'p95': percentile(timings, 0.95),
+                             'hit_rate': hits / queries}
+        return {
+            'insert_seconds': insert_seconds,
+            'file_mb': os.path.getsize(path) / 1e6,
+            'bands': index.bands,
+            'lookups': lookups,
+        }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--threshold", type=float, default=0.7)
+    parser.add_argument("--changed", type=float, default=0.2, help="Share of positions changed in near duplicates")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    timings = []
+    for _ in range(200):
+        start = time.perf_counter()
+        minhash_signature(SAMPLE_TEXT)
+        timings.append((time.perf_counter() - start) * 1000)
+    print(f"Near-duplicate index benchmark (threshold {args.threshold}, {args.queries} queries per kind)")
+    print(f"  signature of a {len(SAMPLE_TEXT)}-char post: p50 {statistics.median(timings):.3f}ms")
+    for size in args.sizes:
+        result = run_benchmark(size, queries=args.queries, threshold=args.threshold,
+                               changed=args.changed, seed=args.seed)
+        print(f"\n{size} indexed post(s): inserted in {result['insert_seconds']:.1f}s, "
+              f"{result['file_mb']:.1f} MB, {result['bands']} bands")
+        print(f"  {'query':16} {'p50':>10} {'p95':>10} {'hit rate':>9}")
+        for kind, stats in result['lookups'].items():
+            print(f"  {kind:16} {stats['p50']:8.3f}ms {stats['p95']:8.3f}ms {stats['hit_rate']:9.2f}")
+
+if __name__ == "__main__":
+    main()
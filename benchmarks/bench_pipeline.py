@@ -0,0 +1,172 @@
+"""
+Runs main.main end to end against offline fakes (Discord history and webhook
+and t.co over local HTTP servers, in-memory Drive and Gemini) at several message
+counts and reports throughput, per-stage time and outbound API calls.
+
+Every size starts from empty Drive, caches and checkpoint, with the
+checkpoint placed just before the first message so one poll picks up all.
+--drive-quota / --gemini-quota make the fakes reject calls beyond that many
+in flight with 429, to watch the adaptive concurrency limiters settle.
+
+Usage:
+    python -m benchmarks.bench_pipeline [--sizes 1 10 100 1000] [--workers 16]
+        [--drive-latency-ms 40] [--gemini-latency-ms 800] [--discord-latency-ms 40]
+        [--webhook-latency-ms 40] [--link-latency-ms 40] [--drive-error-rate 0] [--gemini-error-rate 0]
+        [--discord-error-rate 0] [--webhook-error-rate 0]
+        [--drive-quota N] [--gemini-quota N]
+"""
+
+import io
+import os
+import sys
+import time
+import argparse
+import tempfile
+import contextlib
+from typing import Any, Dict, List, Optional
+from unittest.mock import patch
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(PROJECT_ROOT)
+
+import src.main as main_module
+import src.metrics as metrics
+from src.clients import get_client, reset_clients
+from src.utils import CONCURRENCY_LIMITS, get_concurrency_limiter
+from benchmarks.fakes import FakeDriveService, FakeGeminiClient
+from benchmarks.fake_discord_api import FakeDiscordAPI, make_messages, CHANNEL_ID
+from benchmarks.fake_links import FakeShortLinkServer
+
+def run_benchmark(size: int, workers: int = 16, drive_latency_ms: float = 0, gemini_latency_ms: float = 0,
+                  discord_latency_ms: float = 0, webhook_latency_ms: float = 0, link_latency_ms: float = 0,
+                  drive_error_rate: float = 0, gemini_error_rate: float = 0, discord_error_rate: float = 0,
+                  webhook_error_rate: float = 0,
+                  drive_quota: Optional[int] = None, gemini_quota: Optional[int] = None,
+                  seed: int = 0, quiet: bool = True) -> Dict[str, Any]:
+    """
+    Runs one poll of main.main over `size` new messages.
+
+    Returns:
+        Dict[str, Any]: 'seconds', 'processed', 'throughput' (messages/s), 'summary'
+        (RunMetrics.summary() of the run), 'limits' (final adaptive concurrency limit
+        per service), plus the fakes ('drive', 'gemini', 'discord', 'links').
+    """
+    messages = make_messages(size)
+    drive = FakeDriveService(latency_ms=drive_latency_ms, error_rate=drive_error_rate, seed=seed,
+                             max_concurrency=drive_quota)
+    gemini = FakeGeminiClient(latency_ms=gemini_latency_ms, error_rate=gemini_error_rate, seed=seed,
+                              max_concurrency=gemini_quota)
+
+    with tempfile.TemporaryDirectory() as tmp_dir, \
+            FakeDiscordAPI(messages, latency_ms=discord_latency_ms, error_rate=discord_error_rate,
+                           webhook_latency_ms=webhook_latency_ms, webhook_error_rate=webhook_error_rate,
+                           seed=seed) as discord_api, \
+            FakeShortLinkServer(latency_ms=link_latency_ms) as links:
+        checkpoint_path = os.path.join(tmp_dir, "checkpoint.json")
+        env = {
+            "DISCORD_TOKEN": "benchmark",
+            "DISCORD_CHANNEL_ID": CHANNEL_ID,
+            "DISCORD_API_BASE": discord_api.url,
+            "DISCORD_INPUT_BACKEND": "rest",
+            "DISCORD_WEBHOOK_URL": discord_api.webhook_url,
+            "DISCORD_CHECKPOINT_PATH": checkpoint_path,
+            "DRIVE_ROOT_FOLDER_ID": "root",
+            "FOLDER_CACHE_PATH": os.path.join(tmp_dir, "folders.json"),
+            "SUMMARY_CACHE_PATH": os.path.join(tmp_dir, "summaries.sqlite3"),
+            "JOB_STORE_PATH": os.path.join(tmp_dir, "jobs.sqlite3"),
+            "LINK_CACHE_PATH": os.path.join(tmp_dir, "links.sqlite3"),
+            "NEAR_DUP_INDEX_PATH": os.path.join(tmp_dir, "near_duplicates.sqlite3"),
+            "ARCHIVE_INDEX_PATH": os.path.join(tmp_dir, "archive.sqlite3"),
+            "MEDIA_CACHE_DIR": os.path.join(tmp_dir, "media"),
+            "TCO_BASE_URL": links.url,
+            "METRICS_HISTORY_PATH": "",
+            "MAX_WORKERS": str(workers),
+            "STREAMING_MODE": "false",
+            # The fakes have no quota; keep the limiter out of the measurement
+            "GEMINI_RPM": "1000000",
+            "GEMINI_TPM": "1000000000",
+        }
+        with patch.dict(os.environ, env):
+            with open(checkpoint_path, "w") as f:
+                f.write(f'{{"last_message_id": "{int(messages[0]["id"]) - 1}"}}')
+            reset_clients()
+            get_client('drive', lambda: drive)
+            get_client('gemini', lambda: gemini)
+            output = io.StringIO() if quiet else sys.stdout
+            start = time.perf_counter()
+            try:
+                with contextlib.redirect_stdout(output):
+                    main_module.main()
+                limits = {service: get_concurrency_limiter(service).limit for service in CONCURRENCY_LIMITS}
+            finally:
+                reset_clients()
+            seconds = time.perf_counter() - start
+
+    summary = metrics.current().summary()
+    processed = int(summary["counters"].get("messages.done", 0))
+    return {
+        "seconds": seconds,
+        "processed": processed,
+        "throughput": processed / seconds if seconds else 0.0,
+        "summary": summary,
+        "limits": limits,
+        "drive": drive,
+        "gemini": gemini,
+        "discord": discord_api,
+        "links": links,
+    }
+
+def print_report(size: int, result: Dict[str, Any]) -> None:
+    summary = result["summary"]
+    print(f"\n{size} message(s): {result['processed']} processed in {result['seconds']:.2f}s "
+          f"({result['throughput']:.1f} msg/s)")
+    print(f"  {'stage':24} {'count':>6} {'p50':>10} {'p95':>10}")
+    for name, stats in sorted(summary["timings"].items()):
+        print(f"  {name:24} {stats['count']:6d} {stats['p50']:8.1f}ms {stats['p95']:8.1f}ms")
+    calls = {name: value for name, value in summary["counters"].items() if name.startswith("api.")}
+    print(f"  {'API calls':24} {'total':>6} {'per msg':>10}")
+    for name, value in sorted(calls.items()):
+        print(f"  {name[4:]:24} {int(value):6d} {value / max(1, size):10.2f}")
+    print(f"  {'limiter':24} {'limit':>6} {'throttled':>10} {'peak':>6}")
+    for service, limit in sorted(result["limits"].items()):
+        throttled = int(summary["counters"].get(f"limiter.{service}.throttled", 0))
+        fake = result.get(service)
+        peak = f"{fake.peak_concurrency:6d}" if hasattr(fake, 'peak_concurrency') else f"{'-':>6}"
+        print(f"  {service:24} {limit:6.1f} {throttled:10d} {peak}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--drive-latency-ms", type=float, default=40)
+    parser.add_argument("--gemini-latency-ms", type=float, default=800)
+    parser.add_argument("--discord-latency-ms", type=float, default=40)
+    parser.add_argument("--webhook-latency-ms", type=float, default=40)
+    parser.add_argument("--link-latency-ms", type=float, default=40)
+    parser.add_argument("--drive-error-rate", type=float, default=0)
+    parser.add_argument("--gemini-error-rate", type=float, default=0)
+    parser.add_argument("--discord-error-rate", type=float, default=0)
+    parser.add_argument("--webhook-error-rate", type=float, default=0)
+    parser.add_argument("--drive-quota", type=int, default=None, help="Drive calls allowed in flight")
+    parser.add_argument("--gemini-quota", type=int, default=None, help="Gemini calls allowed in flight")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's own output")
+    args = parser.parse_args()
+
+    print(f"Offline pipeline benchmark (workers={args.workers}; latency ms: drive {args.drive_latency_ms:.0f}, "
+          f"gemini {args.gemini_latency_ms:.0f}, discord {args.discord_latency_ms:.0f}, "
+          f"webhook {args.webhook_latency_ms:.0f})")
+    for size in args.sizes:
+        result = run_benchmark(
+            size, workers=args.workers,
+            drive_latency_ms=args.drive_latency_ms, gemini_latency_ms=args.gemini_latency_ms,
+            discord_latency_ms=args.discord_latency_ms, webhook_latency_ms=args.webhook_latency_ms,
+            link_latency_ms=args.link_latency_ms,
+            drive_error_rate=args.drive_error_rate, gemini_error_rate=args.gemini_error_rate,
+            discord_error_rate=args.discord_error_rate, webhook_error_rate=args.webhook_error_rate,
+            drive_quota=args.drive_quota, gemini_quota=args.gemini_quota, seed=args.seed, quiet=not args.verbose,
+        )
+        print_report(size, result)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Measures per-invocation client setup time.
+
+Compares the old behaviour (every invocation builds three Drive services and
+a Gemini client from scratch) with the process-wide client registry
+(built once per container, reused on warm invocations).
+
+Runs offline with dummy credentials: nothing is sent until the first API call.
+
+Usage:
+    python -m benchmarks.bench_setup [--invocations 20]
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import src.utils as utils
+from src.clients import reset_clients
+from src.nodes import (
+    Node3_Gemini, Node4_Folder_Management,
+    Node5_File_Creation, Node6_Content_Writing
+)
+
+DUMMY_ENV = {
+    "GOOGLE_REFRESH_TOKEN": "dummy-refresh-token",
+    "GOOGLE_CLIENT_ID": "dummy-client-id",
+    "GOOGLE_CLIENT_SECRET": "dummy-client-secret",
+    "GEMINI_API_KEY": "dummy-api-key",
+    "FOLDER_CACHE_PATH": "",
+}
+
+def setup_without_registry() -> None:
+    """Old behaviour: one Drive service per node plus a fresh Gemini client."""
+    from google import genai
+    for _ in range(3):
+        utils._build_thread_safe_service(utils.build_drive_credentials())
+    genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+
+def setup_with_registry() -> None:
+    """Current behaviour: nodes share the registered clients."""
+    Node3_Gemini()
+    Node4_Folder_Management()
+    Node5_File_Creation()
+    Node6_Content_Writing()
+
+def time_ms(func) -> float:
+    start = time.perf_counter()
+    func()
+    return (time.perf_counter() - start) * 1000
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--invocations", type=int, default=20)
+    args = parser.parse_args()
+
+    os.environ.update(DUMMY_ENV)
+
+    before = [time_ms(setup_without_registry) for _ in range(args.invocations)]
+
+    reset_clients()
+    cold = time_ms(setup_with_registry)
+    warm = [time_ms(setup_with_registry) for _ in range(args.invocations)]
+
+    print(f"Setup time per invocation ({args.invocations} invocations)")
+    print(f"  before (no registry):  median {statistics.median(before):8.2f} ms")
+    print(f"  after, cold container: {cold:8.2f} ms")
+    print(f"  after, warm container: median {statistics.median(warm):8.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Measures the cold start of the Lambda entry point for an idle poll (no new messages):
+  - an `-X importtime` breakdown of `import src.main` by top-level package
+  - SDKs that `import src.main` loads before they are needed
+  - wall-clock from process start to the first Discord request, and to exit
+
+Each run is a fresh interpreter against a local stand-in of the Discord API, with
+a local checkpoint already in /tmp so the run does not need Drive.
+Exits non-zero if a median exceeds its budget or a heavy SDK is imported eagerly,
+so it can be used as a regression check.
+
+Usage:
+    python -m benchmarks.bench_startup [--runs 5] [--backend rest]
+        [--max-import-ms 300] [--max-first-request-ms 600]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(PROJECT_ROOT)
+
+from benchmarks.fake_discord_api import FakeDiscordAPI, CHANNEL_ID
+
+# SDKs that should only load once a node actually needs them
+HEAVY_MODULES = ["discord", "google.genai", "googleapiclient", "httplib2"]
+
+# Runs one poll; the client backend is pointed at the fake API after discord.py is imported
+CHILD_CODE = """
+import os, sys
+if os.environ.get("DISCORD_INPUT_BACKEND") == "client":
+    import discord.http
+    discord.http.Route.BASE = os.environ["DISCORD_API_BASE"]
+import src.main
+src.main.main()
+"""
+
+def import_breakdown() -> Tuple[float, Dict[str, float], List[str]]:
+    """
+    Imports src.main in a fresh interpreter with -X importtime.
+
+    Returns:
+        Tuple[float, Dict[str, float], List[str]]: Total import time (ms), time spent
+        in each top-level package (ms), and the heavy SDKs that were loaded.
+    """
+    code = f"import sys, json; import src.main; print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            cwd=PROJECT_ROOT, capture_output=True, text=True, check=True)
+    per_package: Dict[str, float] = defaultdict(float)
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # "import time: <self us> | <cumulative us> | <indented module name>"
+        self_us, _, name = line[len("import time:"):].split("|")
+        # Self time summed per top-level package adds up to the whole import
+        per_package[name.strip().split(".")[0]] += int(self_us) / 1000
+    loaded = json.loads(result.stdout.strip().splitlines()[-1])
+    return sum(per_package.values()), dict(per_package), loaded
+
+def run_poll(backend: str, api: FakeDiscordAPI, checkpoint_path: str) -> Tuple[float, float]:
+    """
+    Runs main() once in a fresh interpreter.
+
+    Returns:
+        Tuple[float, float]: Milliseconds from process start to the first Discord
+        request, and to process exit.
+    """
+    env = {key: value for key, value in os.environ.items()
+           if not key.startswith(("GOOGLE_", "GEMINI_", "DISCORD_"))}
+    env.update({
+        "DISCORD_TOKEN": "benchmark",
+        "DISCORD_CHANNEL_ID": CHANNEL_ID,
+        "DISCORD_API_BASE": api.url,
+        "DISCORD_INPUT_BACKEND": backend,
+        "DISCORD_CHECKPOINT_PATH": checkpoint_path,
+        "JOB_STORE_PATH": os.path.join(os.path.dirname(checkpoint_path), "jobs.sqlite3"),
+        "METRICS_HISTORY_PATH": "",
+    })
+    api.first_request_at = None
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", CHILD_CODE], cwd=PROJECT_ROOT, env=env,
+                   capture_output=True, text=True, check=True)
+    exit_ms = (time.perf_counter() - start) * 1000
+    if api.first_request_at is None:
+        raise RuntimeError("The poll made no Discord request.")
+    return (api.first_request_at - start) * 1000, exit_ms
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--backend", choices=["client", "rest"], default="rest")
+    parser.add_argument("--max-import-ms", type=float, default=300)
+    parser.add_argument("--max-first-request-ms", type=float, default=600)
+    parser.add_argument("--top", type=int, default=10, help="Packages shown in the import breakdown")
+    args = parser.parse_args()
+
+    totals, breakdowns, loaded = [], [], []
+    for _ in range(args.runs):
+        total, per_package, loaded = import_breakdown()
+        totals.append(total)
+        breakdowns.append(per_package)
+    import_ms = statistics.median(totals)
+
+    print(f"import src.main (median of {args.runs}): {import_ms:.1f}ms")
+    packages = {name for breakdown in breakdowns for name in breakdown}
+    medians = {name: statistics.median(b.get(name, 0) for b in breakdowns) for name in packages}
+    for name, ms in sorted(medians.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {name:24} {ms:8.1f}ms")
+
+    with tempfile.TemporaryDirectory() as tmp_dir, FakeDiscordAPI([]) as api:
+        checkpoint_path = os.path.join(tmp_dir, "checkpoint.json")
+        # A warm-/tmp idle poll: cursor and Drive copy are already known locally
+        with open(checkpoint_path, "w") as f:
+            json.dump({"last_message_id": "1", "drive_file_id": "marker", "drive_message_id": "1"}, f)
+        timings = [run_poll(args.backend, api, checkpoint_path) for _ in range(args.runs)]
+    first_request_ms = statistics.median(t[0] for t in timings)
+    exit_ms = statistics.median(t[1] for t in timings)
+    print(f"Idle poll, {args.backend} backend (median of {args.runs}):")
+    print(f"  process start -> first Discord request {first_request_ms:8.1f}ms")
+    print(f"  process start -> exit                  {exit_ms:8.1f}ms")
+
+    failures = []
+    if loaded:
+        failures.append(f"import src.main loads {', '.join(loaded)} eagerly")
+    if import_ms > args.max_import_ms:
+        failures.append(f"import time {import_ms:.1f}ms exceeds {args.max_import_ms:.0f}ms")
+    if first_request_ms > args.max_first_request_ms:
+        failures.append(f"first Discord request after {first_request_ms:.1f}ms exceeds {args.max_first_request_ms:.0f}ms")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("OK: within the cold-start budget.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Local stand-in for the handful of Discord REST endpoints Node 1 uses
+(login, application info, channel lookup and channel message history), for
+the notification webhook Node 8 posts to and for CDN attachment downloads,
+with optional per-request latency and error rates. Used by the benchmarks
+so they run offline.
+"""
+
+import json
+import time
+import random
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse, parse_qs
+
+DISCORD_EPOCH_MS = 1420070400000
+CHANNEL_ID = "100000000000000001"
+GUILD_ID = "100000000000000002"
+
+USER = {"id": "100000000000000003", "username": "x-agent", "discriminator": "0", "avatar": None, "bot": True}
+APPLICATION = {
+    "id": "100000000000000004", "name": "x-agent", "description": "", "icon": None,
+    "verify_key": "", "bot_public": False, "bot_require_code_grant": False, "owner": USER,
+}
+CHANNEL = {"id": CHANNEL_ID, "type": 0, "guild_id": GUILD_ID, "name": "input", "position": 0}
+
+def make_messages(count: int, author: str = "post", bot: bool = True) -> List[Dict[str, Any]]:
+    """Builds `count` message objects created over the last few minutes (oldest first)."""
+    now_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+    messages = []
+    for i in range(count):
+        created_ms = now_ms - (count - i) * 1000
+        snowflake = ((created_ms - DISCORD_EPOCH_MS) << 22) + i
+        messages.append({
+            "id": str(snowflake),
+            "channel_id": CHANNEL_ID,
+            "type": 0,
+            "content": f"Benchmark post {i} https://t.co/abc{i}",
+            "author": {"id": "100000000000000005", "username": author, "discriminator": "0",
+                       "avatar": None, "bot": bot},
+            "timestamp": datetime.fromtimestamp(created_ms / 1000, tz=timezone.utc).isoformat(),
+            "edited_timestamp": None,
+            "tts": False,
+            "mention_everyone": False,
+            "mentions": [],
+            "mention_roles": [],
+            "attachments": [],
+            "embeds": [],
+            "pinned": False,
+        })
+    return messages
+
+def _check_webhook_limits(payload: Dict[str, Any]) -> Optional[str]:
+    """Returns why Discord would reject the webhook body (400 Invalid Form Body), or None."""
+    embeds = payload.get("embeds") or []
+    if not payload.get("content") and not embeds:
+        return "Cannot send an empty message"
+    if len(payload.get("content") or "") > 2000:
+        return "content: Must be 2000 or fewer in length."
+    if len(embeds) > 10:
+        return "embeds: Must be 10 or fewer in length."
+    for embed in embeds:
+        if len(embed.get("title") or "") > 256:
+            return "embeds.title: Must be 256 or fewer in length."
+        if len(embed.get("description") or "") > 4096:
+            return "embeds.description: Must be 4096 or fewer in length."
+    if sum(len(embed.get("title") or "") + len(embed.get("description") or "") for embed in embeds) > 6000:
+        return "embeds: Embed size exceeds maximum size of 6000"
+    return None
+
+class FakeDiscordAPI:
+    """
+    Serves the fake API on 127.0.0.1 in a background thread.
+
+    History requests fail with 429 (retry_after 10 ms) at `error_rate`; webhook
+    posts fail with 500 at `webhook_error_rate`, and with 400 if they break
+    Discord's message limits.
+
+    Attributes:
+        url (str): Base URL, e.g. http://127.0.0.1:PORT/api/v10
+        webhook_url (str): URL to use as DISCORD_WEBHOOK_URL.
+        request_count (int): Number of API (GET) requests served.
+        first_request_at (Optional[float]): time.perf_counter() when the first request arrived.
+        webhook_posts (List[Dict[str, Any]]): JSON bodies of the accepted webhook posts.
+        attachment_requests (int): Number of attachment downloads served.
+    """
+    def __init__(self, messages: Optional[List[Dict[str, Any]]] = None, latency_ms: float = 0,
+                 error_rate: float = 0, webhook_latency_ms: float = 0, webhook_error_rate: float = 0,
+                 seed: Optional[int] = None, attachments: Optional[Dict[str, bytes]] = None) -> None:
+        self.messages = messages if messages is not None else make_messages(20)
+        # File name -> bytes served at attachment_url(name)
+        self.attachments = attachments or {}
+        self.attachment_requests = 0
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.webhook_latency_ms = webhook_latency_ms
+        self.webhook_error_rate = webhook_error_rate
+        self.request_count = 0
+        self.first_request_at: Optional[float] = None
+        self.webhook_posts: List[Dict[str, Any]] = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Send headers and body in one segment so keep-alive requests don't hit delayed ACKs
+            wbufsize = 64 * 1024
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, status, body):
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _send_attachment(self, name):
+                with api._lock:
+                    api.attachment_requests += 1
+                data = api.attachments.get(name)
+                self.send_response(200 if data is not None else 404)
+                self.send_header("Content-Type", "image/png" if data is not None else "text/plain")
+                self.send_header("Content-Length", str(len(data or b"")))
+                self.end_headers()
+                self.wfile.write(data or b"")
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", "0"))
+                body = self.rfile.read(length)
+                if not urlparse(self.path).path.startswith("/api/webhooks/"):
+                    self._send_json(404, {"message": "Unknown Webhook"})
+                    return
+                if api.webhook_latency_ms:
+                    time.sleep(api.webhook_latency_ms / 1000)
+                if api._fails(api.webhook_error_rate):
+                    self._send_json(500, {"message": "fake outage"})
+                    return
+                payload = json.loads(body or b"{}")
+                error = _check_webhook_limits(payload)
+                if error:
+                    self._send_json(400, {"message": error, "code": 50035})
+                    return
+                with api._lock:
+                    api.webhook_posts.append(payload)
+                    message_id = str(len(api.webhook_posts))
+                self._send_json(200, {"id": message_id, "content": payload.get("content", ""),
+                                      "embeds": payload.get("embeds", [])})
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                if parsed.path.startswith("/attachments/"):
+                    self._send_attachment(parsed.path[len("/attachments/"):])
+                    return
+                if api.first_request_at is None:
+                    api.first_request_at = time.perf_counter()
+                api.request_count += 1
+                if api.latency_ms:
+                    time.sleep(api.latency_ms / 1000)
+                if api._fails(api.error_rate):
+                    self._send_json(429, {"message": "You are being rate limited.", "retry_after": 0.01, "global": False})
+                    return
+                path = parsed.path.replace("/api/v10", "", 1)
+                query = parse_qs(parsed.query)
+                if path == "/users/@me":
+                    body = USER
+                elif path == "/oauth2/applications/@me":
+                    body = APPLICATION
+                elif path == f"/channels/{CHANNEL_ID}":
+                    body = CHANNEL
+                elif path == f"/channels/{CHANNEL_ID}/messages":
+                    body = api._history(query)
+                else:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self._send_json(200, body)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/api/v10"
+        self.webhook_url = f"http://127.0.0.1:{self.server.server_address[1]}/api/webhooks/1/fake-token"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def attachment_url(self, name: str, signature: str = "fake") -> str:
+        """Returns the CDN link of an attachment, signed like Discord's (ex/is/hm parameters)."""
+        return f"{self.url.rsplit('/api/', 1)[0]}/attachments/{name}?ex={int(time.time()):x}&is=0&hm={signature}"
+
+    def _fails(self, rate: float) -> bool:
+        with self._lock:
+            return rate > 0 and self._random.random() < rate
+
+    def _history(self, query: Dict[str, List[str]]) -> List[Dict[str, Any]]:
+        """Mimics GET /channels/{id}/messages with `after` and `limit` (newest first)."""
+        limit = int(query.get("limit", ["50"])[0])
+        after = int(query.get("after", ["0"])[0])
+        newer = sorted((m for m in self.messages if int(m["id"]) > after), key=lambda m: int(m["id"]))
+        page = newer[:limit]
+        return list(reversed(page))
+
+    def __enter__(self) -> "FakeDiscordAPI":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.server.shutdown()
+        self.server.server_close()
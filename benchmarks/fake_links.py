@@ -0,0 +1,62 @@
+"""
+Local stand-in for t.co: answers HEAD/GET /<code> with a 301 to the target
+of the code, with optional per-request latency. Point the resolver at it
+with TCO_BASE_URL.
+"""
+
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+class FakeShortLinkServer:
+    """
+    Serves short links on 127.0.0.1 in a background thread. Unknown codes
+    redirect to https://example.com/<code>, so any t.co link resolves.
+
+    Attributes:
+        url (str): Value for TCO_BASE_URL, e.g. http://127.0.0.1:PORT
+        request_count (int): Number of requests served.
+    """
+    def __init__(self, links: Optional[Dict[str, str]] = None, latency_ms: float = 0) -> None:
+        """
+        Args:
+            links (Optional[Dict[str, str]]): Target URL per code (a target may be another short link).
+            latency_ms (float): Delay before each response.
+        """
+        self.links = links or {}
+        self.latency_ms = latency_ms
+        self.request_count = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_HEAD(self):
+                with server._lock:
+                    server.request_count += 1
+                if server.latency_ms:
+                    time.sleep(server.latency_ms / 1000)
+                code = self.path.strip("/").split("?", 1)[0]
+                self.send_response(301)
+                self.send_header("Location", server.links.get(code, f"https://example.com/{code}"))
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            do_GET = do_HEAD
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self) -> "FakeShortLinkServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,475 @@
+"""
+In-process fakes of the Google Drive service and the Gemini client, with
+configurable latency and error rates. They implement the parts of the real
+client APIs the nodes use, so main.main can run end to end offline
+(see benchmarks/bench_pipeline.py). Discord history and the notification
+webhook are served by benchmarks/fake_discord_api.py.
+"""
+
+import re
+import copy
+import time
+import random
+import hashlib
+import itertools
+import threading
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import src.metrics as metrics
+from src.prompt_template import POST_LABEL, LINKS_LABEL
+
+class FakeBackend:
+    """
+    Shared latency/error injection for the fakes.
+
+    With `max_concurrency` set, calls beyond that many in flight are rejected with
+    429 like a real quota; `peak_concurrency` and `throttled` record what happened.
+    """
+    def __init__(self, latency_ms: float = 0, error_rate: float = 0, seed: Optional[int] = None,
+                 max_concurrency: Optional[int] = None) -> None:
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.max_concurrency = max_concurrency
+        self.peak_concurrency = 0
+        self.throttled = 0
+        self._in_flight = 0
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+
+    def _simulate(self) -> Optional[int]:
+        """Sleeps for the configured latency; returns the HTTP status this call should fail with, or None."""
+        with self._random_lock:
+            self._in_flight += 1
+            self.peak_concurrency = max(self.peak_concurrency, self._in_flight)
+            over_quota = self.max_concurrency is not None and self._in_flight > self.max_concurrency
+        try:
+            if self.latency_ms:
+                time.sleep(self.latency_ms / 1000)
+        finally:
+            with self._random_lock:
+                self._in_flight -= 1
+        with self._random_lock:
+            if over_quota:
+                self.throttled += 1
+                return 429
+            return 503 if self.error_rate > 0 and self._random.random() < self.error_rate else None
+
+# --- Drive query language (the subset used by the nodes) ---
+
+_TOKEN = re.compile(r"\s*(?:('(?:[^'\\]|\\.)*')|(!=|=|\(|\)|\{|\})|([A-Za-z_][\w.]*))")
+
+def _tokenize(query: str) -> List[Tuple[str, str]]:
+    tokens, position = [], 0
+    while position < len(query):
+        match = _TOKEN.match(query, position)
+        if not match or match.end() == position:
+            if query[position:].strip():
+                raise ValueError(f"Invalid query near: {query[position:]!r}")
+            break
+        string, symbol, word = match.groups()
+        if string is not None:
+            tokens.append(("string", string[1:-1].replace("\\'", "'").replace("\\\\", "\\")))
+        elif symbol is not None:
+            tokens.append(("symbol", symbol))
+        else:
+            tokens.append(("word", word))
+        position = match.end()
+    return tokens
+
+class _QueryParser:
+    """
+    Parses a Drive `q` string into a predicate on file dicts. Supports and/or/not,
+    parentheses, `'id' in parents`, `name|mimeType = / != 'x'`, `name contains 'x'`,
+    `trashed = true|false` and `appProperties has { key='k' and value='v' }`.
+    """
+    def __init__(self, query: str) -> None:
+        self.tokens = _tokenize(query)
+        self.position = 0
+
+    def parse(self) -> Callable[[Dict[str, Any]], bool]:
+        predicate = self._or()
+        if self.position != len(self.tokens):
+            raise ValueError(f"Unexpected token {self.tokens[self.position]}")
+        return predicate
+
+    def _peek(self) -> Optional[Tuple[str, str]]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def _take(self, kind: Optional[str] = None, value: Optional[str] = None) -> str:
+        token = self._peek()
+        if token is None or (kind and token[0] != kind) or (value and token[1].lower() != value):
+            raise ValueError(f"Expected {value or kind}, got {token}")
+        self.position += 1
+        return token[1]
+
+    def _keyword(self, word: str) -> bool:
+        token = self._peek()
+        return token is not None and token[0] == "word" and token[1].lower() == word
+
+    def _or(self):
+        predicates = [self._and()]
+        while self._keyword("or"):
+            self._take()
+            predicates.append(self._and())
+        return predicates[0] if len(predicates) == 1 else (lambda f: any(p(f) for p in predicates))
+
+    def _and(self):
+        predicates = [self._not()]
+        while self._keyword("and"):
+            self._take()
+            predicates.append(self._not())
+        return predicates[0] if len(predicates) == 1 else (lambda f: all(p(f) for p in predicates))
+
+    def _not(self):
+        if self._keyword("not"):
+            self._take()
+            inner = self._not()
+            return lambda f: not inner(f)
+        if self._peek() == ("symbol", "("):
+            self._take()
+            inner = self._or()
+            self._take("symbol", ")")
+            return inner
+        return self._comparison()
+
+    def _comparison(self):
+        token = self._peek()
+        if token and token[0] == "string":
+            value = self._take()
+            self._take("word", "in")
+            self._take("word", "parents")
+            return lambda f: value in f.get('parents', [])
+
+        field = self._take("word")
+        if field == "appProperties":
+            self._take("word", "has")
+            self._take("symbol", "{")
+            self._take("word", "key")
+            self._take("symbol", "=")
+            key = self._take("string")
+            self._take("word", "and")
+            self._take("word", "value")
+            self._take("symbol", "=")
+            value = self._take("string")
+            self._take("symbol", "}")
+            return lambda f: (f.get('appProperties') or {}).get(key) == value
+
+        operator = self._take()
+        if operator == "contains":
+            value = self._take("string")
+            return lambda f: value in str(f.get(field, ""))
+        literal = self._take()
+        if field == "trashed":
+            expected = literal.lower() == "true"
+            compare = lambda f: bool(f.get('trashed', False)) == expected
+        else:
+            compare = lambda f: f.get(field) == literal
+        if operator == "=":
+            return compare
+        if operator == "!=":
+            return lambda f: not compare(f)
+        raise ValueError(f"Unsupported operator {operator}")
+
+def _parse_fields(fields: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Parses 'nextPageToken, files(id, name)' into {'nextPageToken': None, 'files': {'id': None, ...}}."""
+    if not fields:
+        return None
+    result: Dict[str, Any] = {}
+    stack = [result]
+    name = ""
+    for char in fields + ",":
+        if char == "(":
+            nested: Dict[str, Any] = {}
+            stack[-1][name.strip()] = nested
+            stack.append(nested)
+            name = ""
+        elif char in ",)":
+            if name.strip():
+                stack[-1][name.strip()] = None
+            name = ""
+            if char == ")":
+                stack.pop()
+        else:
+            name += char
+    return result
+
+def _project(resource: Dict[str, Any], fields: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    if fields is None:
+        return copy.deepcopy(resource)
+    return {key: copy.deepcopy(resource[key]) for key in fields if key in resource}
+
+class _FakeRequest:
+    def __init__(self, drive: "FakeDriveService", operation: str, handler: Callable[[], Dict[str, Any]]) -> None:
+        self._drive = drive
+        self._operation = operation
+        self._handler = handler
+
+    def execute(self) -> Dict[str, Any]:
+        return self._drive._execute(self._operation, self._handler)
+
+class _FakeFiles:
+    def __init__(self, drive: "FakeDriveService") -> None:
+        self._drive = drive
+
+    def list(self, q: Optional[str] = None, fields: Optional[str] = None, pageSize: int = 100,
+             pageToken: Optional[str] = None, **kwargs) -> _FakeRequest:
+        return _FakeRequest(self._drive, 'files.list', lambda: self._drive._list(q, fields, pageSize, pageToken))
+
+    def get(self, fileId: str, fields: Optional[str] = None, **kwargs) -> _FakeRequest:
+        return _FakeRequest(self._drive, 'files.get', lambda: self._drive._get(fileId, fields))
+
+    def get_media(self, fileId: str, **kwargs) -> _FakeRequest:
+        return _FakeRequest(self._drive, 'files.get_media', lambda: self._drive._get_media(fileId))
+
+    def create(self, body: Optional[Dict[str, Any]] = None, media_body: Any = None,
+               fields: Optional[str] = None, **kwargs) -> _FakeRequest:
+        return _FakeRequest(self._drive, 'files.create', lambda: self._drive._create(body or {}, media_body, fields))
+
+    def update(self, fileId: str, body: Optional[Dict[str, Any]] = None, media_body: Any = None,
+               fields: Optional[str] = None, addParents: Optional[str] = None,
+               removeParents: Optional[str] = None, **kwargs) -> _FakeRequest:
+        return _FakeRequest(self._drive, 'files.update',
+                            lambda: self._drive._update(fileId, body or {}, media_body, fields,
+                                                        addParents, removeParents))
+
+    def delete(self, fileId: str, **kwargs) -> _FakeRequest:
+        return _FakeRequest(self._drive, 'files.delete', lambda: self._drive._delete(fileId))
+
+class _FakeChanges:
+    def __init__(self, drive: "FakeDriveService") -> None:
+        self._drive = drive
+
+    def getStartPageToken(self, **kwargs) -> _FakeRequest:
+        return _FakeRequest(self._drive, 'changes.getStartPageToken',
+                            lambda: {'startPageToken': str(len(self._drive.change_log))})
+
+    def list(self, pageToken: str, fields: Optional[str] = None, pageSize: int = 100,
+             includeRemoved: bool = True, **kwargs) -> _FakeRequest:
+        return _FakeRequest(self._drive, 'changes.list',
+                            lambda: self._drive._list_changes(pageToken, fields, pageSize, includeRemoved))
+
+class FakeDriveService(FakeBackend):
+    """
+    In-memory stand-in for the Drive v3 service returned by googleapiclient.
+
+    Every create, update and delete is appended to a changes feed served by
+    changes().getStartPageToken / changes().list (page tokens are positions
+    in the feed; like Drive, a change carries the file's current state).
+
+    Attributes:
+        files_by_id (Dict[str, Dict[str, Any]]): Stored files (metadata plus 'content').
+        calls (Dict[str, int]): Executed requests per operation, e.g. 'files.list'.
+        change_log (List[Tuple[str, bool]]): (file ID, removed) per change, oldest first.
+    """
+    def __init__(self, latency_ms: float = 0, error_rate: float = 0, seed: Optional[int] = None,
+                 max_concurrency: Optional[int] = None) -> None:
+        super().__init__(latency_ms, error_rate, seed, max_concurrency)
+        self.files_by_id: Dict[str, Dict[str, Any]] = {}
+        self.calls: Dict[str, int] = {}
+        self.change_log: List[Tuple[str, bool]] = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def files(self) -> _FakeFiles:
+        return _FakeFiles(self)
+
+    def changes(self) -> _FakeChanges:
+        return _FakeChanges(self)
+
+    def _execute(self, operation: str, handler: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        # Counted like the real service (see utils._build_thread_safe_service)
+        metrics.count_api_call('drive', operation)
+        with self._lock:
+            self.calls[operation] = self.calls.get(operation, 0) + 1
+        status = self._simulate()
+        if status:
+            from googleapiclient.errors import HttpError
+            import httplib2
+            raise HttpError(httplib2.Response({'status': status}),
+                            f'{{"error": {{"code": {status}, "message": "fake outage"}}}}'.encode())
+        with self._lock:
+            return handler()
+
+    def _list(self, q: Optional[str], fields: Optional[str], page_size: int, page_token: Optional[str]) -> Dict[str, Any]:
+        predicate = _QueryParser(q).parse() if q else (lambda f: True)
+        matches = [f for f in self.files_by_id.values() if predicate(f)]
+        start = int(page_token or 0)
+        page = matches[start:start + min(page_size or 100, 1000)]
+        next_token = str(start + len(page)) if start + len(page) < len(matches) else None
+        projection = _parse_fields(fields) or {'files': {'id': None, 'name': None, 'mimeType': None},
+                                               'nextPageToken': None}
+        output: Dict[str, Any] = {}
+        if 'files' in projection:
+            output['files'] = [_project(f, projection['files']) for f in page]
+        if 'nextPageToken' in projection and next_token:
+            output['nextPageToken'] = next_token
+        return output
+
+    def _get(self, file_id: str, fields: Optional[str]) -> Dict[str, Any]:
+        if file_id not in self.files_by_id:
+            from googleapiclient.errors import HttpError
+            import httplib2
+            raise HttpError(httplib2.Response({'status': 404}), b'{"error": {"code": 404, "message": "File not found"}}')
+        return _project(self.files_by_id[file_id], _parse_fields(fields))
+
+    def _get_media(self, file_id: str) -> bytes:
+        self._get(file_id, 'id')
+        return self.files_by_id[file_id].get('content', '').encode('utf-8')
+
+    @staticmethod
+    def _read_media(media_body: Any) -> Optional[str]:
+        if media_body is None:
+            return None
+        return media_body.getbytes(0, media_body.size()).decode('utf-8')
+
+    def _create(self, body: Dict[str, Any], media_body: Any, fields: Optional[str]) -> Dict[str, Any]:
+        file_id = f"file{next(self._ids)}"
+        now = time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime())
+        stored = {
+            'id': file_id,
+            'name': body.get('name', 'Untitled'),
+            'mimeType': body.get('mimeType', 'application/octet-stream'),
+            'parents': list(body.get('parents', [])),
+            'appProperties': dict(body.get('appProperties', {})),
+            'trashed': False,
+            'createdTime': now,
+            'modifiedTime': now,
+            'webViewLink': f"https://drive.example/{file_id}",
+        }
+        content = self._read_media(media_body)
+        if content is not None:
+            stored['content'] = content
+            stored['md5Checksum'] = hashlib.md5(content.encode('utf-8')).hexdigest()
+        self.files_by_id[file_id] = stored
+        self.change_log.append((file_id, False))
+        return _project(stored, _parse_fields(fields) or {'id': None})
+
+    def _update(self, file_id: str, body: Dict[str, Any], media_body: Any, fields: Optional[str],
+                add_parents: Optional[str] = None, remove_parents: Optional[str] = None) -> Dict[str, Any]:
+        stored = self.files_by_id[file_id]
+        if remove_parents:
+            stored['parents'] = [p for p in stored['parents'] if p not in remove_parents.split(",")]
+        if add_parents:
+            stored['parents'] += [p for p in add_parents.split(",") if p not in stored['parents']]
+        for key, value in body.items():
+            if key == 'appProperties':
+                stored['appProperties'].update(value)
+            else:
+                stored[key] = value
+        content = self._read_media(media_body)
+        if content is not None:
+            stored['content'] = content
+            stored['md5Checksum'] = hashlib.md5(content.encode('utf-8')).hexdigest()
+        stored['modifiedTime'] = time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime())
+        self.change_log.append((file_id, False))
+        return _project(stored, _parse_fields(fields) or {'id': None})
+
+    def _delete(self, file_id: str) -> Dict[str, Any]:
+        self._get(file_id, 'id')
+        del self.files_by_id[file_id]
+        self.change_log.append((file_id, True))
+        return {}
+
+    def _list_changes(self, page_token: str, fields: Optional[str], page_size: int,
+                      include_removed: bool) -> Dict[str, Any]:
+        start = int(page_token)
+        entries = self.change_log[start:start + min(page_size or 100, 1000)]
+        end = start + len(entries)
+        projection = _parse_fields(fields) or {}
+        file_fields = (projection.get('changes') or {}).get('file')
+        changes = []
+        for file_id, removed in entries:
+            removed = removed or file_id not in self.files_by_id
+            if removed and not include_removed:
+                continue
+            change = {'changeType': 'file', 'fileId': file_id, 'removed': removed}
+            if not removed:
+                change['file'] = _project(self.files_by_id[file_id], file_fields)
+            changes.append(change)
+        output: Dict[str, Any] = {'changes': changes}
+        if end < len(self.change_log):
+            output['nextPageToken'] = str(end)
+        else:
+            output['newStartPageToken'] = str(end)
+        return output
+
+    def find(self, **properties: str) -> List[Dict[str, Any]]:
+        """Returns stored files whose appProperties contain all the given key/values."""
+        with self._lock:
+            return [f for f in self.files_by_id.values()
+                    if all(f['appProperties'].get(k) == v for k, v in properties.items())]
+
+# --- Gemini ---
+
+class FakeGeminiClient(FakeBackend):
+    """
+    Stand-in for google.genai.Client: models.generate_content(_stream),
+    aio.models.generate_content and caches.create. The summary's title is
+    derived from the post text, so different posts get different file names.
+
+    Attributes:
+        calls (int): Number of generate requests.
+        media_parts (int): Number of inline image parts received.
+    """
+    def __init__(self, latency_ms: float = 0, error_rate: float = 0, seed: Optional[int] = None,
+                 chunks: int = 4, max_concurrency: Optional[int] = None) -> None:
+        super().__init__(latency_ms, error_rate, seed, max_concurrency)
+        self.chunks = chunks
+        self.calls = 0
+        self.media_parts = 0
+        self._lock = threading.Lock()
+        client = self
+
+        class Models:
+            def generate_content(self, model: str, contents: Any, config: Any = None) -> Any:
+                return client._generate(contents)
+
+            def generate_content_stream(self, model: str, contents: Any, config: Any = None):
+                response = client._generate(contents)
+                text = response.text
+                size = max(1, len(text) // client.chunks + 1)
+                parts = [text[i:i + size] for i in range(0, len(text), size)]
+                for i, part in enumerate(parts):
+                    last = i == len(parts) - 1
+                    yield SimpleNamespace(text=part, usage_metadata=response.usage_metadata if last else None)
+
+        class AsyncModels:
+            async def generate_content(self, model: str, contents: Any, config: Any = None) -> Any:
+                import asyncio
+                return await asyncio.to_thread(client._generate, contents)
+
+        class Caches:
+            def create(self, model: str, config: Any = None) -> Any:
+                return SimpleNamespace(name=f"cachedContents/fake-{hashlib.sha1(str(config).encode()).hexdigest()[:8]}")
+
+        self.models = Models()
+        self.aio = SimpleNamespace(models=AsyncModels())
+        self.caches = Caches()
+
+    def _generate(self, contents: Any) -> Any:
+        with self._lock:
+            self.calls += 1
+        status = self._simulate()
+        if status:
+            from google.genai import errors as genai_errors
+            raise genai_errors.APIError(status, {"error": {"code": status, "message": "fake overload",
+                                                           "status": "RESOURCE_EXHAUSTED" if status == 429 else "UNAVAILABLE"}})
+        if isinstance(contents, list):
+            # Inline image parts followed by the prompt text
+            with self._lock:
+                self.media_parts += sum(1 for part in contents if not isinstance(part, str))
+            prompt = "".join(part for part in contents if isinstance(part, str))
+        else:
+            prompt = contents if isinstance(contents, str) else str(contents)
+        post_text = prompt.rsplit(POST_LABEL, 1)[-1].split(LINKS_LABEL, 1)[0].strip() or "post"
+        title = " ".join(post_text.split())[:40]
+        text = f"# {title}\n\n## 概要\nSummary of: {post_text}\n\n## 解説\n" + "Lorem ipsum dolor sit amet. " * 20
+        usage = SimpleNamespace(
+            prompt_token_count=len(prompt) // 3,
+            cached_content_token_count=0,
+            candidates_token_count=len(text) // 3,
+            total_token_count=(len(prompt) + len(text)) // 3,
+        )
+        candidate = SimpleNamespace(finish_reason="STOP", content=text)
+        return SimpleNamespace(text=text, candidates=[candidate], usage_metadata=usage)
@@ -0,0 +1,367 @@
+"""
+Local index of the Drive archive: one row per summary file (message ID, file
+ID, folder path, title, webViewLink, content hash) plus an FTS5 full-text
+index over titles and bodies.
+
+Usage:
+    python -m src.archive_index QUERY [--limit 20]
+    python -m src.archive_index --message MESSAGE_ID
+    python -m src.archive_index --folder 2025/12/17
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import hashlib
+import argparse
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set
+from src.clients import get_client
+
+DEFAULT_INDEX_PATH = "/tmp/archive_index.sqlite3"
+# The trigram tokenizer also matches inside Japanese text, which has no spaces
+# between words; it only indexes terms of at least this many characters
+MIN_MATCH_CHARS = 3
+
+def content_hash(content: str) -> str:
+    """Returns the MD5 hex digest of the content, the same value Drive reports as md5Checksum."""
+    return hashlib.md5(content.encode('utf-8')).hexdigest()
+
+def title_from_name(name: Optional[str]) -> str:
+    """Returns the summary title of a file name ("Title.md" -> "Title")."""
+    name = name or "Untitled.md"
+    return name[:-3] if name.endswith(".md") else name
+
+class ArchiveIndex:
+    """
+    SQLite index of the summary files in Drive, so idempotency checks, title
+    lookups and searches do not need the Drive API.
+
+    Files are recorded by Node 6 when they are written (with their content) and
+    backfilled from Node 5's bulk listings (metadata only). Node 4 records the
+    Year/Month/Day path of every folder it resolves. The index lives under /tmp,
+    so it is only as complete as this container's history: a miss is not proof
+    that a message has no file, and callers fall back to Drive.
+    """
+    def __init__(self, path: Optional[str] = None) -> None:
+        """
+        Args:
+            path (Optional[str]): SQLite file. Defaults to ARCHIVE_INDEX_PATH or
+                /tmp/archive_index.sqlite3. An empty string keeps the index in memory only.
+        """
+        self.path = path if path is not None else os.getenv("ARCHIVE_INDEX_PATH", DEFAULT_INDEX_PATH)
+        self._lock = threading.Lock()
+        self._folder_paths: Dict[str, str] = {}
+        self._conn = sqlite3.connect(self.path or ":memory:", check_same_thread=False)
+        self._conn.execute(
+            # Explicit integer key: the full-text rows refer to it, and VACUUM keeps it stable
+            "CREATE TABLE IF NOT EXISTS files ("
+            " id INTEGER PRIMARY KEY,"
+            " file_id TEXT NOT NULL UNIQUE,"
+            " message_id TEXT,"
+            " folder_id TEXT,"
+            " title TEXT NOT NULL,"
+            " web_view_link TEXT,"
+            " content_hash TEXT,"
+            " created_time TEXT,"
+            " indexed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS files_message ON files (message_id)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS folders (folder_id TEXT PRIMARY KEY, path TEXT NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS folders_path ON folders (path)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self.fts = self._create_fts()
+        self._conn.commit()
+
+    def _create_fts(self) -> bool:
+        """Creates the full-text table (rowid = files.rowid). Returns False if FTS5 is unavailable."""
+        for tokenizer in ("trigram", "unicode61"):
+            try:
+                self._conn.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS files_fts USING fts5(title, body, tokenize='{tokenizer}')"
+                )
+                return True
+            except sqlite3.OperationalError as e:
+                print(f"Archive index: FTS5 tokenizer '{tokenizer}' unavailable: {e}")
+        print("Archive index: Full-text search disabled; searching titles only.")
+        return False
+
+    def record_folder(self, folder_id: str, path: str) -> None:
+        """Stores the path (e.g. "2025/12/17") of a Drive folder."""
+        if not folder_id or self._folder_paths.get(folder_id) == path:
+            return
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO folders (folder_id, path) VALUES (?, ?)", (folder_id, path))
+            self._conn.commit()
+            self._folder_paths[folder_id] = path
+
+    def folder_path(self, folder_id: str) -> Optional[str]:
+        """Returns the path of a recorded folder."""
+        with self._lock:
+            row = self._conn.execute("SELECT path FROM folders WHERE folder_id = ?", (folder_id,)).fetchone()
+        return row[0] if row else None
+
+    def move_folder(self, folder_id: str, path: str) -> None:
+        """Changes the path of a renamed or moved folder and of every folder below it."""
+        old_path = self.folder_path(folder_id)
+        with self._lock:
+            if old_path is not None and old_path != path:
+                self._conn.execute(
+                    "UPDATE folders SET path = ? || substr(path, ?) WHERE substr(path, 1, ?) = ?",
+                    (path, len(old_path) + 1, len(old_path) + 1, old_path + "/"))
+            self._conn.execute("INSERT OR REPLACE INTO folders (folder_id, path) VALUES (?, ?)", (folder_id, path))
+            self._conn.commit()
+            self._folder_paths.clear()
+
+    def forget_folder(self, folder_id: str) -> None:
+        """Removes a folder (e.g. trashed in Drive), the folders below it and all their files."""
+        path = self.folder_path(folder_id)
+        with self._lock:
+            folder_ids = [folder_id]
+            if path is not None:
+                folder_ids += [row[0] for row in self._conn.execute(
+                    "SELECT folder_id FROM folders WHERE substr(path, 1, ?) = ?", (len(path) + 1, path + "/"))]
+            for start in range(0, len(folder_ids), 500):
+                chunk = folder_ids[start:start + 500]
+                marks = ",".join("?" * len(chunk))
+                if self.fts:
+                    self._conn.execute("DELETE FROM files_fts WHERE rowid IN"
+                                       f" (SELECT id FROM files WHERE folder_id IN ({marks}))", chunk)
+                self._conn.execute(f"DELETE FROM files WHERE folder_id IN ({marks})", chunk)
+                self._conn.execute(f"DELETE FROM folders WHERE folder_id IN ({marks})", chunk)
+            self._conn.commit()
+            self._folder_paths.clear()
+
+    def folder_id(self, path: str) -> Optional[str]:
+        """Returns the ID of the folder at a path (e.g. "2025/12/17")."""
+        with self._lock:
+            row = self._conn.execute("SELECT folder_id FROM folders WHERE path = ?", (path.strip("/"),)).fetchone()
+        return row[0] if row else None
+
+    def record_file(self, file: Dict[str, Any], message_id: Optional[str] = None,
+                    folder_id: Optional[str] = None, content: Optional[str] = None,
+                    hash_value: Optional[str] = None) -> None:
+        """
+        Records one written file.
+
+        Args:
+            file (Dict[str, Any]): Drive file metadata (id, name, webViewLink, createdTime, ...).
+            message_id (Optional[str]): Discord message ID (defaults to the file's appProperties).
+            folder_id (Optional[str]): Parent folder (defaults to the file's first parent).
+            content (Optional[str]): Markdown content, indexed for search and hashed.
+            hash_value (Optional[str]): Content hash if the content is not (fully) given.
+        """
+        self.record_files([file], content={file['id']: content} if content is not None else None,
+                          message_id=message_id, folder_id=folder_id, hash_value=hash_value)
+
+    def record_files(self, files: Iterable[Dict[str, Any]], content: Optional[Dict[str, str]] = None,
+                     message_id: Optional[str] = None, folder_id: Optional[str] = None,
+                     hash_value: Optional[str] = None) -> None:
+        """
+        Records Drive files in one transaction. Files without given content keep
+        the body already indexed for them (e.g. when backfilled from a listing).
+
+        Args:
+            files (Iterable[Dict[str, Any]]): Drive file metadata.
+            content (Optional[Dict[str, str]]): Markdown content per file ID.
+            message_id, folder_id, hash_value: Overrides for a single file (see record_file).
+        """
+        content = content or {}
+        now = time.time()
+        with self._lock:
+            for file in files:
+                body = content.get(file['id'])
+                row = (
+                    file['id'],
+                    message_id or (file.get('appProperties') or {}).get('discord_message_id'),
+                    folder_id or (file.get('parents') or [None])[0],
+                    title_from_name(file['name']) if file.get('name') else None,
+                    file.get('webViewLink'),
+                    hash_value or (content_hash(body) if body is not None else file.get('md5Checksum')),
+                    file.get('createdTime'),
+                    now,
+                )
+                existing = self._conn.execute("SELECT rowid FROM files WHERE file_id = ?", (file['id'],)).fetchone()
+                if existing:
+                    # Missing values (e.g. a listing without webViewLink) keep what is already known
+                    rowid = existing[0]
+                    self._conn.execute(
+                        "UPDATE files SET message_id = COALESCE(?, message_id), folder_id = COALESCE(?, folder_id),"
+                        " title = COALESCE(?, title), web_view_link = COALESCE(?, web_view_link),"
+                        " content_hash = COALESCE(?, content_hash), created_time = COALESCE(?, created_time),"
+                        " indexed_at = ? WHERE rowid = ?", row[1:] + (rowid,)
+                    )
+                else:
+                    rowid = self._conn.execute(
+                        "INSERT INTO files (file_id, message_id, folder_id, title, web_view_link, content_hash,"
+                        " created_time, indexed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        row[:3] + (row[3] or title_from_name(None),) + row[4:]
+                    ).lastrowid
+                if self.fts:
+                    if body is None:
+                        existing = self._conn.execute("SELECT body FROM files_fts WHERE rowid = ?", (rowid,)).fetchone()
+                        body = existing[0] if existing else ""
+                    self._conn.execute("DELETE FROM files_fts WHERE rowid = ?", (rowid,))
+                    self._conn.execute("INSERT INTO files_fts (rowid, title, body)"
+                                       " SELECT rowid, title, ? FROM files WHERE rowid = ?", (body, rowid))
+            self._conn.commit()
+
+    def forget_file(self, file_id: str) -> None:
+        """Removes a file (e.g. trashed in Drive) from the index."""
+        with self._lock:
+            row = self._conn.execute("SELECT rowid FROM files WHERE file_id = ?", (file_id,)).fetchone()
+            if row:
+                self._conn.execute("DELETE FROM files WHERE rowid = ?", row)
+                if self.fts:
+                    self._conn.execute("DELETE FROM files_fts WHERE rowid = ?", row)
+            self._conn.commit()
+
+    def has_file(self, file_id: str) -> bool:
+        """Returns True if the Drive file is indexed."""
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM files WHERE file_id = ?", (file_id,)).fetchone() is not None
+
+    def get_meta(self, key: str) -> Optional[str]:
+        """Returns a stored bookkeeping value (e.g. the Drive changes page token)."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        """Stores a bookkeeping value next to the state it describes."""
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+            self._conn.commit()
+
+    def _rows(self, where: str, params: Iterable[Any], order: str = "f.created_time DESC",
+              limit: Optional[int] = None, extra: str = "") -> List[Dict[str, Any]]:
+        query = (
+            "SELECT f.message_id, f.file_id, f.folder_id, d.path, f.title, f.web_view_link, f.content_hash,"
+            " f.created_time"
+            f"{extra} FROM files f LEFT JOIN folders d ON d.folder_id = f.folder_id"
+            f"{' JOIN files_fts ON files_fts.rowid = f.rowid' if extra else ''}"
+            f" WHERE {where} ORDER BY {order}"
+        )
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+        with self._lock:
+            rows = self._conn.execute(query, list(params)).fetchall()
+        keys = ['message_id', 'file_id', 'folder_id', 'folder_path', 'title', 'web_view_link',
+                'content_hash', 'created_time']
+        if extra:
+            keys.append('snippet')
+        return [dict(zip(keys, row)) for row in rows]
+
+    def get(self, message_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the indexed file of a message.
+
+        Returns:
+            Optional[Dict[str, Any]]: {'message_id', 'file_id', 'folder_id', 'folder_path', 'title',
+            'web_view_link', 'content_hash', 'created_time'}, or None if not indexed.
+        """
+        rows = self._rows("f.message_id = ?", [str(message_id)], limit=1)
+        return rows[0] if rows else None
+
+    def processed_message_ids(self, message_ids: Iterable[str]) -> Set[str]:
+        """Returns the given message IDs that have an indexed file."""
+        message_ids = list(dict.fromkeys(str(message_id) for message_id in message_ids))
+        found: Set[str] = set()
+        with self._lock:
+            # Stay under SQLite's bound parameter limit
+            for start in range(0, len(message_ids), 500):
+                chunk = message_ids[start:start + 500]
+                found.update(row[0] for row in self._conn.execute(
+                    f"SELECT message_id FROM files WHERE message_id IN ({','.join('?' * len(chunk))})", chunk))
+        return found
+
+    def in_folder(self, path: str) -> List[Dict[str, Any]]:
+        """Returns the files in the folder at a path (e.g. "2025/12/17"), oldest first."""
+        return self._rows("d.path = ?", [path.strip("/")], order="f.created_time")
+
+    def search(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Full-text search over titles and bodies. Every whitespace-separated term
+        must occur; results are ranked by relevance (bm25).
+
+        Args:
+            query (str): Search terms.
+            limit (int): Maximum number of results.
+
+        Returns:
+            List[Dict[str, Any]]: Same keys as get, plus 'snippet' (body excerpt with the
+            matches in [brackets]) when full-text search is available.
+        """
+        terms = query.split()
+        if not terms:
+            return []
+        if not self.fts:
+            return self._rows(" AND ".join(["f.title LIKE ?"] * len(terms)), [f"%{t}%" for t in terms], limit=limit)
+        long_terms = [t for t in terms if len(t) >= MIN_MATCH_CHARS]
+        where, params = [], []
+        if long_terms:
+            where.append("files_fts MATCH ?")
+            params.append(" AND ".join('"' + t.replace('"', '""') + '"' for t in long_terms))
+        for term in terms:
+            if len(term) < MIN_MATCH_CHARS:
+                # Too short for the trigram index; scanned instead
+                where.append("(files_fts.title LIKE ? OR files_fts.body LIKE ?)")
+                params += [f"%{term}%"] * 2
+        if long_terms:
+            return self._rows(" AND ".join(where), params, order="bm25(files_fts)", limit=limit,
+                              extra=", snippet(files_fts, 1, '[', ']', '...', 12)")
+        return self._rows(" AND ".join(where), params, limit=limit, extra=", substr(files_fts.body, 1, 80)")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+def get_archive_index() -> Optional[ArchiveIndex]:
+    """Returns the process-wide archive index, or None if ARCHIVE_INDEX_ENABLED=false or it cannot be opened."""
+    if os.getenv("ARCHIVE_INDEX_ENABLED", "true").lower() != "true":
+        return None
+
+    def build() -> Optional[ArchiveIndex]:
+        try:
+            return ArchiveIndex()
+        except Exception as e:
+            print(f"Archive index disabled: {e}")
+            return None
+    return get_client('archive_index', build)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Searches the local index of the Drive archive.")
+    parser.add_argument("query", nargs="*", help="Terms that must all occur in the title or body")
+    parser.add_argument("--message", help="Show the file of a Discord message ID")
+    parser.add_argument("--folder", help="List the files in a folder path, e.g. 2025/12/17")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--path", default=None, help="Index file (default: ARCHIVE_INDEX_PATH)")
+    args = parser.parse_args()
+
+    index = ArchiveIndex(args.path)
+    start = time.perf_counter()
+    if args.message:
+        row = index.get(args.message)
+        results = [row] if row else []
+    elif args.folder:
+        results = index.in_folder(args.folder)
+    elif args.query:
+        results = index.search(" ".join(args.query), limit=args.limit)
+    else:
+        parser.print_usage()
+        sys.exit(2)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    for row in results:
+        print(f"{row['created_time'] or '-':24} {row['folder_path'] or '?'}/{row['title']}  "
+              f"(message {row['message_id'] or '-'})")
+        print(f"{'':24} {row['web_view_link'] or '-'}")
+        if row.get('snippet'):
+            print(f"{'':24} {row['snippet']}")
+    print(f"{len(results)} result(s) of {len(index)} indexed file(s) in {elapsed_ms:.1f}ms.")
+    if not results:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
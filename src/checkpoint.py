@@ -0,0 +1,178 @@
+import os
+import json
+import threading
+from typing import Any, Callable, Iterable, Optional, Set
+import src.utils as utils
+
+DEFAULT_CHECKPOINT_PATH = "/tmp/discord_checkpoint.json"
+CHECKPOINT_FILE_NAME = "discord_checkpoint"
+CHECKPOINT_PROPERTY = "x_agent_checkpoint"
+
+class MessageCheckpoint:
+    """
+    Persistent cursor: the snowflake ID of the last Discord message that has been
+    fully processed. Stored in a local JSON file under /tmp with a Drive-backed
+    copy (appProperties of a small marker file) for cold starts.
+
+    The cursor only moves past a message once it is committed, and never past an
+    older message that is still in flight, so a crash re-fetches unfinished work.
+    The local file also remembers what was last written to Drive, so a poll
+    that finds nothing new never touches Drive at all.
+    """
+    def __init__(self, path: Optional[str] = None, drive_service: Any = None,
+                 drive_folder_id: Optional[str] = None,
+                 drive_service_factory: Optional[Callable[[], Any]] = None) -> None:
+        """
+        Args:
+            path (Optional[str]): Local JSON file. Defaults to DISCORD_CHECKPOINT_PATH or
+                /tmp/discord_checkpoint.json. An empty string disables the local copy.
+            drive_service (Any): Drive service for the fallback copy (None disables it).
+            drive_folder_id (Optional[str]): Folder holding the Drive marker file.
+            drive_service_factory (Optional[Callable[[], Any]]): Builds the Drive service
+                on first use instead (so the Drive client is only loaded when needed).
+        """
+        self.path = path if path is not None else os.getenv("DISCORD_CHECKPOINT_PATH", DEFAULT_CHECKPOINT_PATH)
+        self.drive_service = drive_service
+        self.drive_folder_id = drive_folder_id
+        self._drive_service_factory = drive_service_factory
+        self.cursor: Optional[str] = None
+        self._drive_file_id: Optional[str] = None
+        self._drive_cursor: Optional[str] = None
+        self._pending: Set[int] = set()
+        self._committed: Set[int] = set()
+        self._scanned_up_to: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def load(self) -> Optional[str]:
+        """
+        Loads the cursor from the local file, falling back to Drive.
+
+        Returns:
+            Optional[str]: The last processed message ID, or None if there is no checkpoint yet.
+        """
+        self.cursor = self._load_local() or self._load_from_drive()
+        return self.cursor
+
+    def _load_local(self) -> Optional[str]:
+        if not self.path or not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            self._drive_file_id = data.get("drive_file_id")
+            self._drive_cursor = data.get("drive_message_id")
+            return data.get("last_message_id")
+        except Exception as e:
+            print(f"Checkpoint: Could not load {self.path}: {e}")
+            return None
+
+    def _get_drive_service(self) -> Any:
+        if self.drive_service is None and self._drive_service_factory is not None:
+            factory, self._drive_service_factory = self._drive_service_factory, None
+            self.drive_service = factory()
+        return self.drive_service
+
+    def _load_from_drive(self) -> Optional[str]:
+        if not self._get_drive_service():
+            return None
+        try:
+            query = f"appProperties has {{ key='{CHECKPOINT_PROPERTY}' and value='discord' }} and trashed = false"
+            results = utils.execute_drive(self.drive_service.files().list(
+                q=query, fields="files(id, appProperties)", pageSize=1
+            ))
+            files = results.get('files', [])
+            if not files:
+                return None
+            self._drive_file_id = files[0]['id']
+            self._drive_cursor = (files[0].get('appProperties') or {}).get('last_message_id')
+            return self._drive_cursor
+        except Exception as e:
+            print(f"Checkpoint: Could not load from Drive: {e}")
+            return None
+
+    def start(self, message_ids: Iterable[str], scanned_up_to: Optional[str] = None) -> None:
+        """
+        Registers the messages fetched in this run.
+
+        Args:
+            message_ids (Iterable[str]): IDs of the messages to be processed.
+            scanned_up_to (Optional[str]): Newest message ID seen by the fetch, including
+                messages that were filtered out (bots etc.).
+        """
+        with self._lock:
+            self._pending = {int(message_id) for message_id in message_ids}
+            self._committed = set()
+            self._scanned_up_to = int(scanned_up_to) if scanned_up_to else None
+            self._advance()
+
+    def track(self, message_id: str) -> None:
+        """Registers one more message to be processed (e.g. pushed by the gateway after start)."""
+        with self._lock:
+            self._pending.add(int(message_id))
+
+    def commit(self, message_id: str) -> None:
+        """Marks a message as done and advances the cursor as far as possible."""
+        with self._lock:
+            self._committed.add(int(message_id))
+            self._advance()
+
+    def _advance(self) -> None:
+        uncommitted = self._pending - self._committed
+        candidates = set(self._committed)
+        if uncommitted:
+            # Never move past the oldest message that is still in flight
+            oldest_open = min(uncommitted)
+            candidates = {message_id for message_id in candidates if message_id < oldest_open}
+        elif self._scanned_up_to is not None:
+            candidates.add(self._scanned_up_to)
+        if self.cursor:
+            candidates.add(int(self.cursor))
+        if not candidates:
+            return
+        new_cursor = str(max(candidates))
+        if new_cursor != self.cursor:
+            self.cursor = new_cursor
+            self._save_local()
+
+    def _save_local(self) -> None:
+        if not self.path:
+            return
+        try:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({
+                    "last_message_id": self.cursor,
+                    "drive_file_id": self._drive_file_id,
+                    "drive_message_id": self._drive_cursor,
+                }, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"Checkpoint: Could not save {self.path}: {e}")
+
+    def flush(self) -> None:
+        """Copies the cursor to Drive (once per run) so it survives cold starts."""
+        if not self.cursor or self.cursor == self._drive_cursor:
+            return
+        if not self._get_drive_service():
+            return
+        if self._drive_file_id is None:
+            # Cursor came from the local file; find the existing marker before writing
+            self._load_from_drive()
+        if self.cursor == self._drive_cursor:
+            return
+        properties = {CHECKPOINT_PROPERTY: 'discord', 'last_message_id': self.cursor}
+        try:
+            if self._drive_file_id:
+                utils.execute_drive(self.drive_service.files().update(
+                    fileId=self._drive_file_id, body={'appProperties': properties}, fields='id'
+                ))
+            else:
+                file_metadata = {'name': CHECKPOINT_FILE_NAME, 'appProperties': properties}
+                if self.drive_folder_id:
+                    file_metadata['parents'] = [self.drive_folder_id]
+                created = utils.execute_drive(self.drive_service.files().create(body=file_metadata, fields='id'))
+                self._drive_file_id = created.get('id')
+            self._drive_cursor = self.cursor
+            self._save_local()
+        except Exception as e:
+            print(f"Checkpoint: Could not save to Drive: {e}")
@@ -0,0 +1,41 @@
+import threading
+from typing import Any, Callable, Dict, Optional
+
+# Process-wide client registry.
+# Module globals survive between warm Lambda invocations, so each client
+# (credentials, discovery document, HTTP pools) is built once per container.
+_registry: Dict[str, Any] = {}
+# Re-entrant: a factory may itself look up another client (e.g. Drive -> credentials)
+_lock = threading.RLock()
+
+def get_client(name: str, factory: Callable[[], Optional[Any]]) -> Optional[Any]:
+    """
+    Returns the registered client for `name`, building it with `factory` on first use.
+
+    Args:
+        name (str): Registry key (e.g. 'drive', 'gemini').
+        factory (Callable[[], Optional[Any]]): Builds the client. A None result is not cached,
+            so a failed build is retried on the next call.
+
+    Returns:
+        Optional[Any]: The shared client instance, or None if it could not be built.
+    """
+    client = _registry.get(name)
+    if client is not None:
+        return client
+
+    with _lock:
+        client = _registry.get(name)
+        if client is None:
+            client = factory()
+            if client is not None:
+                _registry[name] = client
+    return client
+
+def reset_clients(name: Optional[str] = None) -> None:
+    """Drops one registered client (or all of them) so it is rebuilt on next use."""
+    with _lock:
+        if name is None:
+            _registry.clear()
+        else:
+            _registry.pop(name, None)
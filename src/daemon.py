@@ -0,0 +1,174 @@
+"""
+Long-running entry point for the X Bookmark Summarizer Agent.
+Instead of polling every 3 minutes, this stays connected to the Discord gateway:
+Node 1 pushes qualifying messages onto a work queue as they arrive and a pool of
+workers runs Node 2 - Node 8 for each one, so a summary is delivered seconds
+after the Shortcut fires.
+
+Usage:
+    python -m src.daemon
+"""
+
+import os
+import asyncio
+from typing import Dict, Any, Optional, Set
+from dotenv import load_dotenv
+from src.nodes import Node1_Discord_Input, Node8_Discord_Notification
+from src.main import build_input_node, build_nodes, get_max_workers, notify, process_post, resumed_meta
+from src.checkpoint import MessageCheckpoint
+from src.job_store import JobStore
+import src.utils as utils
+import src.metrics as metrics
+
+async def worker(queue: asyncio.Queue, nodes: Dict[str, Any], node8: Node8_Discord_Notification,
+                 jobs: Optional[JobStore] = None, checkpoint: Optional[MessageCheckpoint] = None,
+                 claimed: Optional[Set[str]] = None) -> None:
+    """
+    Takes messages off the queue and runs the pipeline for each one.
+    The nodes are blocking, so each message runs in a thread; one message's
+    failure does not stop the worker. Metrics go to the shared collector,
+    which emit_metrics flushes on an interval.
+
+    Args:
+        queue (asyncio.Queue): Work queue of raw message data dicts.
+        nodes (Dict[str, Any]): Initialized nodes from build_nodes.
+        node8 (Node8_Discord_Notification): Notification node.
+        jobs (Optional[JobStore]): Job store to record and resume the message's stages.
+        checkpoint (Optional[MessageCheckpoint]): Checkpoint finished messages are committed to.
+            A failed message is not committed, so the next start fetches it again.
+        claimed (Optional[Set[str]]): IDs taken by any worker, shared so a message queued by
+            both the catch-up and the gateway runs once.
+    """
+    while True:
+        post = await queue.get()
+        message_id = str(post.get('id'))
+        try:
+            if claimed is not None:
+                if message_id in claimed:
+                    continue
+                claimed.add(message_id)
+            if checkpoint is not None:
+                # The queue is FIFO, so no newer message is committed before this one is tracked
+                checkpoint.track(message_id)
+            meta = await asyncio.to_thread(process_post, post, nodes, jobs=jobs)
+            if checkpoint is not None:
+                checkpoint.commit(message_id)
+            # Node 8: Notify as soon as this message is done
+            if meta:
+                delivered = await asyncio.to_thread(notify, node8, [(message_id, meta)], jobs)
+                if delivered:
+                    metrics.current().record_capture_to_notify(post.get('created_at'))
+        except Exception as e:
+            print(f"Error processing message {message_id}: {e}")
+        finally:
+            queue.task_done()
+
+async def catch_up(queue: asyncio.Queue, nodes: Dict[str, Any], node8: Node8_Discord_Notification,
+                   jobs: JobStore, checkpoint: MessageCheckpoint) -> None:
+    """
+    Runs once the gateway is connected, before the workers start: queues every
+    message posted since the checkpoint (while the daemon was stopped) and sends
+    the notifications an earlier run wrote but never delivered, as main() does.
+    Without a checkpoint (first start) only the gateway's messages are processed.
+    """
+    after_id = await asyncio.to_thread(checkpoint.load)
+    raw_posts = []
+    if after_id:
+        # A separate Node 1: the history fetch logs in and closes its own client
+        backfill_node = build_input_node()
+        raw_posts = await backfill_node.fetch_messages_after(after_id)
+        checkpoint.start([post['id'] for post in raw_posts], backfill_node.last_scanned_id)
+        if raw_posts:
+            print(f"Catching up on {len(raw_posts)} message(s) posted since the last checkpoint.")
+    for post in raw_posts:
+        queue.put_nowait(post)
+
+    to_notify = await asyncio.to_thread(
+        lambda: [(job['message_id'], resumed_meta(job, nodes.get('archive'))) for job in jobs.unnotified()])
+    if to_notify:
+        print(f"Resuming notification of {len(to_notify)} message(s) from an earlier run.")
+        metrics.increment("jobs.resumed.notify", len(to_notify))
+        await asyncio.to_thread(notify, node8, to_notify, jobs)
+
+async def emit_metrics(interval_seconds: float) -> None:
+    """
+    Emits one metrics record per interval with the samples of every message
+    finished in it, so a long-running process does not accumulate samples.
+    The collector is drained, not replaced, so no concurrent worker loses samples.
+    """
+    try:
+        while True:
+            await asyncio.sleep(interval_seconds)
+            finished = metrics.current().drain()
+            if not finished.is_empty():
+                await asyncio.to_thread(finished.emit)
+    finally:
+        finished = metrics.current().drain()
+        if not finished.is_empty():
+            finished.emit()
+
+async def sync_drive(nodes: Dict[str, Any], interval_seconds: float) -> None:
+    """Applies Drive's changes feed to the local state every interval (see DriveSync)."""
+    while True:
+        try:
+            await asyncio.to_thread(nodes['drive_sync'].sync)
+        except Exception as e:
+            print(f"Error syncing Drive changes: {e}")
+        await asyncio.sleep(interval_seconds)
+
+async def run_daemon() -> None:
+    """
+    Connects to the gateway and processes messages until interrupted.
+    Messages pushed by the gateway wait on the queue while catch_up runs, and the
+    workers start afterwards, so the checkpoint knows every backfilled message
+    before any newer one is committed.
+    """
+    load_dotenv()
+    print("Starting X Bookmark Summarizer Agent (Gateway Listener Mode)...")
+
+    node1 = Node1_Discord_Input()
+    nodes = build_nodes()
+    node8 = Node8_Discord_Notification(os.getenv("DISCORD_WEBHOOK_URL"))
+    checkpoint = MessageCheckpoint(drive_service_factory=utils.get_drive_service,
+                                   drive_folder_id=os.getenv("DRIVE_ROOT_FOLDER_ID"))
+    jobs = JobStore(drive_service_factory=utils.get_drive_service,
+                    drive_folder_id=os.getenv("DRIVE_ROOT_FOLDER_ID"))
+
+    queue: asyncio.Queue = asyncio.Queue()
+    listener = asyncio.create_task(node1.listen(queue))
+    ready = asyncio.create_task(node1.ready.wait())
+    workers = []
+    try:
+        await asyncio.wait([listener, ready], return_when=asyncio.FIRST_COMPLETED)
+        if ready.done():
+            try:
+                await catch_up(queue, nodes, node8, jobs, checkpoint)
+            except Exception as e:
+                print(f"Error catching up on missed messages: {e}")
+        claimed: Set[str] = set()
+        workers = [asyncio.create_task(worker(queue, nodes, node8, jobs, checkpoint, claimed))
+                   for _ in range(get_max_workers())]
+        workers.append(asyncio.create_task(emit_metrics(float(os.getenv("METRICS_EMIT_INTERVAL_SECONDS", "60")))))
+        if nodes.get('drive_sync') is not None:
+            interval = float(os.getenv("DRIVE_SYNC_INTERVAL_SECONDS", "300"))
+            workers.append(asyncio.create_task(sync_drive(nodes, interval)))
+        await listener
+    finally:
+        for task in workers + [ready, listener]:
+            task.cancel()
+        await asyncio.gather(*workers, ready, listener, return_exceptions=True)
+        if not node1.client.is_closed():
+            await node1.client.close()
+        # Persist the cursor (and unfinished jobs) to Drive so a cold start resumes here
+        checkpoint.flush()
+        jobs.flush()
+        print("Gateway listener stopped.")
+
+def main() -> None:
+    try:
+        asyncio.run(run_daemon())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
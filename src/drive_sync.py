@@ -0,0 +1,170 @@
+import os
+from typing import Any, Dict, Optional
+import src.utils as utils
+import src.metrics as metrics
+from src.archive_index import ArchiveIndex
+from src.folder_cache import FolderCache
+
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+# Stored in the archive index, so the token is lost together with the state it describes
+PAGE_TOKEN_KEY = "drive_changes_page_token"
+CHANGE_FIELDS = ("nextPageToken, newStartPageToken, changes(fileId, removed, file(id, name, mimeType, parents,"
+                 " trashed, webViewLink, createdTime, md5Checksum, appProperties))")
+
+class DriveSync:
+    """
+    Keeps the local copies of Drive state (folder cache, archive index) fresh
+    by applying Drive's changes feed instead of re-listing the archive.
+
+    The first sync only records a start page token. Every later sync reads
+    the changes since the stored token and applies those under
+    DRIVE_ROOT_FOLDER_ID: created folders and files are added, renamed or
+    moved ones are updated (a folder's new path also applies to the folders
+    below it), and trashed or deleted ones, or ones moved out of the root,
+    are removed.
+    """
+    def __init__(self, archive: ArchiveIndex, folder_cache: Optional[FolderCache] = None,
+                 drive_service: Any = None, root_folder_id: Optional[str] = None,
+                 max_pages: Optional[int] = None) -> None:
+        """
+        Args:
+            archive (ArchiveIndex): Archive index to update; also stores the page token.
+            folder_cache (Optional[FolderCache]): Node 4's folder ID cache to update.
+            drive_service (Any): Drive service. Defaults to the shared one.
+            root_folder_id (Optional[str]): Archive root. Defaults to DRIVE_ROOT_FOLDER_ID;
+                without it nothing is synced.
+            max_pages (Optional[int]): Change pages (up to 1000 changes each) applied per sync;
+                the rest waits for the next one. Defaults to DRIVE_SYNC_MAX_PAGES or 10.
+        """
+        self.archive = archive
+        self.folder_cache = folder_cache
+        self.service = drive_service if drive_service is not None else utils.get_drive_service()
+        self.root_folder_id = root_folder_id if root_folder_id is not None else os.getenv("DRIVE_ROOT_FOLDER_ID")
+        if max_pages is None:
+            max_pages = int(os.getenv("DRIVE_SYNC_MAX_PAGES", "10"))
+        self.max_pages = max(1, max_pages)
+
+    def sync(self) -> Dict[str, int]:
+        """
+        Applies the changes made in Drive since the last sync.
+
+        Returns:
+            Dict[str, int]: {'changes': changes read, 'applied': changes that updated local state}.
+        """
+        stats = {'changes': 0, 'applied': 0}
+        if self.service is None or not self.root_folder_id:
+            return stats
+
+        token = self.archive.get_meta(PAGE_TOKEN_KEY)
+        try:
+            if not token:
+                token = utils.execute_drive(self.service.changes().getStartPageToken())['startPageToken']
+                self.archive.set_meta(PAGE_TOKEN_KEY, token)
+                print("Drive sync: Tracking changes from now on.")
+                return stats
+
+            for _ in range(self.max_pages):
+                response = utils.execute_drive(self.service.changes().list(
+                    pageToken=token,
+                    fields=CHANGE_FIELDS,
+                    pageSize=1000,
+                    includeRemoved=True,
+                    spaces='drive'
+                ))
+                for change in response.get('changes', []):
+                    stats['changes'] += 1
+                    stats['applied'] += self.apply(change)
+                token = response.get('nextPageToken') or response.get('newStartPageToken')
+                # Saved per page, so an interrupted sync does not re-read what it applied
+                self.archive.set_meta(PAGE_TOKEN_KEY, token)
+                if 'newStartPageToken' in response:
+                    break
+            else:
+                print(f"Drive sync: More than {self.max_pages} page(s) of changes; continuing next time.")
+        except Exception as e:
+            status = getattr(getattr(e, 'resp', None), 'status', None)
+            if status in (400, 404, 410):
+                # Expired or invalid token: start over from the current state of Drive
+                print(f"Drive sync: Page token rejected ({status}); tracking changes from now on.")
+                self.archive.set_meta(PAGE_TOKEN_KEY, "")
+            else:
+                print(f"Drive sync: Could not read changes: {e}")
+
+        if stats['changes']:
+            print(f"Drive sync: Applied {stats['applied']} of {stats['changes']} change(s).")
+        metrics.increment("drive_sync.changes", stats['changes'])
+        metrics.increment("drive_sync.applied", stats['applied'])
+        return stats
+
+    def apply(self, change: Dict[str, Any]) -> bool:
+        """
+        Applies one entry of the changes feed to local state.
+
+        Returns:
+            bool: True if local state changed.
+        """
+        file_id = change.get('fileId')
+        file = change.get('file') or {}
+        if not file_id:
+            return False
+        if change.get('removed') or file.get('trashed'):
+            return self._remove(file_id)
+        parent_id = (file.get('parents') or [None])[0]
+        if file.get('mimeType') == FOLDER_MIME_TYPE:
+            return self._apply_folder(file_id, file.get('name') or "", parent_id)
+        return self._apply_file(file, parent_id)
+
+    def _parent_path(self, parent_id: Optional[str]) -> Optional[str]:
+        """Returns the archive path of a parent folder ("" for the root), or None if it is outside."""
+        if not parent_id:
+            return None
+        if parent_id == self.root_folder_id:
+            return ""
+        return self.archive.folder_path(parent_id)
+
+    def _remove(self, file_id: str) -> bool:
+        changed = False
+        if self.archive.has_file(file_id):
+            self.archive.forget_file(file_id)
+            changed = True
+        cached = self.folder_cache.locate(file_id) if self.folder_cache is not None else None
+        if cached is not None:
+            self.folder_cache.drop(file_id)
+            changed = True
+        if self.archive.folder_path(file_id) is not None:
+            self.archive.forget_folder(file_id)
+            changed = True
+        return changed
+
+    def _apply_folder(self, folder_id: str, name: str, parent_id: Optional[str]) -> bool:
+        parent_path = self._parent_path(parent_id)
+        if parent_path is None:
+            # Moved out of the root (or never under it)
+            return self._remove(folder_id)
+
+        changed = False
+        if self.folder_cache is not None:
+            cached = self.folder_cache.locate(folder_id)
+            if cached != (parent_id, name):
+                if cached is not None:
+                    # Renamed or moved: lookups by the old name must not find it
+                    self.folder_cache.drop(folder_id)
+                self.folder_cache.set(parent_id, name, folder_id)
+                changed = True
+        path = f"{parent_path}/{name}" if parent_path else name
+        if self.archive.folder_path(folder_id) != path:
+            self.archive.move_folder(folder_id, path)
+            changed = True
+        return changed
+
+    def _apply_file(self, file: Dict[str, Any], parent_id: Optional[str]) -> bool:
+        indexed = self.archive.has_file(file['id'])
+        if self._parent_path(parent_id) is None:
+            if indexed:
+                self.archive.forget_file(file['id'])
+            return indexed
+        # Only summary files (and files already indexed) belong in the archive
+        if not indexed and not (file.get('appProperties') or {}).get('discord_message_id'):
+            return False
+        self.archive.record_files([file])
+        return True
@@ -0,0 +1,110 @@
+import os
+import json
+import time
+import threading
+from typing import Dict, Any, Optional, Tuple
+
+DEFAULT_CACHE_PATH = "/tmp/folder_cache.json"
+
+class FolderCache:
+    """
+    Folder ID cache keyed by (parent_id, folder_name).
+    Entries are held in memory and mirrored to a small JSON file under /tmp
+    so warm Lambda invocations can skip the Drive lookups entirely.
+    """
+    def __init__(self, path: Optional[str] = None, ttl_seconds: Optional[int] = None) -> None:
+        """
+        Args:
+            path (Optional[str]): JSON file for the on-disk store. Defaults to FOLDER_CACHE_PATH
+                or /tmp/folder_cache.json. An empty string keeps the cache in memory only.
+            ttl_seconds (Optional[int]): Age after which an entry must be re-validated against Drive.
+                Defaults to FOLDER_CACHE_TTL_SECONDS or one day.
+        """
+        self.path = path if path is not None else os.getenv("FOLDER_CACHE_PATH", DEFAULT_CACHE_PATH)
+        if ttl_seconds is None:
+            ttl_seconds = int(os.getenv("FOLDER_CACHE_TTL_SECONDS", "86400"))
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = self._load()
+
+    @staticmethod
+    def _key(parent_id: Optional[str], folder_name: str) -> str:
+        return f"{parent_id or ''}/{folder_name}"
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except Exception as e:
+            print(f"Folder cache: Could not load {self.path}: {e}")
+            return {}
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        try:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"Folder cache: Could not save {self.path}: {e}")
+
+    def get(self, parent_id: Optional[str], folder_name: str) -> Optional[str]:
+        """Returns the cached folder ID, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(self._key(parent_id, folder_name))
+            return entry["id"] if entry else None
+
+    def is_stale(self, parent_id: Optional[str], folder_name: str) -> bool:
+        """Returns True if the entry is older than the TTL and should be re-validated."""
+        with self._lock:
+            entry = self._entries.get(self._key(parent_id, folder_name))
+            if not entry:
+                return False
+            return time.time() - entry.get("validated_at", 0) > self.ttl_seconds
+
+    def set(self, parent_id: Optional[str], folder_name: str, folder_id: str) -> None:
+        """Stores (or re-validates) a folder ID and persists the cache."""
+        with self._lock:
+            self._entries[self._key(parent_id, folder_name)] = {
+                "id": folder_id,
+                "parent_id": parent_id,
+                "validated_at": time.time()
+            }
+            self._save()
+
+    def locate(self, folder_id: str) -> Optional[Tuple[Optional[str], str]]:
+        """Returns the (parent_id, folder_name) a folder ID is cached under, or None."""
+        with self._lock:
+            for key, entry in self._entries.items():
+                if entry["id"] == folder_id:
+                    return entry.get("parent_id"), key.split("/", 1)[1]
+        return None
+
+    def drop(self, folder_id: str) -> None:
+        """
+        Removes a folder and, recursively, every cached folder below it.
+        Use this when a folder was trashed or deleted in Drive.
+        """
+        with self._lock:
+            to_drop = {folder_id}
+            changed = True
+            while changed:
+                changed = False
+                for key, entry in list(self._entries.items()):
+                    if entry["id"] in to_drop or entry.get("parent_id") in to_drop:
+                        if entry["id"] not in to_drop:
+                            to_drop.add(entry["id"])
+                        del self._entries[key]
+                        changed = True
+            self._save()
+
+    def clear(self) -> None:
+        """Removes every entry from memory and disk."""
+        with self._lock:
+            self._entries = {}
+            self._save()
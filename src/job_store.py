@@ -0,0 +1,243 @@
+import os
+import io
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import src.utils as utils
+
+DEFAULT_JOB_STORE_PATH = "/tmp/job_store.sqlite3"
+SNAPSHOT_FILE_NAME = "job_store_snapshot.json"
+SNAPSHOT_PROPERTY = "x_agent_jobs"
+# Stages a message goes through, in order; a job never moves backwards
+STAGES = ("fetched", "generated", "written", "notified")
+
+class JobStore:
+    """
+    Durable per-message job state: the last stage each Discord message has
+    completed plus its intermediate outputs ('content' once generated, the Drive
+    'file' once written, 'meta' for the notification). A re-run resumes at the
+    first incomplete stage instead of paying for Gemini or Drive again, and
+    messages that were written but never notified are notified by the next run.
+
+    Backed by SQLite under /tmp so warm Lambda invocations reuse it. With
+    JOB_STORE_DRIVE_SYNC=true the unfinished jobs are also mirrored to a JSON
+    snapshot file on Drive, which a cold start restores before first use.
+    Jobs untouched for longer than the TTL are pruned.
+    """
+    def __init__(self, path: Optional[str] = None, ttl_seconds: Optional[int] = None,
+                 drive_sync: Optional[bool] = None, drive_service: Any = None,
+                 drive_folder_id: Optional[str] = None,
+                 drive_service_factory: Optional[Callable[[], Any]] = None) -> None:
+        """
+        Args:
+            path (Optional[str]): SQLite file. Defaults to JOB_STORE_PATH or
+                /tmp/job_store.sqlite3. An empty string keeps the store in memory only.
+            ttl_seconds (Optional[int]): Job lifetime. Defaults to JOB_STORE_TTL_SECONDS or 7 days.
+            drive_sync (Optional[bool]): Mirror unfinished jobs to Drive. Defaults to JOB_STORE_DRIVE_SYNC.
+            drive_service (Any): Drive service for the snapshot.
+            drive_folder_id (Optional[str]): Folder holding the snapshot file.
+            drive_service_factory (Optional[Callable[[], Any]]): Builds the Drive service
+                on first use instead (so the Drive client is only loaded when needed).
+        """
+        self.path = path if path is not None else os.getenv("JOB_STORE_PATH", DEFAULT_JOB_STORE_PATH)
+        if ttl_seconds is None:
+            ttl_seconds = int(os.getenv("JOB_STORE_TTL_SECONDS", str(7 * 24 * 3600)))
+        if drive_sync is None:
+            drive_sync = os.getenv("JOB_STORE_DRIVE_SYNC", "false").lower() == "true"
+        self.ttl_seconds = ttl_seconds
+        self.drive_sync = drive_sync
+        self.drive_service = drive_service
+        self.drive_folder_id = drive_folder_id
+        self._drive_service_factory = drive_service_factory
+        self._lock = threading.Lock()
+        is_new = not self.path or not os.path.exists(self.path)
+        self._conn = sqlite3.connect(self.path or ":memory:", check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " message_id TEXT PRIMARY KEY,"
+            " stage TEXT NOT NULL,"
+            " data TEXT NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.commit()
+        # A fresh local database on a cold start is restored from the Drive snapshot on first use
+        self._restore_pending = is_new and self.drive_sync
+
+    @staticmethod
+    def reached(job: Optional[Dict[str, Any]], stage: str) -> bool:
+        """Returns True if the job has completed `stage` (or a later one)."""
+        return job is not None and STAGES.index(job['stage']) >= STAGES.index(stage)
+
+    def get(self, message_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the job of a message: {'message_id', 'stage', 'data', 'updated_at'},
+        or None if the message has never been seen.
+        """
+        self._restore_from_drive()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT message_id, stage, data, updated_at FROM jobs WHERE message_id = ?", (str(message_id),)
+            ).fetchone()
+        return self._to_job(row) if row else None
+
+    def advance(self, message_id: str, stage: str, **outputs: Any) -> None:
+        """
+        Records that a message completed `stage`, merging `outputs` into its data.
+        An earlier stage than the recorded one only adds the outputs.
+        """
+        if stage not in STAGES:
+            raise ValueError(f"Unknown job stage: {stage}")
+        self._restore_from_drive()
+        message_id = str(message_id)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT stage, data FROM jobs WHERE message_id = ?", (message_id,)
+            ).fetchone()
+            data = json.loads(row[1]) if row else {}
+            data.update(outputs)
+            if row and STAGES.index(row[0]) > STAGES.index(stage):
+                stage = row[0]
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (message_id, stage, data, updated_at) VALUES (?, ?, ?, ?)",
+                (message_id, stage, json.dumps(data, default=str), time.time())
+            )
+            self._conn.commit()
+
+    def unnotified(self, exclude: Iterable[str] = ()) -> List[Dict[str, Any]]:
+        """
+        Returns the jobs that were written to Drive but not notified yet, oldest message first.
+
+        Args:
+            exclude (Iterable[str]): Message IDs to leave out (e.g. those processed by this run).
+        """
+        self._restore_from_drive()
+        excluded = {str(message_id) for message_id in exclude}
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT message_id, stage, data, updated_at FROM jobs WHERE stage = 'written'"
+                " ORDER BY CAST(message_id AS INTEGER)"
+            ).fetchall()
+        return [self._to_job(row) for row in rows if row[0] not in excluded]
+
+    def mark_notified(self, message_ids: Iterable[str]) -> None:
+        """Marks messages as notified and drops their summary content, which is no longer needed."""
+        now = time.time()
+        with self._lock:
+            for message_id in message_ids:
+                row = self._conn.execute(
+                    "SELECT data FROM jobs WHERE message_id = ?", (str(message_id),)
+                ).fetchone()
+                data = json.loads(row[0]) if row else {}
+                data.pop('content', None)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO jobs (message_id, stage, data, updated_at) VALUES (?, 'notified', ?, ?)",
+                    (str(message_id), json.dumps(data, default=str), now)
+                )
+            self._conn.commit()
+
+    def prune(self) -> int:
+        """Deletes jobs untouched for longer than the TTL. Returns how many were deleted."""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM jobs WHERE updated_at < ?", (time.time() - self.ttl_seconds,))
+            self._conn.commit()
+            return cursor.rowcount
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+    def flush(self) -> None:
+        """
+        Prunes expired jobs and, with Drive sync on, uploads the unfinished jobs
+        to the Drive snapshot. Nothing is uploaded if they did not change since
+        the last snapshot, so idle polls never touch Drive.
+        """
+        self.prune()
+        if not self.drive_sync:
+            return
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT message_id, stage, data, updated_at FROM jobs WHERE stage != 'notified'"
+                " ORDER BY message_id"
+            ).fetchall()
+        snapshot = json.dumps([self._to_job(row) for row in rows], sort_keys=True, default=str)
+        digest = hashlib.sha256(snapshot.encode("utf-8")).hexdigest()
+        if digest == self._get_meta('snapshot_hash'):
+            return
+        if not self._get_drive_service():
+            return
+        try:
+            from googleapiclient.http import MediaIoBaseUpload
+            media = MediaIoBaseUpload(io.BytesIO(snapshot.encode("utf-8")), mimetype='application/json',
+                                      resumable=False)
+            file_id = self._get_meta('drive_file_id') or self._find_snapshot_file()
+            if file_id:
+                utils.execute_drive(self.drive_service.files().update(fileId=file_id, media_body=media, fields='id'))
+            else:
+                file_metadata = {'name': SNAPSHOT_FILE_NAME, 'mimeType': 'application/json',
+                                 'appProperties': {SNAPSHOT_PROPERTY: 'snapshot'}}
+                if self.drive_folder_id:
+                    file_metadata['parents'] = [self.drive_folder_id]
+                created = utils.execute_drive(
+                    self.drive_service.files().create(body=file_metadata, media_body=media, fields='id'))
+                file_id = created.get('id')
+            self._set_meta('drive_file_id', file_id)
+            self._set_meta('snapshot_hash', digest)
+        except Exception as e:
+            print(f"Job store: Could not save snapshot to Drive: {e}")
+
+    def _restore_from_drive(self) -> None:
+        """Loads the Drive snapshot into a freshly created local database (once)."""
+        if not self._restore_pending:
+            return
+        self._restore_pending = False
+        if not self._get_drive_service():
+            return
+        try:
+            file_id = self._find_snapshot_file()
+            if not file_id:
+                return
+            content = utils.execute_drive(self.drive_service.files().get_media(fileId=file_id))
+            jobs = json.loads(content.decode("utf-8") if isinstance(content, bytes) else content)
+            with self._lock:
+                for job in jobs:
+                    self._conn.execute(
+                        "INSERT OR IGNORE INTO jobs (message_id, stage, data, updated_at) VALUES (?, ?, ?, ?)",
+                        (job['message_id'], job['stage'], json.dumps(job['data'], default=str), job['updated_at'])
+                    )
+                self._conn.commit()
+            self._set_meta('drive_file_id', file_id)
+            print(f"Job store: Restored {len(jobs)} unfinished job(s) from Drive.")
+        except Exception as e:
+            print(f"Job store: Could not restore snapshot from Drive: {e}")
+
+    def _find_snapshot_file(self) -> Optional[str]:
+        query = f"appProperties has {{ key='{SNAPSHOT_PROPERTY}' and value='snapshot' }} and trashed = false"
+        results = utils.execute_drive(self.drive_service.files().list(q=query, fields="files(id)", pageSize=1))
+        files = results.get('files', [])
+        return files[0]['id'] if files else None
+
+    def _get_drive_service(self) -> Any:
+        if self.drive_service is None and self._drive_service_factory is not None:
+            factory, self._drive_service_factory = self._drive_service_factory, None
+            self.drive_service = factory()
+        return self.drive_service
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str) -> None:
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+            self._conn.commit()
+
+    @staticmethod
+    def _to_job(row: Any) -> Dict[str, Any]:
+        message_id, stage, data, updated_at = row
+        return {'message_id': message_id, 'stage': stage, 'data': json.loads(data), 'updated_at': updated_at}
@@ -0,0 +1,151 @@
+import os
+import time
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, Iterable, Optional
+from urllib.parse import urljoin, urlparse
+import requests
+from src.clients import get_client
+import src.metrics as metrics
+
+DEFAULT_CACHE_PATH = "/tmp/link_cache.sqlite3"
+# Hosts whose links only redirect elsewhere; only these are ever requested
+SHORTENER_HOSTS = {"t.co", "bit.ly", "buff.ly", "ow.ly", "tinyurl.com", "dlvr.it", "ift.tt"}
+MAX_REDIRECTS = 5
+
+class LinkResolver:
+    """
+    Resolves shortened links (t.co and other shorteners) to their targets.
+
+    Each link is followed with HEAD requests, without redirects, only as long
+    as the next hop is still a shortener, so the target site itself is never
+    contacted. Resolved mappings are kept in SQLite under /tmp with a TTL so
+    warm Lambda invocations and repeated links skip the network.
+    """
+    def __init__(self, path: Optional[str] = None, ttl_seconds: Optional[int] = None) -> None:
+        """
+        Args:
+            path (Optional[str]): SQLite file. Defaults to LINK_CACHE_PATH or
+                /tmp/link_cache.sqlite3. An empty string keeps the cache in memory only.
+            ttl_seconds (Optional[int]): Lifetime of a mapping. Defaults to LINK_CACHE_TTL_SECONDS or 30 days.
+        """
+        self.path = path if path is not None else os.getenv("LINK_CACHE_PATH", DEFAULT_CACHE_PATH)
+        if ttl_seconds is None:
+            ttl_seconds = int(os.getenv("LINK_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+        self.ttl_seconds = ttl_seconds
+        self.workers = max(1, int(os.getenv("LINK_RESOLVE_WORKERS", "8")))
+        self.request_timeout = float(os.getenv("LINK_RESOLVE_TIMEOUT_SECONDS", "3"))
+        # Points t.co requests at a local stand-in (tests and benchmarks)
+        self.tco_base = os.getenv("TCO_BASE_URL")
+        self.session = get_client('link_http', requests.Session)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path or ":memory:", check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS links ("
+            " url TEXT PRIMARY KEY,"
+            " target TEXT NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def is_short_link(url: str) -> bool:
+        """Returns True if the link points at a known shortener (False for malformed links)."""
+        try:
+            return (urlparse(url).hostname or "").lower() in SHORTENER_HOSTS
+        except ValueError:
+            return False
+
+    def get(self, url: str) -> Optional[str]:
+        """Returns the cached target of a link, or None on a miss or expired entry."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT target, created_at FROM links WHERE url = ?", (url,)
+            ).fetchone()
+        if not row or time.time() - row[1] > self.ttl_seconds:
+            return None
+        return row[0]
+
+    def set(self, url: str, target: str) -> None:
+        """Stores a mapping and drops expired ones."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO links (url, target, created_at) VALUES (?, ?, ?)", (url, target, now)
+            )
+            self._conn.execute("DELETE FROM links WHERE created_at < ?", (now - self.ttl_seconds,))
+            self._conn.commit()
+
+    def resolve(self, url: str) -> Optional[str]:
+        """
+        Resolves one short link, using the cache first.
+
+        Returns:
+            Optional[str]: The target URL, or None if it could not be resolved.
+        """
+        cached = self.get(url)
+        if cached:
+            metrics.increment("cache.links.hits")
+            return cached
+        current = url
+        try:
+            for _ in range(MAX_REDIRECTS):
+                if not self.is_short_link(current):
+                    break
+                metrics.count_api_call('links', 'resolve')
+                response = self.session.head(self._request_url(current), allow_redirects=False,
+                                             timeout=self.request_timeout)
+                location = response.headers.get("Location")
+                if not response.is_redirect or not location:
+                    break
+                current = urljoin(current, location)
+        except requests.RequestException as e:
+            print(f"Node 2: Could not resolve {url}: {e}")
+            return None
+        if current == url:
+            return None
+        self.set(url, current)
+        return current
+
+    def resolve_many(self, urls: Iterable[str], deadline_seconds: Optional[float] = None) -> Dict[str, str]:
+        """
+        Resolves short links concurrently. Links still unresolved at the deadline
+        are left out (their requests finish in the background).
+
+        Args:
+            urls (Iterable[str]): Short links.
+            deadline_seconds (Optional[float]): Time allowed for the whole batch (None waits for all).
+
+        Returns:
+            Dict[str, str]: Target URL per resolved link.
+        """
+        resolved: Dict[str, str] = {}
+        pending = []
+        for url in dict.fromkeys(urls):
+            cached = self.get(url)
+            if cached:
+                metrics.increment("cache.links.hits")
+                resolved[url] = cached
+            else:
+                pending.append(url)
+        if not pending:
+            return resolved
+
+        executor = ThreadPoolExecutor(max_workers=min(self.workers, len(pending)))
+        futures = {executor.submit(self.resolve, url): url for url in pending}
+        done, not_done = wait(futures, timeout=deadline_seconds)
+        executor.shutdown(wait=False, cancel_futures=True)
+        for future in done:
+            target = future.result()
+            if target:
+                resolved[futures[future]] = target
+        if not_done:
+            print(f"Node 2: {len(not_done)} link(s) not resolved before the {deadline_seconds}s deadline.")
+            metrics.increment("links.deadline_exceeded", len(not_done))
+        return resolved
+
+    def _request_url(self, url: str) -> str:
+        if self.tco_base and urlparse(url).hostname == "t.co":
+            return f"{self.tco_base.rstrip('/')}{urlparse(url).path}"
+        return url
@@ -4,15 +4,463 @@ This script orchestrates the flow of data between Discord (Input), Gemini, Googl
 """
 
 import os
+import time
 import asyncio
+from typing import Dict, Any, Optional, List, Set, Tuple
 from dotenv import load_dotenv
-from src.nodes import (
-    Node1_Discord_Input, Node2_Preprocessing, Node3_Gemini, 
-    Node4_Folder_Management, Node5_File_Creation, 
-    Node6_Content_Writing, Node7_Metadata_Extraction, 
-    Node8_Discord_Notification
-)
+# Node classes (and the SDKs behind them) are loaded on first use
+import src.nodes as pipeline_nodes
 import src.utils as utils
+import src.metrics as metrics
+from src.checkpoint import MessageCheckpoint
+from src.job_store import JobStore
+from src.near_duplicates import NearDuplicateIndex
+from src.archive_index import ArchiveIndex, get_archive_index, title_from_name
+from src.drive_sync import DriveSync
+from src.scheduler import AdmissionScheduler, get_remaining_time_ms
+from src.pipeline import Pipeline, Stage, SkipItem, ItemResult
+
+# Messages the folder lookup and the per-message Node 2 stage handle at once
+FOLDER_CONCURRENCY = 2
+PREPROCESS_CONCURRENCY = 2
+
+def get_max_workers() -> int:
+    """
+    Returns the number of messages each network-bound pipeline stage (Drive checks,
+    Gemini, Drive writes) handles in parallel (MAX_WORKERS, default 16). This is an
+    upper bound: each service's adaptive concurrency limiter decides how many of
+    those calls actually run at once.
+    """
+    try:
+        return max(1, int(os.getenv("MAX_WORKERS", "16")))
+    except ValueError:
+        return 16
+
+def get_stage_concurrency(workers: Optional[int] = None) -> Dict[str, int]:
+    """
+    Returns how many messages each pipeline stage ('stage.<name>') actually runs
+    at once: the fixed stages' own concurrency, and for the Gemini and Drive
+    stages MAX_WORKERS capped by the service's current adaptive limit.
+
+    The current limit, not the configured ceiling, is used: it grows by about one
+    slot per limit's worth of successful calls, so within one run the parallelism
+    stays close to it (starting at the initial limit in a cold container), while
+    the ceiling would over-admit. The scheduler re-reads it when admitting.
+    """
+    workers = workers if workers is not None else get_max_workers()
+    drive = min(workers, int(utils.get_concurrency_limiter('drive').limit))
+    return {
+        'stage.folder': FOLDER_CONCURRENCY,
+        'stage.check_existing': drive,
+        'stage.preprocess': PREPROCESS_CONCURRENCY,
+        'stage.dedupe': 1,
+        'stage.summarize': min(workers, int(utils.get_concurrency_limiter('gemini').limit)),
+        'stage.write': drive,
+        'stage.extract': 1,
+    }
+
+def build_input_node() -> Any:
+    """
+    Returns the Node 1 backend selected by DISCORD_INPUT_BACKEND:
+    'rest' (direct REST calls over a pooled session) or 'client' (discord.py, default).
+    """
+    if os.getenv("DISCORD_INPUT_BACKEND", "client").lower() == "rest":
+        return pipeline_nodes.Node1_Discord_REST_Input()
+    return pipeline_nodes.Node1_Discord_Input()
+
+def build_near_duplicate_index() -> Optional[NearDuplicateIndex]:
+    """Returns the near-duplicate index, or None if NEAR_DUP_ENABLED=false or it cannot be opened."""
+    if os.getenv("NEAR_DUP_ENABLED", "true").lower() != "true":
+        return None
+    try:
+        return NearDuplicateIndex()
+    except Exception as e:
+        print(f"Near-duplicate detection disabled: {e}")
+        return None
+
+def build_drive_sync(nodes: Dict[str, Any]) -> Optional[DriveSync]:
+    """
+    Returns the Drive changes sync for the archive index and Node 4's folder cache,
+    or None if DRIVE_SYNC_ENABLED=false or there is no archive index.
+    """
+    if os.getenv("DRIVE_SYNC_ENABLED", "true").lower() != "true" or nodes.get('archive') is None:
+        return None
+    return DriveSync(nodes['archive'], folder_cache=getattr(nodes['node4'], 'cache', None))
+
+def build_nodes() -> Dict[str, Any]:
+    """
+    Initializes Node 2 - Node 7, keyed by 'node2' ... 'node7', plus the
+    near-duplicate index under 'near_duplicates', the archive index under
+    'archive' and the Drive changes sync under 'drive_sync' (None if disabled).
+    """
+    nodes = {
+        'node2': pipeline_nodes.Node2_Preprocessing(),
+        'node3': pipeline_nodes.Node3_Gemini(),
+        'node4': pipeline_nodes.Node4_Folder_Management(),
+        'node5': pipeline_nodes.Node5_File_Creation(),
+        'node6': pipeline_nodes.Node6_Content_Writing(),
+        'node7': pipeline_nodes.Node7_Metadata_Extraction(),
+        'near_duplicates': build_near_duplicate_index(),
+        'archive': get_archive_index(),
+    }
+    nodes['drive_sync'] = build_drive_sync(nodes)
+    return nodes
+
+def is_streaming_enabled() -> bool:
+    """Returns True if STREAMING_MODE is on (Gemini output streamed straight into Drive)."""
+    return os.getenv("STREAMING_MODE", "false").lower() == "true"
+
+def filter_processed_posts(raw_posts: List[Dict[str, Any]], nodes: Dict[str, Any],
+                           jobs: Optional[JobStore] = None) -> Optional[List[Dict[str, Any]]]:
+    """
+    Drops messages that were already handled: first those the job store has
+    written (this includes near duplicates, which have no file of their own),
+    then those in the local archive index, then, for the rest, using one bulk
+    listing of the target day folders instead of one query per message.
+
+    Args:
+        raw_posts (List[Dict[str, Any]]): Raw message data from Node 1.
+        nodes (Dict[str, Any]): Initialized node instances.
+        jobs (Optional[JobStore]): Job store; written but unnotified messages are
+            notified from it instead of being processed again.
+
+    Returns:
+        Optional[List[Dict[str, Any]]]: The messages still to process, or None if the
+        bulk lookup failed and per-message checks are needed.
+    """
+    if not raw_posts:
+        return []
+
+    if jobs is not None:
+        unwritten_posts = [post for post in raw_posts if not JobStore.reached(jobs.get(str(post['id'])), 'written')]
+    else:
+        unwritten_posts = raw_posts
+    archive = nodes.get('archive')
+    archived_ids = archive.processed_message_ids(post['id'] for post in unwritten_posts) if archive is not None else set()
+    unknown_posts = [post for post in unwritten_posts if str(post['id']) not in archived_ids]
+    processed_ids = set()
+    if unknown_posts:
+        folder_ids = {nodes['node4'].get_or_create_folder(post['created_at']) for post in unknown_posts}
+        processed_ids = nodes['node5'].list_processed_message_ids(folder_ids)
+        if processed_ids is None:
+            return None
+
+    pending_posts = [post for post in unknown_posts if str(post['id']) not in processed_ids]
+    skipped = len(raw_posts) - len(pending_posts)
+    if skipped:
+        print(f"Skipping {skipped} message(s) that already have a file.")
+    return pending_posts
+
+def get_stage_timeout() -> Optional[float]:
+    """
+    Returns the per-stage timeout in seconds for the network-bound stages
+    (STAGE_TIMEOUT_SECONDS, default 300; 0 disables it).
+    """
+    try:
+        timeout = float(os.getenv("STAGE_TIMEOUT_SECONDS", "300"))
+    except ValueError:
+        timeout = 300
+    return timeout if timeout > 0 else None
+
+def build_pipeline(nodes: Dict[str, Any], check_existing: bool = True, jobs: Optional[JobStore] = None,
+                   preprocessed: bool = False) -> Pipeline:
+    """
+    Defines the per-message pipeline (Node 4 -> Node 5 -> Node 2 -> near-duplicate check ->
+    Node 3 -> Node 5/6 -> Node 7). Each stage has its own workers, so e.g. the folder
+    lookup of the next message overlaps with the Gemini call of the current one.
+
+    A message whose text is a near duplicate of an already processed one skips
+    Node 3 and Node 5/6: it is linked to the earlier summary's file instead.
+
+    Args:
+        nodes (Dict[str, Any]): Initialized node instances keyed by 'node2' ... 'node7'
+            (and the optional 'near_duplicates' index).
+        check_existing (bool): Whether to run the per-message idempotency check
+            (not needed once filter_processed_posts has run).
+        jobs (Optional[JobStore]): Records each message's generated summary and written
+            file, and lets a re-run reuse them instead of calling Gemini or Drive again.
+        preprocessed (bool): Items already carry 'structured_data' (Node2.process_many ran
+            for the whole batch), so there is no per-message Node 2 stage.
+
+    Returns:
+        Pipeline: Items start with {'post': raw message data} (plus 'structured_data' if
+        preprocessed) and end with 'meta' (Node 7 output).
+    """
+    streaming = is_streaming_enabled()
+    workers = get_max_workers()
+    timeout = get_stage_timeout()
+    index = nodes.get('near_duplicates')
+
+    # Node 4: Folder Management (Check early to avoid redundant processing)
+    def find_folder(post):
+        folder_id = nodes['node4'].get_or_create_folder(post['created_at'])
+        if not folder_id:
+            # Raised (not skipped) so the checkpoint does not move past this message
+            raise RuntimeError("Could not retrieve folder ID.")
+        return folder_id
+
+    # Node 5: Check if file already exists for this message ID (Idempotency)
+    def check_existing_file(post, folder_id):
+        if nodes['node5'].check_file_exists(folder_id, str(post['id'])):
+            raise SkipItem(f"File for message {post['id']} already exists.")
+
+    # Between Node 2 and Node 3: the same story copied with small wording changes
+    # reuses the earlier summary instead of paying for another Gemini call and file
+    def find_duplicate(post, structured_data):
+        if index is None:
+            return None
+        duplicate = index.find(structured_data.get('text', ''))
+        if duplicate and duplicate['message_id'] != str(post['id']):
+            print(f"Message {post['id']} is a near duplicate of {duplicate['message_id']} "
+                  f"(similarity {duplicate['similarity']:.2f}); reusing its summary.")
+            metrics.increment("near_duplicates.hits")
+            return duplicate
+        return None
+
+    # Node 3: Gemini Summary. When streaming, 'content' is only the first line and
+    # the remaining chunks go straight into the Drive upload.
+    def summarize(post, structured_data, duplicate):
+        if duplicate:
+            return None, None
+        job = jobs.get(str(post['id'])) if jobs is not None else None
+        if JobStore.reached(job, 'generated') and job['data'].get('content'):
+            print(f"Resuming message {post['id']}: reusing its generated summary.")
+            metrics.increment("jobs.resumed.generated")
+            if streaming:
+                return utils.peek_first_line(iter([job['data']['content']]))
+            return job['data']['content'], None
+        if streaming:
+            first_line, chunks = utils.peek_first_line(nodes['node3'].generate_summary_stream(structured_data))
+            content = first_line
+        else:
+            content = nodes['node3'].generate_summary(structured_data)
+            chunks = None
+        if not content:
+            if chunks is not None:
+                chunks.close()
+            raise SkipItem("Gemini generated empty content.")
+        # Streamed summaries are never held in full; only the written file is recorded for them
+        if jobs is not None and not streaming:
+            jobs.advance(post['id'], 'generated', content=content)
+        return content, chunks
+
+    # Node 5 + Node 6: File metadata, then the file with its content in one request.
+    # A streamed summary holds its Gemini slot until the chunks are drained or closed.
+    def write_file(post, folder_id, content, chunks, duplicate):
+        try:
+            return upload(post, folder_id, content, chunks, duplicate)
+        finally:
+            if chunks is not None:
+                chunks.close()
+
+    def upload(post, folder_id, content, chunks, duplicate):
+        if duplicate:
+            return duplicate['file']
+        job = jobs.get(str(post['id'])) if jobs is not None else None
+        if JobStore.reached(job, 'written') and job['data'].get('file'):
+            print(f"Resuming message {post['id']}: file already written.")
+            metrics.increment("jobs.resumed.written")
+            return job['data']['file']
+        # Generate File Name from Content (First Line)
+        file_name = utils.format_file_name(content)
+        file_meta = nodes['node5'].build_file_metadata(folder_id, file_name, message_id=str(post['id']))
+        if streaming:
+            updated_file = nodes['node6'].create_file_streaming(file_meta, chunks)
+        else:
+            updated_file = nodes['node6'].create_file_with_content(file_meta, content)
+        if not updated_file:
+            raise RuntimeError("Could not write file to Drive.")
+        if jobs is not None:
+            jobs.advance(post['id'], 'written', file=updated_file)
+        return updated_file
+
+    # Node 7: Metadata Extraction (when streaming, the title comes from the first line).
+    # Near duplicates take the earlier message's metadata, marked for the notification.
+    def extract(post, file, content, structured_data, duplicate):
+        if duplicate:
+            meta = dict(duplicate['meta'], timestamp=utils.get_current_timestamp(),
+                        duplicate_of=duplicate['message_id'])
+            if jobs is not None:
+                jobs.advance(post['id'], 'written', file=file, meta=meta)
+            return meta
+        meta = nodes['node7'].extract(file, content)
+        if jobs is not None:
+            jobs.advance(post['id'], 'written', meta=meta)
+        if index is not None:
+            index.add(str(post['id']), structured_data.get('text', ''), meta, file)
+        return meta
+
+    stages = [Stage("folder", find_folder, inputs=['post'], outputs=['folder_id'],
+                    concurrency=FOLDER_CONCURRENCY, timeout=timeout)]
+    if check_existing:
+        stages.append(Stage("check_existing", check_existing_file, inputs=['post', 'folder_id'], outputs=[],
+                            concurrency=workers, timeout=timeout))
+    if not preprocessed:
+        # Node 2: Preprocess
+        stages.append(Stage("preprocess", nodes['node2'].process, inputs=['post'], outputs=['structured_data'],
+                            concurrency=PREPROCESS_CONCURRENCY))
+    stages += [
+        Stage("dedupe", find_duplicate, inputs=['post', 'structured_data'], outputs=['duplicate']),
+        Stage("summarize", summarize, inputs=['post', 'structured_data', 'duplicate'],
+              outputs=['content', 'chunks'], concurrency=workers, timeout=timeout),
+        Stage("write", write_file, inputs=['post', 'folder_id', 'content', 'chunks', 'duplicate'],
+              outputs=['file'], concurrency=workers, timeout=timeout),
+        Stage("extract", extract, inputs=['post', 'file', 'content', 'structured_data', 'duplicate'],
+              outputs=['meta']),
+    ]
+    return Pipeline(stages, inputs=['post', 'structured_data'] if preprocessed else ['post'])
+
+def process_post(post: Dict[str, Any], nodes: Dict[str, Any], check_existing: bool = True,
+                 jobs: Optional[JobStore] = None) -> Optional[Dict[str, Any]]:
+    """
+    Runs a single message through Node 2 - Node 7 in the calling thread.
+
+    Args:
+        post (Dict[str, Any]): Raw message data from Node 1.
+        nodes (Dict[str, Any]): Initialized node instances keyed by 'node2' ... 'node7'.
+        check_existing (bool): Whether to run the per-message idempotency check.
+        jobs (Optional[JobStore]): Job store to record and resume the message's stages.
+
+    Returns:
+        Optional[Dict[str, Any]]: Metadata from Node 7, or None if the message was skipped.
+    """
+    print(f"Processing message ID: {post['id']}")
+    if jobs is not None:
+        jobs.advance(post['id'], 'fetched')
+    values = build_pipeline(nodes, check_existing, jobs).process({'post': post})
+    return values['meta'] if values else None
+
+def resumed_meta(job: Dict[str, Any], archive: Optional[ArchiveIndex] = None) -> Dict[str, Any]:
+    """
+    Returns the notification metadata of a job written by an earlier run, rebuilt
+    from the archive index (or its Drive file) if that run stopped before Node 7.
+    """
+    if job['data'].get('meta'):
+        return job['data']['meta']
+    if archive is None:
+        archive = get_archive_index()
+    archived = archive.get(job['message_id']) if archive is not None else None
+    if archived:
+        return {"title": archived['title'], "url": archived['web_view_link']}
+    file = job['data'].get('file') or {}
+    return {"title": title_from_name(file.get('name')), "url": file.get('webViewLink')}
+
+def notify(node8: Any, to_notify: List[Tuple[str, Dict[str, Any]]], jobs: Optional[JobStore] = None) -> Set[str]:
+    """
+    Node 8: Sends one notification for the (message ID, metadata) pairs and marks
+    the delivered messages notified. Undelivered ones stay 'written' in the job
+    store and are notified by the next run. Each item carries its 'message_id',
+    which Node 8 reports back unchanged.
+
+    Returns:
+        Set[str]: IDs of the delivered messages.
+    """
+    report = node8.send_notification([dict(meta, message_id=message_id) for message_id, meta in to_notify])
+    delivered = {str(item['message_id']) for item in report['delivered']}
+    if jobs is not None:
+        jobs.mark_notified(delivered)
+    metrics.increment("notifications.delivered", len(delivered))
+    metrics.increment("notifications.failed", len(report['failed']))
+    return delivered
+
+def fetch_posts(node1: Any, checkpoint: MessageCheckpoint) -> List[Dict[str, Any]]:
+    """
+    Node 1: Fetches every message newer than the checkpoint, or the last 15 minutes
+    if there is no checkpoint yet (first run).
+    """
+    after_id = checkpoint.load()
+    if after_id:
+        raw_posts = asyncio.run(node1.fetch_messages_after(after_id))
+    else:
+        # Fetching last 15 minutes of messages to bootstrap the checkpoint
+        raw_posts = asyncio.run(node1.fetch_recent_messages(limit=50, minutes=15))
+    checkpoint.start([post['id'] for post in raw_posts], node1.last_scanned_id)
+    return raw_posts
+
+
+def process_posts(raw_posts: List[Dict[str, Any]], checkpoint: MessageCheckpoint,
+                  jobs: Optional[JobStore] = None,
+                  scheduler: Optional[AdmissionScheduler] = None) -> List[Dict[str, Any]]:
+    """
+    Initializes Node 2 - Node 7 and runs every new message through the pipeline,
+    skipping messages that already have a file.
+
+    Args:
+        raw_posts (List[Dict[str, Any]]): Raw message data from Node 1.
+        checkpoint (MessageCheckpoint): Checkpoint the finished messages are committed to.
+        jobs (Optional[JobStore]): Job store to record and resume each message's stages.
+        scheduler (Optional[AdmissionScheduler]): Admits only the messages that can finish
+            in the remaining time; the others stay uncommitted for the next invocation.
+
+    Returns:
+        List[Dict[str, Any]]: Pipeline values ('post', ..., 'meta') of the processed
+        messages, in admission order (message order by default).
+    """
+    nodes = build_nodes()
+
+    # Files moved, renamed or trashed by hand since the last run must not be trusted locally
+    if nodes.get('drive_sync') is not None:
+        with metrics.timer("drive.sync"):
+            nodes['drive_sync'].sync()
+
+    # Idempotency: one bulk lookup per day folder instead of one query per message
+    pending_posts = filter_processed_posts(raw_posts, nodes, jobs)
+    check_existing = pending_posts is None
+    if check_existing:
+        pending_posts = raw_posts
+    else:
+        pending_ids = {post['id'] for post in pending_posts}
+        for post in raw_posts:
+            if post['id'] not in pending_ids:
+                checkpoint.commit(str(post['id']))
+
+    if scheduler is not None:
+        pending_posts, _ = scheduler.admit(pending_posts)
+
+    def on_item_done(result: ItemResult) -> None:
+        metrics.increment(f"messages.{result.status}")
+        # Processed or deliberately skipped messages move the checkpoint; failed ones do not
+        if result.status != 'failed':
+            checkpoint.commit(str(result.values['post']['id']))
+
+    if jobs is not None:
+        for post in pending_posts:
+            jobs.advance(post['id'], 'fetched')
+
+    # Node 2 for the whole batch at once, so all t.co links resolve concurrently
+    try:
+        with metrics.timer("node2.preprocess"):
+            structured = nodes['node2'].process_many(pending_posts) if pending_posts else []
+    except Exception as e:
+        # One bad message must not fail the batch: preprocess each one inside the pipeline instead
+        print(f"Batch preprocessing failed ({e}); preprocessing messages one by one.")
+        structured = None
+
+    if structured is None:
+        pipeline = build_pipeline(nodes, check_existing, jobs)
+        items = [{'post': post} for post in pending_posts]
+    else:
+        pipeline = build_pipeline(nodes, check_existing, jobs, preprocessed=True)
+        items = [{'post': post, 'structured_data': data} for post, data in zip(pending_posts, structured)]
+
+    # Copies of one story in the same batch: only the first goes through Gemini and
+    # Drive; the others run once it is indexed, so the dedupe stage reuses its summary
+    followers: Dict[str, str] = {}
+    if structured is not None and nodes.get('near_duplicates') is not None:
+        followers = nodes['near_duplicates'].group_batch(
+            (str(item['post']['id']), item['structured_data'].get('text', '')) for item in items)
+    copies = [item for item in items if str(item['post']['id']) in followers]
+    # Messages move through the stages independently
+    results = pipeline.run([item for item in items if str(item['post']['id']) not in followers],
+                           on_item_done=on_item_done)
+    if copies:
+        print(f"Processing {len(copies)} near-duplicate copy(ies) after the messages they repeat.")
+        results += pipeline.run(copies, on_item_done=on_item_done)
+
+    # Results keep admission order
+    position = {str(post['id']): i for i, post in enumerate(pending_posts)}
+    results.sort(key=lambda result: position[str(result.values['post']['id'])])
+    return [result.values for result in results if result.status == 'done' and result.values['meta']]
 
 def main(event=None, context=None) -> None:
     """
@@ -23,98 +471,77 @@ def main(event=None, context=None) -> None:
         context: Lambda context data
     
     1. Loads environment variables.
-    2. Initializes all workflow nodes.
-    3. Fetches messages from Discord containing X links.
-    4. Processes each message through the pipeline:
-       - Preprocessing
-       - Summarization (Gemini with Grounding)
+    2. Fetches messages from Discord newer than the checkpoint.
+    3. Initializes the remaining workflow nodes (only if there is something to process).
+    4. Filters out messages that already have a file (one bulk Drive lookup) and
+       defers those that cannot finish in the remaining time (see AdmissionScheduler).
+    5. Preprocesses the batch (Node 2: links extracted, t.co links resolved
+       concurrently), then processes messages through the pipeline (see
+       build_pipeline); messages can be in different stages at the same time:
        - Folder Management (Drive)
-       - File Creation (Drive)
-       - Content Writing (Drive)
+       - Summarization (Gemini with Grounding)
+       - File Creation + Content Writing (Drive, single request)
        - Metadata Extraction
-    5. Sends a summary notification back to Discord.
+    6. Sends a summary notification back to Discord, including messages an
+       earlier run wrote but never notified (see JobStore).
+    7. Emits one structured metrics record (EMF) for the run.
     """
     # 1. Setup
     load_dotenv()
     print("Starting X Bookmark Summarizer Agent (Discord Input Mode)...")
+    run_metrics = metrics.start_run()
+    run_start = time.perf_counter()
+    # Only admit the messages that can finish before the Lambda time limit,
+    # at the parallelism each stage actually gets (the limiters cap MAX_WORKERS)
+    scheduler = AdmissionScheduler(get_remaining_time_ms(context), workers=get_max_workers(),
+                                   stage_concurrency=get_stage_concurrency)
     
-    # Initialize Nodes
-    node1 = Node1_Discord_Input()
-    node2 = Node2_Preprocessing()
-    node3 = Node3_Gemini()
-    node4 = Node4_Folder_Management()
-    node5 = Node5_File_Creation()
-    node6 = Node6_Content_Writing()
-    node7 = Node7_Metadata_Extraction()
-    node8 = Node8_Discord_Notification(os.getenv("DISCORD_WEBHOOK_URL"))
+    # Initialize Node 1 only; the rest are built once there is something to process
+    node1 = build_input_node()
+    checkpoint = MessageCheckpoint(drive_service_factory=utils.get_drive_service,
+                                   drive_folder_id=os.getenv("DRIVE_ROOT_FOLDER_ID"))
+    jobs = JobStore(drive_service_factory=utils.get_drive_service,
+                    drive_folder_id=os.getenv("DRIVE_ROOT_FOLDER_ID"))
 
     # 2. Execution Flow
     try:
-        # Node 1: Fetch Discord Messages (Sync wrapper for async call)
-        # Fetching last 15 minutes of messages to ensure we catch recent posts even with minor time drifts
-        # The deduplication logic in Node 5 will prevent double processing.
-        raw_posts = asyncio.run(node1.fetch_recent_messages(limit=50, minutes=15))
-        
-        title_list = []
-        
-        for post in raw_posts:
-            print(f"Processing message ID: {post['id']}")
-            
-            # Node 4: Folder Management (Check early to avoid redundant processing)
-            post_date = post['created_at'] 
-            folder_id = node4.get_or_create_folder(post_date)
-            
-            if not folder_id:
-                print("Skipping: Could not retrieve folder ID.")
-                continue
-
-            # Check if file already exists for this message ID (Idempotency)
-            if node5.check_file_exists(folder_id, str(post['id'])):
-                print(f"Skipping: File for message {post['id']} already exists.")
-                continue
-            
-            # Node 2: Preprocess
-            structured_data = node2.process(post)
-            
-            # Node 3: Gemini Summary
-            content = node3.generate_summary(structured_data)
-            
-            if not content:
-                print("Skipping: Gemini generated empty content.")
-                continue
+        # Node 1: Fetch Discord Messages newer than the checkpoint (Sync wrapper for async call)
+        with run_metrics.timer("node1.fetch"):
+            raw_posts = fetch_posts(node1, checkpoint)
+        run_metrics.increment("messages.fetched", len(raw_posts))
 
-            # Generate File Name from Content (First Line)
-            file_name = utils.format_file_name(content)
-            
-            if file_name.startswith("Untitled") and "Error" in content:
-                 # If utils returned Untitled but content has error, use error name
-                 file_name = "Error Generating Summary.md"
-            
-                # Node 5: File Creation
-            file_meta = node5.create_file(folder_id, file_name, message_id=str(post['id']))
-                
-            if file_meta:
-                # Node 6: Content Writing
-                updated_file = node6.write_content(file_meta, content)
-                
-                if updated_file:
-                    # Node 7: Metadata Extraction
-                    meta = node7.extract(updated_file, content)
-                    title_list.append(meta)
-            
-            # Optional: Sleep to avoid rate limits
-            # time.sleep(2)
+        # Most polls stop here, before Gemini, Drive or the webhook client are loaded
+        processed = process_posts(raw_posts, checkpoint, jobs, scheduler) if raw_posts else []
+
+        # (message ID, metadata) to notify: messages an earlier run wrote but never
+        # notified (e.g. it timed out), then the ones processed in this run
+        to_notify = [(job['message_id'], resumed_meta(job))
+                     for job in jobs.unnotified(exclude=[str(values['post']['id']) for values in processed])]
+        if to_notify:
+            print(f"Resuming notification of {len(to_notify)} message(s) from an earlier run.")
+            run_metrics.increment("jobs.resumed.notify", len(to_notify))
+        to_notify += [(str(values['post']['id']), values['meta']) for values in processed]
             
         # Node 8: Discord Notification
         # Notify immediately for items processed in this run
-        if title_list:
-            node8.send_notification(title_list)
+        if to_notify:
+            node8 = pipeline_nodes.Node8_Discord_Notification(os.getenv("DISCORD_WEBHOOK_URL"))
+            with run_metrics.timer("node8.notify"):
+                delivered = notify(node8, to_notify, jobs)
+            for values in processed:
+                if str(values['post']['id']) in delivered:
+                    run_metrics.record_capture_to_notify(values['post'].get('created_at'))
         else:
             print("No new items processed in this run.")
             
     except Exception as e:
         print(f"An error occurred during execution: {e}")
 
+    # Persist the cursor (and unfinished jobs) to Drive so a cold start resumes where this run stopped
+    checkpoint.flush()
+    jobs.flush()
+    run_metrics.observe("run", (time.perf_counter() - run_start) * 1000)
+    run_metrics.emit()
     print("Execution finished.")
 
 if __name__ == "__main__":
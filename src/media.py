@@ -0,0 +1,360 @@
+import io
+import os
+import math
+import time
+import sqlite3
+import hashlib
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qsl, urlencode, urlunparse
+import requests
+from src.clients import get_client, reset_clients
+import src.metrics as metrics
+
+DEFAULT_CACHE_DIR = "/tmp/media_cache"
+# Signature parameters of Discord CDN links; they rotate while the file stays the same
+VOLATILE_URL_PARAMS = {"ex", "is", "hm"}
+# Gemini bills an image up to 384px on both sides as one 258-token tile and
+# tiles larger images into 768x768 crops of 258 tokens each
+IMAGE_TILE_TOKENS = 258
+IMAGE_SMALL_SIDE = 384
+IMAGE_TILE_SIDE = 768
+# Downscaling to one tile keeps every image at 258 tokens, so the default
+# MEDIA_MAX_IMAGES (4) fit in the default MEDIA_MAX_TOKENS (2000)
+DEFAULT_MAX_SIDE = IMAGE_TILE_SIDE
+
+# Set once the process pool could not be started (e.g. no /dev/shm on Lambda)
+_process_pool_unavailable = False
+
+def estimate_image_tokens(width: int, height: int) -> int:
+    """Returns the number of prompt tokens Gemini counts for an image of this size."""
+    if width <= IMAGE_SMALL_SIDE and height <= IMAGE_SMALL_SIDE:
+        return IMAGE_TILE_TOKENS
+    return math.ceil(width / IMAGE_TILE_SIDE) * math.ceil(height / IMAGE_TILE_SIDE) * IMAGE_TILE_TOKENS
+
+def downscale_image(data: bytes, max_side: int, quality: int) -> Tuple[bytes, str, int, int]:
+    """
+    Shrinks an image to at most `max_side` pixels on its longest side and
+    recompresses it as JPEG. Runs in a worker process, so it only takes and
+    returns plain values.
+
+    Args:
+        data (bytes): Original image bytes (any format Pillow reads; animations use the first frame).
+        max_side (int): Longest side of the result in pixels.
+        quality (int): JPEG quality.
+
+    Returns:
+        Tuple[bytes, str, int, int]: Image bytes, MIME type, width and height. The
+        original is kept if it is already small enough and recompressing would not shrink it.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as original:
+        original_format = original.format
+        image = ImageOps.exif_transpose(original)
+        resized = max(image.size) > max_side
+        if resized:
+            image.thumbnail((max_side, max_side), Image.LANCZOS)
+        if image.mode not in ("RGB", "L"):
+            # JPEG has no alpha; flatten transparent areas onto white
+            rgba = image.convert("RGBA")
+            image = Image.new("RGB", rgba.size, (255, 255, 255))
+            image.paste(rgba, mask=rgba.split()[3])
+        output = io.BytesIO()
+        image.save(output, "JPEG", quality=quality, optimize=True)
+        width, height = image.size
+
+    if not resized and len(data) <= output.tell() and original_format in ("JPEG", "PNG", "WEBP"):
+        return data, f"image/{original_format.lower()}", width, height
+    return output.getvalue(), "image/jpeg", width, height
+
+def get_process_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    Returns the process-wide pool that downscales images (MEDIA_PROCESS_WORKERS,
+    default one per CPU), or None to downscale in the calling thread: when it is
+    set to 0 or processes cannot be started here.
+    """
+    global _process_pool_unavailable
+    workers = int(os.getenv("MEDIA_PROCESS_WORKERS", str(os.cpu_count() or 1)))
+    if workers <= 0 or _process_pool_unavailable:
+        return None
+
+    def build_pool():
+        global _process_pool_unavailable
+        try:
+            # spawn: the pipeline's worker threads may hold locks a forked child would inherit
+            return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        except (OSError, NotImplementedError, ImportError) as e:
+            print(f"Media: Process pool unavailable, resizing in threads: {e}")
+            _process_pool_unavailable = True
+            return None
+    return get_client('media_process_pool', build_pool)
+
+class MediaCache:
+    """
+    Content-addressed cache of downscaled images.
+
+    Images are stored under the hash of their original bytes plus the resize
+    settings, so the same picture reached through different links is resized
+    once; an index from link to image lets repeated links skip the download.
+    Blobs live in a directory under /tmp (indexed in SQLite) so warm Lambda
+    invocations reuse them. The least recently used images are evicted once
+    the cache grows past max_bytes.
+    """
+    def __init__(self, directory: Optional[str] = None, max_bytes: Optional[int] = None) -> None:
+        """
+        Args:
+            directory (Optional[str]): Cache directory. Defaults to MEDIA_CACHE_DIR or
+                /tmp/media_cache. An empty string keeps the cache in memory only.
+            max_bytes (Optional[int]): Size bound of the stored images. Defaults to
+                MEDIA_CACHE_MAX_BYTES or 256 MB.
+        """
+        self.directory = directory if directory is not None else os.getenv("MEDIA_CACHE_DIR", DEFAULT_CACHE_DIR)
+        if max_bytes is None:
+            max_bytes = int(os.getenv("MEDIA_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+        self.max_bytes = max_bytes
+        self._blobs: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+        self._conn = sqlite3.connect(
+            os.path.join(self.directory, "index.sqlite3") if self.directory else ":memory:",
+            check_same_thread=False
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS urls (url TEXT PRIMARY KEY, key TEXT NOT NULL)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS images ("
+            " key TEXT PRIMARY KEY,"
+            " mime_type TEXT NOT NULL,"
+            " width INTEGER NOT NULL,"
+            " height INTEGER NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def normalize_url(url: str) -> str:
+        """Drops the rotating signature parameters of Discord CDN links."""
+        parsed = urlparse(url)
+        query = [(name, value) for name, value in parse_qsl(parsed.query) if name not in VOLATILE_URL_PARAMS]
+        return urlunparse(parsed._replace(query=urlencode(query)))
+
+    @staticmethod
+    def make_key(data: bytes, max_side: int, quality: int) -> str:
+        """Builds the content address of an image and its resize settings."""
+        return f"{hashlib.sha256(data).hexdigest()}-{max_side}q{quality}"
+
+    def key_for_url(self, url: str) -> Optional[str]:
+        """Returns the key of the image last downloaded from this link, if it is still cached."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT urls.key FROM urls JOIN images ON images.key = urls.key WHERE urls.url = ?",
+                (self.normalize_url(url),)
+            ).fetchone()
+        return row[0] if row else None
+
+    def remember_url(self, url: str, key: str) -> None:
+        """Points a link at a cached image."""
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO urls (url, key) VALUES (?, ?)", (self.normalize_url(url), key))
+            self._conn.commit()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Returns the cached image {'key', 'data', 'mime_type', 'width', 'height'}, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT mime_type, width, height FROM images WHERE key = ?", (key,)
+            ).fetchone()
+            if not row:
+                return None
+            data = self._read_blob(key)
+            if data is None:
+                self._conn.execute("DELETE FROM images WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE images SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        mime_type, width, height = row
+        return {'key': key, 'data': data, 'mime_type': mime_type, 'width': width, 'height': height}
+
+    def set(self, key: str, data: bytes, mime_type: str, width: int, height: int) -> None:
+        """Stores an image and evicts the least recently used ones beyond max_bytes."""
+        with self._lock:
+            self._write_blob(key, data)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO images (key, mime_type, width, height, size, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, mime_type, width, height, len(data), time.time())
+            )
+            total = 0
+            for old_key, size in self._conn.execute(
+                    "SELECT key, size FROM images ORDER BY last_used DESC").fetchall():
+                total += size
+                if total > self.max_bytes and old_key != key:
+                    self._conn.execute("DELETE FROM images WHERE key = ?", (old_key,))
+                    self._delete_blob(old_key)
+            self._conn.execute("DELETE FROM urls WHERE key NOT IN (SELECT key FROM images)")
+            self._conn.commit()
+
+    def _blob_path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def _read_blob(self, key: str) -> Optional[bytes]:
+        if not self.directory:
+            return self._blobs.get(key)
+        try:
+            with open(self._blob_path(key), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_blob(self, key: str, data: bytes) -> None:
+        if not self.directory:
+            self._blobs[key] = data
+            return
+        path = self._blob_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _delete_blob(self, key: str) -> None:
+        if not self.directory:
+            self._blobs.pop(key, None)
+            return
+        try:
+            os.remove(self._blob_path(key))
+        except OSError:
+            pass
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM images").fetchone()[0]
+
+class MediaPipeline:
+    """
+    Turns a post's media_urls into images ready to send to Gemini as inline parts.
+
+    Images are downloaded concurrently over a shared keep-alive session,
+    downscaled and recompressed in a process pool (fewer upload bytes and
+    image tokens) and kept in a MediaCache. The result stays within per-post
+    budgets for the number of images, their bytes and their prompt tokens;
+    images that do not fit are left out.
+    """
+    def __init__(self, cache: Optional[MediaCache] = None) -> None:
+        """
+        Args:
+            cache (Optional[MediaCache]): Image cache. Defaults to the /tmp backed cache.
+        """
+        self.max_side = int(os.getenv("MEDIA_MAX_SIDE", str(DEFAULT_MAX_SIDE)))
+        self.quality = int(os.getenv("MEDIA_JPEG_QUALITY", "80"))
+        self.max_images = int(os.getenv("MEDIA_MAX_IMAGES", "4"))
+        self.max_bytes = int(os.getenv("MEDIA_MAX_BYTES", str(4 * 1024 * 1024)))
+        self.max_tokens = int(os.getenv("MEDIA_MAX_TOKENS", "2000"))
+        self.max_download_bytes = int(os.getenv("MEDIA_MAX_DOWNLOAD_BYTES", str(20 * 1024 * 1024)))
+        self.fetch_workers = max(1, int(os.getenv("MEDIA_FETCH_WORKERS", "4")))
+        self.cache = cache
+        if self.cache is None:
+            try:
+                self.cache = MediaCache()
+            except Exception as e:
+                print(f"Media: Image cache disabled: {e}")
+                self.cache = MediaCache(directory="")
+        self.session = get_client('media_http', requests.Session)
+
+    def prepare(self, media_urls: List[str]) -> List[Dict[str, Any]]:
+        """
+        Downloads and downscales the images of one post.
+
+        Args:
+            media_urls (List[str]): Image links from Node 2.
+
+        Returns:
+            List[Dict[str, Any]]: {'key', 'data', 'mime_type', 'width', 'height', 'tokens'} per
+            image, in link order, within the per-post budgets. Links that fail are skipped.
+        """
+        urls = list(dict.fromkeys(url for url in media_urls if url))[:self.max_images]
+        if not urls:
+            return []
+        if len(urls) == 1:
+            images = [self._load(urls[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.fetch_workers, len(urls))) as executor:
+                images = list(executor.map(self._load, urls))
+
+        selected = []
+        total_bytes = 0
+        total_tokens = 0
+        seen = set()
+        for image in images:
+            if image is None or image['key'] in seen:
+                continue
+            seen.add(image['key'])
+            image['tokens'] = estimate_image_tokens(image['width'], image['height'])
+            if total_bytes + len(image['data']) > self.max_bytes or total_tokens + image['tokens'] > self.max_tokens:
+                metrics.increment("media.over_budget")
+                continue
+            total_bytes += len(image['data'])
+            total_tokens += image['tokens']
+            selected.append(image)
+        metrics.increment("media.images", len(selected))
+        metrics.increment("media.bytes", total_bytes)
+        return selected
+
+    def _load(self, url: str) -> Optional[Dict[str, Any]]:
+        """Returns one downscaled image from the cache or the network, or None if it cannot be used."""
+        key = self.cache.key_for_url(url)
+        if key:
+            image = self.cache.get(key)
+            if image:
+                metrics.increment("cache.media.hits")
+                return image
+        try:
+            data = self._download(url)
+            key = MediaCache.make_key(data, self.max_side, self.quality)
+            image = self.cache.get(key)
+            if image is None:
+                processed, mime_type, width, height = self._downscale(data)
+                self.cache.set(key, processed, mime_type, width, height)
+                image = {'key': key, 'data': processed, 'mime_type': mime_type, 'width': width, 'height': height}
+            else:
+                metrics.increment("cache.media.hits")
+            self.cache.remember_url(url, key)
+            return image
+        except Exception as e:
+            print(f"Media: Skipping {url}: {e}")
+            return None
+
+    def _download(self, url: str) -> bytes:
+        """Downloads an image, refusing bodies larger than max_download_bytes."""
+        metrics.count_api_call('media', 'download')
+        with self.session.get(url, timeout=15, stream=True) as response:
+            response.raise_for_status()
+            content_type = response.headers.get("Content-Type", "")
+            if content_type and not content_type.startswith("image/"):
+                raise ValueError(f"not an image ({content_type})")
+            chunks = []
+            size = 0
+            for chunk in response.iter_content(64 * 1024):
+                size += len(chunk)
+                if size > self.max_download_bytes:
+                    raise ValueError(f"larger than {self.max_download_bytes} bytes")
+                chunks.append(chunk)
+        return b"".join(chunks)
+
+    def _downscale(self, data: bytes) -> Tuple[bytes, str, int, int]:
+        """Runs downscale_image in the process pool, or in this thread without one."""
+        with metrics.timer("media.downscale"):
+            pool = get_process_pool()
+            if pool is not None:
+                try:
+                    return pool.submit(downscale_image, data, self.max_side, self.quality).result()
+                except BrokenProcessPool as e:
+                    # A worker died (e.g. out of memory); start a fresh pool next time
+                    print(f"Media: Process pool failed, resizing in thread: {e}")
+                    reset_clients('media_process_pool')
+            return downscale_image(data, self.max_side, self.quality)
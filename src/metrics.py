@@ -0,0 +1,270 @@
+"""
+Run-level instrumentation: per-stage latency, outbound API call counts, token
+usage and capture-to-notify latency, emitted as one CloudWatch Embedded Metric
+Format (EMF) JSON line per run. Each run's summary is also appended to a local
+history file so p50/p95 can be computed across runs:
+
+    python -m src.metrics [--path /tmp/metrics_history.jsonl]
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+DEFAULT_NAMESPACE = "XBookmarkAgent"
+DEFAULT_HISTORY_PATH = "/tmp/metrics_history.jsonl"
+SERVICE_NAME = "x-bookmark-agent"
+# EMF accepts at most 100 values per metric
+MAX_EMF_VALUES = 100
+
+# Set by set_debug; None follows DEBUG, read on each check so a .env loaded after import counts
+_debug_override: Optional[bool] = None
+
+def is_debug_enabled() -> bool:
+    """Returns True if DEBUG output is on (set_debug, else DEBUG=true)."""
+    if _debug_override is not None:
+        return _debug_override
+    return os.getenv("DEBUG", "false").lower() == "true"
+
+def set_debug(enabled: Optional[bool]) -> None:
+    """Turns DEBUG output on or off at runtime (None goes back to the DEBUG variable)."""
+    global _debug_override
+    _debug_override = enabled
+
+def debug(message: str, *args: Any) -> None:
+    """
+    Prints a DEBUG line. The message is only formatted (`message % args`) when
+    debugging is on, so passing large objects costs nothing otherwise.
+    """
+    if not is_debug_enabled():
+        return
+    print(f"DEBUG: {message % args if args else message}")
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile (pct in 0-100) of the values, or None if there are none."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+class RunMetrics:
+    """
+    Thread-safe collector for one run.
+
+    Timings are lists of millisecond samples (e.g. one per message for
+    'stage.summarize'); counters are totals (e.g. 'api.drive.files.list').
+    """
+    def __init__(self) -> None:
+        self.started_at = time.time()
+        self.timings: Dict[str, List[float]] = {}
+        self.counters: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, milliseconds: float) -> None:
+        """Records one latency sample."""
+        with self._lock:
+            self.timings.setdefault(name, []).append(milliseconds)
+
+    def increment(self, name: str, value: float = 1) -> None:
+        """Adds to a counter."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def count_api_call(self, service: str, operation: str) -> None:
+        """Counts one outbound request, e.g. ('drive', 'files.list')."""
+        self.increment(f"api.{service}.{operation}")
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        """Records the wall time of the block (also when it raises)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, (time.perf_counter() - start) * 1000)
+
+    def record_capture_to_notify(self, created_at: str) -> None:
+        """Records the time from the Discord message's created_at (ISO 8601) until now."""
+        try:
+            created = datetime.fromisoformat(created_at)
+        except (TypeError, ValueError):
+            return
+        if created.tzinfo is None:
+            created = created.replace(tzinfo=timezone.utc)
+        self.observe("capture_to_notify", (datetime.now(timezone.utc) - created).total_seconds() * 1000)
+
+    def drain(self) -> "RunMetrics":
+        """
+        Moves the samples collected so far into a new collector and starts over.
+        Other threads can keep recording here meanwhile: every sample ends up in
+        exactly one of the two collectors.
+        """
+        drained = RunMetrics()
+        with self._lock:
+            drained.started_at, self.started_at = self.started_at, time.time()
+            drained.timings, self.timings = self.timings, {}
+            drained.counters, self.counters = self.counters, {}
+        return drained
+
+    def is_empty(self) -> bool:
+        """Returns True if nothing was recorded."""
+        with self._lock:
+            return not self.timings and not self.counters
+
+    def summary(self) -> Dict[str, Any]:
+        """Returns count/p50/p95/max per timing plus the counters."""
+        with self._lock:
+            timings = {name: list(values) for name, values in self.timings.items()}
+            counters = dict(self.counters)
+        return {
+            "timings": {
+                name: {"count": len(values), "p50": percentile(values, 50),
+                       "p95": percentile(values, 95), "max": max(values)}
+                for name, values in timings.items()
+            },
+            "counters": counters,
+        }
+
+    def to_emf(self, namespace: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Builds the EMF record for this run: every timing (as a list of samples)
+        and counter is a metric; the p50/p95 summary rides along as a property.
+        """
+        with self._lock:
+            timings = {name: list(values) for name, values in self.timings.items()}
+            counters = dict(self.counters)
+        record: Dict[str, Any] = {"Service": SERVICE_NAME}
+        definitions = []
+        for name, values in sorted(timings.items()):
+            record[name] = values[:MAX_EMF_VALUES]
+            definitions.append({"Name": name, "Unit": "Milliseconds"})
+        for name, value in sorted(counters.items()):
+            record[name] = value
+            definitions.append({"Name": name, "Unit": "Count"})
+        record["summary"] = self.summary()["timings"]
+        record["_aws"] = {
+            "Timestamp": int(self.started_at * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": namespace or os.getenv("METRICS_NAMESPACE", DEFAULT_NAMESPACE),
+                "Dimensions": [["Service"]],
+                "Metrics": definitions,
+            }],
+        }
+        return record
+
+    def emit(self, history_path: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Prints the EMF record as one JSON line and appends the run to the history file.
+
+        Args:
+            history_path (Optional[str]): History file. Defaults to METRICS_HISTORY_PATH or
+                /tmp/metrics_history.jsonl. An empty string disables the history.
+
+        Returns:
+            Optional[Dict[str, Any]]: The emitted record, or None if METRICS_ENABLED=false.
+        """
+        if os.getenv("METRICS_ENABLED", "true").lower() != "true":
+            return None
+        record = self.to_emf()
+        print(json.dumps(record, separators=(",", ":"), default=str))
+        path = history_path if history_path is not None else os.getenv("METRICS_HISTORY_PATH", DEFAULT_HISTORY_PATH)
+        if path:
+            self._append_history(path)
+        return record
+
+    def _append_history(self, path: str) -> None:
+        with self._lock:
+            entry = {"started_at": self.started_at, "timings": self.timings, "counters": self.counters}
+            line = json.dumps(entry, separators=(",", ":"))
+        try:
+            max_runs = int(os.getenv("METRICS_HISTORY_MAX_RUNS", "500"))
+            lines = []
+            if os.path.exists(path):
+                with open(path, "r") as f:
+                    lines = f.read().splitlines()
+            lines = (lines + [line])[-max_runs:]
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w") as f:
+                f.write("\n".join(lines) + "\n")
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Metrics: Could not update history {path}: {e}")
+
+def summarize_history(path: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Computes p50/p95 across the runs in the history file: over all samples for
+    timings, and over the per-run totals for counters.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: {metric: {"runs", "count", "p50", "p95"}}
+    """
+    path = path if path is not None else os.getenv("METRICS_HISTORY_PATH", DEFAULT_HISTORY_PATH)
+    samples: Dict[str, List[float]] = {}
+    runs: Dict[str, int] = {}
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            for name, values in entry.get("timings", {}).items():
+                samples.setdefault(name, []).extend(values)
+                runs[name] = runs.get(name, 0) + 1
+            for name, value in entry.get("counters", {}).items():
+                samples.setdefault(name, []).append(value)
+                runs[name] = runs.get(name, 0) + 1
+    return {
+        name: {"runs": runs[name], "count": len(values),
+               "p50": percentile(values, 50), "p95": percentile(values, 95)}
+        for name, values in sorted(samples.items())
+    }
+
+_current = RunMetrics()
+
+def start_run() -> RunMetrics:
+    """Starts collecting a new run and returns its collector."""
+    global _current
+    _current = RunMetrics()
+    return _current
+
+def current() -> RunMetrics:
+    """Returns the collector of the current run."""
+    return _current
+
+def observe(name: str, milliseconds: float) -> None:
+    _current.observe(name, milliseconds)
+
+def increment(name: str, value: float = 1) -> None:
+    _current.increment(name, value)
+
+def count_api_call(service: str, operation: str) -> None:
+    _current.count_api_call(service, operation)
+
+def timer(name: str):
+    return _current.timer(name)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Prints p50/p95 of the recorded runs.")
+    parser.add_argument("--path", default=None, help="History file (default: METRICS_HISTORY_PATH)")
+    args = parser.parse_args()
+
+    summary = summarize_history(args.path)
+    if not summary:
+        print("No runs recorded.")
+        sys.exit(1)
+    print(f"{'metric':40} {'runs':>5} {'count':>6} {'p50':>12} {'p95':>12}")
+    for name, stats in summary.items():
+        print(f"{name:40} {stats['runs']:5d} {stats['count']:6d} {stats['p50']:12.1f} {stats['p95']:12.1f}")
+
+if __name__ == "__main__":
+    main()
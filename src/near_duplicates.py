@@ -0,0 +1,261 @@
+import os
+import json
+import time
+import array
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from src.summary_cache import normalize_text
+
+DEFAULT_INDEX_PATH = "/tmp/near_duplicates.sqlite3"
+# MinHash signature length; split into LSH bands chosen for the threshold
+NUM_HASHES = 64
+SHINGLE_CHARS = 4
+# Empty bins are filled from the next non-empty one; this keeps them distinguishable
+DENSIFY_OFFSET = 0x9E3779B97F4A7C15
+MASK_64 = (1 << 64) - 1
+
+# Candidates are verified against the full signature, so a missed duplicate
+# costs more than an extra candidate when choosing the band layout
+FALSE_POSITIVE_WEIGHT = 0.3
+FALSE_NEGATIVE_WEIGHT = 0.7
+
+def choose_bands(threshold: float, num_hashes: int = NUM_HASHES) -> int:
+    """
+    Returns the number of LSH bands b (of r = num_hashes / b rows each) that
+    minimizes the weighted probability mass of false positives below the
+    threshold and false negatives above it. Two posts of similarity s share
+    at least one bucket with probability 1 - (1 - s^r)^b.
+    """
+    steps = 100
+
+    def error(bands: int) -> float:
+        rows = num_hashes // bands
+        total = 0.0
+        for i in range(steps):
+            s = (i + 0.5) / steps
+            collision = 1 - (1 - s ** rows) ** bands
+            total += FALSE_POSITIVE_WEIGHT * collision if s < threshold else FALSE_NEGATIVE_WEIGHT * (1 - collision)
+        return total
+
+    return min((b for b in range(1, num_hashes + 1) if num_hashes % b == 0), key=error)
+
+def minhash_signature(text: str, num_hashes: int = NUM_HASHES) -> List[int]:
+    """
+    Returns the MinHash signature of a text's character shingles, using
+    one-permutation hashing: every shingle is hashed once and kept in one of
+    num_hashes bins (the minimum per bin), so the cost does not grow with
+    the signature length. Empty bins are densified from the next bin.
+    """
+    text = normalize_text(text).lower()
+    bins: List[Optional[int]] = [None] * num_hashes
+    for i in range(max(1, len(text) - SHINGLE_CHARS + 1)):
+        value = int.from_bytes(hashlib.blake2b(text[i:i + SHINGLE_CHARS].encode("utf-8"), digest_size=8).digest(), "big")
+        position, value = value % num_hashes, value // num_hashes
+        if bins[position] is None or value < bins[position]:
+            bins[position] = value
+    signature = []
+    for position in range(num_hashes):
+        offset = 0
+        while bins[(position + offset) % num_hashes] is None:
+            offset += 1
+        signature.append((bins[(position + offset) % num_hashes] + offset * DENSIFY_OFFSET) & MASK_64)
+    return signature
+
+def similarity(first: List[int], second: List[int]) -> float:
+    """Estimated Jaccard similarity of two signatures: the share of equal positions."""
+    return sum(1 for a, b in zip(first, second) if a == b) / len(first)
+
+class NearDuplicateIndex:
+    """
+    Persistent index of processed post texts for finding near-identical copies
+    (the same story reposted by several accounts with small wording changes).
+
+    Every post is stored with its MinHash signature and the file and
+    notification metadata of its summary. Signatures are split into LSH bands,
+    and each band value is an indexed bucket, so a lookup only compares the
+    posts sharing a bucket instead of the whole index. Backed by SQLite under
+    /tmp so warm Lambda invocations reuse it; entries expire after a TTL.
+    """
+    def __init__(self, path: Optional[str] = None, threshold: Optional[float] = None,
+                 ttl_seconds: Optional[int] = None, min_chars: Optional[int] = None) -> None:
+        """
+        Args:
+            path (Optional[str]): SQLite file. Defaults to NEAR_DUP_INDEX_PATH or
+                /tmp/near_duplicates.sqlite3. An empty string keeps the index in memory only.
+            threshold (Optional[float]): Estimated similarity from which a post is a near
+                duplicate. Defaults to NEAR_DUP_THRESHOLD or 0.7.
+            ttl_seconds (Optional[int]): Entry lifetime. Defaults to NEAR_DUP_TTL_SECONDS or 30 days.
+            min_chars (Optional[int]): Shorter texts are neither indexed nor matched (too little
+                text to tell copies from different posts). Defaults to NEAR_DUP_MIN_CHARS or 50.
+        """
+        self.path = path if path is not None else os.getenv("NEAR_DUP_INDEX_PATH", DEFAULT_INDEX_PATH)
+        if threshold is None:
+            threshold = float(os.getenv("NEAR_DUP_THRESHOLD", "0.7"))
+        if ttl_seconds is None:
+            ttl_seconds = int(os.getenv("NEAR_DUP_TTL_SECONDS", str(30 * 24 * 3600)))
+        if min_chars is None:
+            min_chars = int(os.getenv("NEAR_DUP_MIN_CHARS", "50"))
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.min_chars = min_chars
+        self.bands = choose_bands(threshold)
+        self.rows = NUM_HASHES // self.bands
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path or ":memory:", check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS posts ("
+            " message_id TEXT PRIMARY KEY,"
+            " signature BLOB NOT NULL,"
+            " data TEXT NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets (band INTEGER NOT NULL, hash INTEGER NOT NULL, message_id TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS buckets_lookup ON buckets (band, hash)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        layout = f"{NUM_HASHES}x{self.bands}"
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'layout'").fetchone()
+        if row and row[0] != layout:
+            # Buckets of another band layout cannot be queried; start over
+            print(f"Near duplicates: Index layout changed ({row[0]} -> {layout}), clearing it.")
+            self._conn.execute("DELETE FROM posts")
+            self._conn.execute("DELETE FROM buckets")
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('layout', ?)", (layout,))
+        self._conn.commit()
+        self.prune()
+
+    def signature(self, text: str) -> Optional[List[int]]:
+        """Returns the text's signature, or None if it is too short to compare."""
+        if len(normalize_text(text)) < self.min_chars:
+            return None
+        return minhash_signature(text)
+
+    def _band_hashes(self, signature: List[int]) -> List[Tuple[int, int]]:
+        """Returns (band, bucket hash) per band, as signed 64-bit values for SQLite."""
+        hashes = []
+        for band in range(self.bands):
+            values = array.array("Q", signature[band * self.rows:(band + 1) * self.rows]).tobytes()
+            digest = hashlib.blake2b(values, digest_size=8).digest()
+            hashes.append((band, int.from_bytes(digest, "big", signed=True)))
+        return hashes
+
+    def find(self, text: str) -> Optional[Dict[str, Any]]:
+        """
+        Looks up the most similar indexed post.
+
+        Args:
+            text (str): Post text (as cleaned by Node 2).
+
+        Returns:
+            Optional[Dict[str, Any]]: {'message_id', 'similarity', 'meta', 'file'} of the best match
+            at or above the threshold, or None.
+        """
+        signature = self.signature(text)
+        if signature is None:
+            return None
+        return self.find_signature(signature)
+
+    def find_signature(self, signature: List[int]) -> Optional[Dict[str, Any]]:
+        """Same as find, for a precomputed signature."""
+        clauses = " OR ".join(["(band = ? AND hash = ?)"] * self.bands)
+        params = [value for pair in self._band_hashes(signature) for value in pair]
+        with self._lock:
+            candidates = self._conn.execute(
+                f"SELECT message_id, signature, data, created_at FROM posts WHERE message_id IN ("
+                f" SELECT message_id FROM buckets WHERE {clauses})", params
+            ).fetchall()
+        best = None
+        expires_before = time.time() - self.ttl_seconds
+        for message_id, stored, data, created_at in candidates:
+            if created_at < expires_before:
+                continue
+            score = similarity(signature, array.array("Q", stored).tolist())
+            if score >= self.threshold and (best is None or score > best['similarity']):
+                best = dict(json.loads(data), message_id=message_id, similarity=score)
+        return best
+
+    def group_batch(self, entries: Iterable[Tuple[str, str]]) -> Dict[str, str]:
+        """
+        Finds near duplicates among posts of one batch that are not indexed yet
+        (copies of a story usually arrive in the same poll). Uses the same band
+        buckets as the index, kept in memory.
+
+        Args:
+            entries (Iterable[Tuple[str, str]]): (message ID, post text) in processing order.
+
+        Returns:
+            Dict[str, str]: Message ID of each later copy -> message ID of the first post
+            it repeats (its leader). Leaders and unique posts are not included.
+        """
+        buckets: Dict[Tuple[int, int], List[str]] = {}
+        signatures: Dict[str, List[int]] = {}
+        followers: Dict[str, str] = {}
+        for message_id, text in entries:
+            signature = self.signature(text)
+            if signature is None:
+                continue
+            band_hashes = self._band_hashes(signature)
+            candidates = {leader for key in band_hashes for leader in buckets.get(key, [])}
+            scores = [(similarity(signature, signatures[leader]), leader) for leader in candidates]
+            best = max((pair for pair in scores if pair[0] >= self.threshold), default=None)
+            if best is not None:
+                followers[str(message_id)] = best[1]
+                continue
+            signatures[str(message_id)] = signature
+            for key in band_hashes:
+                buckets.setdefault(key, []).append(str(message_id))
+        return followers
+
+    def add(self, message_id: str, text: str, meta: Dict[str, Any], file: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Indexes a processed post.
+
+        Args:
+            message_id (str): Discord message ID.
+            text (str): Post text (as cleaned by Node 2).
+            meta (Dict[str, Any]): Node 7 metadata used for notifications.
+            file (Optional[Dict[str, Any]]): The Drive file holding its summary.
+
+        Returns:
+            bool: False if the text is too short to be indexed.
+        """
+        signature = self.signature(text)
+        if signature is None:
+            return False
+        self.add_many([(str(message_id), signature, {'meta': meta, 'file': file})])
+        return True
+
+    def add_many(self, entries: Iterable[Tuple[str, List[int], Dict[str, Any]]]) -> None:
+        """Indexes precomputed (message ID, signature, {'meta', 'file'}) entries in one transaction."""
+        now = time.time()
+        posts = []
+        buckets = []
+        for message_id, signature, data in entries:
+            posts.append((message_id, array.array("Q", signature).tobytes(), json.dumps(data, default=str), now))
+            buckets += [(band, value, message_id) for band, value in self._band_hashes(signature)]
+        with self._lock:
+            # Re-indexed posts drop their old buckets first
+            reindexed = [(post[0],) for post in posts
+                         if self._conn.execute("SELECT 1 FROM posts WHERE message_id = ?", (post[0],)).fetchone()]
+            self._conn.executemany("DELETE FROM buckets WHERE message_id = ?", reindexed)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO posts (message_id, signature, data, created_at) VALUES (?, ?, ?, ?)", posts
+            )
+            self._conn.executemany("INSERT INTO buckets (band, hash, message_id) VALUES (?, ?, ?)", buckets)
+            self._conn.commit()
+
+    def prune(self) -> int:
+        """Deletes entries older than the TTL. Returns how many were deleted."""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM posts WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+            if cursor.rowcount:
+                self._conn.execute("DELETE FROM buckets WHERE message_id NOT IN (SELECT message_id FROM posts)")
+            self._conn.commit()
+            return cursor.rowcount
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM posts").fetchone()[0]
@@ -1,8 +1,45 @@
-from .node1_discord_input import Node1_Discord_Input
-from .node2_preprocessing import Node2_Preprocessing
-from .node3_gemini import Node3_Gemini
-from .node4_folder_management import Node4_Folder_Management
-from .node5_file_creation import Node5_File_Creation
-from .node6_content_writing import Node6_Content_Writing
-from .node7_metadata_extraction import Node7_Metadata_Extraction
-from .node8_discord_notification import Node8_Discord_Notification
+"""
+Workflow nodes. Each node class is imported on first access (PEP 562), so the
+SDK behind it (discord.py, google-genai, googleapiclient) is
+only loaded once a node actually needs it.
+"""
+
+import importlib
+from typing import TYPE_CHECKING, Any, List
+
+if TYPE_CHECKING:
+    from .node1_discord_input import Node1_Discord_Input
+    from .node1_discord_rest import Node1_Discord_REST_Input
+    from .node2_preprocessing import Node2_Preprocessing
+    from .node3_gemini import Node3_Gemini
+    from .node4_folder_management import Node4_Folder_Management
+    from .node5_file_creation import Node5_File_Creation
+    from .node6_content_writing import Node6_Content_Writing
+    from .node7_metadata_extraction import Node7_Metadata_Extraction
+    from .node8_discord_notification import Node8_Discord_Notification
+
+_NODE_MODULES = {
+    "Node1_Discord_Input": ".node1_discord_input",
+    "Node1_Discord_REST_Input": ".node1_discord_rest",
+    "Node2_Preprocessing": ".node2_preprocessing",
+    "Node3_Gemini": ".node3_gemini",
+    "Node4_Folder_Management": ".node4_folder_management",
+    "Node5_File_Creation": ".node5_file_creation",
+    "Node6_Content_Writing": ".node6_content_writing",
+    "Node7_Metadata_Extraction": ".node7_metadata_extraction",
+    "Node8_Discord_Notification": ".node8_discord_notification",
+}
+
+__all__ = list(_NODE_MODULES)
+
+def __getattr__(name: str) -> Any:
+    """Imports the module defining `name` and caches the class on the package."""
+    module_name = _NODE_MODULES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(__all__))
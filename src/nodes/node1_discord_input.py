@@ -1,8 +1,10 @@
 import os
 import discord
 import asyncio
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta, timezone
+from src.utils import TARGET_INPUT_BOTS, get_concurrency_limiter
+import src.metrics as metrics
 
 class Node1_Discord_Input:
     """
@@ -18,6 +20,10 @@ class Node1_Discord_Input:
         intents = discord.Intents.default()
         intents.message_content = True # Required to read message content
         self.client = discord.Client(intents=intents)
+        # Newest message ID seen by the last fetch (including skipped ones)
+        self.last_scanned_id: Optional[str] = None
+        # Set by listen() once the gateway connection is up
+        self.ready = asyncio.Event()
 
     async def fetch_recent_messages(self, limit: int = 20, hours: int = 0, minutes: int = 15) -> List[Dict[str, Any]]:
         """
@@ -31,86 +37,141 @@ class Node1_Discord_Input:
         Returns:
             List[Dict[str, Any]]: A list of raw message data.
         """
+        print(f"Node 1: Connecting to Discord to fetch recent messages (last {minutes} min)...")
+        # Calculate cutoff time (UTC)
+        cutoff_time = datetime.now(timezone.utc) - timedelta(hours=hours, minutes=minutes)
+        print(f"Node 1: Fetching messages after {cutoff_time.isoformat()}")
+        return await self._fetch_history({"limit": limit, "after": cutoff_time}, cutoff_time)
+
+    async def fetch_messages_after(self, after_id: str) -> List[Dict[str, Any]]:
+        """
+        Fetches every message newer than the given snowflake (checkpoint), oldest first.
+        discord.py paginates through the full history, so bursts of any size are covered.
+
+        Args:
+            after_id (str): ID of the last message already processed.
+
+        Returns:
+            List[Dict[str, Any]]: A list of raw message data.
+        """
+        print(f"Node 1: Connecting to Discord to fetch messages after {after_id}...")
+        return await self._fetch_history({"limit": None, "after": discord.Object(id=int(after_id)), "oldest_first": True})
+
+    async def listen(self, queue: asyncio.Queue) -> None:
+        """
+        Stays connected to the Discord gateway and puts every qualifying message
+        from the configured channel onto the queue (same filtering as the history fetch).
+        Runs until the client is closed.
+
+        Args:
+            queue (asyncio.Queue): Work queue receiving raw message data dicts.
+        """
         if not self.token or not self.channel_id:
             print("Node 1: Discord Token or Channel ID missing.")
-            return []
+            return
 
-        print(f"Node 1: Connecting to Discord to fetch recent messages (last {minutes} min)...")
+        @self.client.event
+        async def on_ready():
+            print(f"Node 1: Connected to gateway as {self.client.user}. Listening on channel {self.channel_id}...")
+            self.ready.set()
+
+        @self.client.event
+        async def on_message(message):
+            if message.channel.id != self.channel_id:
+                return
+            if not self._is_target_message(message):
+                return
+            await queue.put(self._to_msg_data(message))
+            print(f"Node 1: Queued message {message.id}")
+
+        await self.client.start(self.token)
+
+    def _is_target_message(self, message: Any) -> bool:
+        """Skips bot messages (to avoid loops) except the 'post' input webhook."""
+        if not message.author.bot:
+            return True
+            
+        metrics.debug("Message skipped (Bot): %s", message.author.name)
+        if message.author.name in TARGET_INPUT_BOTS:
+             metrics.debug("Exception - Processing '%s' even if marked as bot/webhook.", message.author.name)
+             return True
+        return False
+
+    def _to_msg_data(self, message: Any) -> Dict[str, Any]:
+        """Extracts the raw message data passed to Node 2."""
+        # Extract basic data
+        msg_data = {
+            "id": str(message.id),
+            "text": message.content,
+            "author": message.author.name,
+            "created_at": message.created_at.isoformat(),
+            "attachments": [a.url for a in message.attachments],
+            "embeds": []
+        }
         
+        # Extract embed info if available (Discord expands links)
+        if message.embeds:
+            for embed in message.embeds:
+                embed_dict = {
+                    "title": embed.title,
+                    "description": embed.description,
+                    "url": embed.url,
+                    "image": embed.image.url if embed.image else None
+                }
+                msg_data["embeds"].append(embed_dict)
+        return msg_data
+
+    async def _fetch_history(self, history_kwargs: Dict[str, Any], cutoff_time: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """
+        Logs in, reads the channel history with the given arguments and closes the client.
+        Also records the newest scanned message ID (including skipped ones) in last_scanned_id.
+        """
+        if not self.token or not self.channel_id:
+            print("Node 1: Discord Token or Channel ID missing.")
+            return []
+
         messages_data = []
+        self.last_scanned_id = None
         
         # Define the async function to run the client logic
+        limiter = get_concurrency_limiter('discord')
+
         async def runner():
             try:
-                await self.client.login(self.token)
+                metrics.count_api_call('discord', 'login')
+                async with limiter.slot_async():
+                    await self.client.login(self.token)
                 
-                channel = await self.client.fetch_channel(self.channel_id)
+                metrics.count_api_call('discord', 'fetch_channel')
+                async with limiter.slot_async():
+                    channel = await self.client.fetch_channel(self.channel_id)
                 if not channel:
                     print(f"Node 1: Channel {self.channel_id} not found.")
                     return
 
-                # Calculate cutoff time (UTC)
-                cutoff_time = datetime.now(timezone.utc) - timedelta(hours=hours, minutes=minutes)
-                
-                print(f"Node 1: Fetching messages after {cutoff_time.isoformat()}")
-
                 msg_count = 0
-                async for message in channel.history(limit=limit, after=cutoff_time):
-                    msg_count += 1
-                    # Debug log with safety checks
-                    try:
-                        author_name = message.author.name if message.author else "Unknown"
-                        msg_id = message.id
-                        msg_created = message.created_at
-                        print(f"DEBUG: Checking message {msg_id} from {author_name} at {msg_created}")
-                    except Exception as e:
-                        print(f"DEBUG: Error printing message info: {e}")
-
-                    # Explicitly check timestamp again to prevent timezone/API issues
-                    if message.created_at < cutoff_time:
-                        print(f"DEBUG: Message skipped (Too old): {message.created_at} < {cutoff_time}")
-                        continue
-
-                    # Skip bot messages to avoid loops
-                    if message.author.bot:
-                        print(f"DEBUG: Message skipped (Bot): {message.author.name}")
-                        # TEMPORARY FIX: For testing, if the bot is NOT the one running this script (check by name/ID if possible, but for now just log and maybe ALLOW if it's the specific user)
-                        # The user "post" seems to be the one posting the INPUT content.
-                        # "yt_research" is likely the output bot, so we should SKIP it to avoid loops.
-                        
-                        target_input_bots = ["post"] # Only allow "post" (the input source)
-                        
-                        if message.author.name in target_input_bots:
-                             print(f"DEBUG: Exception - Processing '{message.author.name}' even if marked as bot/webhook.")
-                             # FALL THROUGH - Do not continue
-                        else:
-                             continue
-
-                    # Extract basic data
-                    msg_data = {
-                        "id": str(message.id),
-                        "text": message.content,
-                        "author": message.author.name,
-                        "created_at": message.created_at.isoformat(),
-                        "attachments": [a.url for a in message.attachments],
-                        "embeds": []
-                    }
-                    
-                    # Extract embed info if available (Discord expands links)
-                    if message.embeds:
-                        for embed in message.embeds:
-                            embed_dict = {
-                                "title": embed.title,
-                                "description": embed.description,
-                                "url": embed.url,
-                                "image": embed.image.url if embed.image else None
-                            }
-                            msg_data["embeds"].append(embed_dict)
-                    
-                    messages_data.append(msg_data)
-                    print(f"DEBUG: Message added. Content length: {len(message.content)}")
+                # discord.py pages internally; counted as one history call
+                metrics.count_api_call('discord', 'get_messages')
+                async with limiter.slot_async():
+                    async for message in channel.history(**history_kwargs):
+                        msg_count += 1
+                        if self.last_scanned_id is None or message.id > int(self.last_scanned_id):
+                            self.last_scanned_id = str(message.id)
+                        metrics.debug("Checking message %s from %s at %s", message.id,
+                                      message.author.name if message.author else "Unknown", message.created_at)
+
+                        # Explicitly check timestamp again to prevent timezone/API issues
+                        if cutoff_time and message.created_at < cutoff_time:
+                            metrics.debug("Message skipped (Too old): %s < %s", message.created_at, cutoff_time)
+                            continue
+
+                        if not self._is_target_message(message):
+                            continue
+
+                        messages_data.append(self._to_msg_data(message))
+                        metrics.debug("Message added. Content length: %d", len(message.content))
                 
-                print(f"DEBUG: Total messages scanned in history: {msg_count}")
+                metrics.debug("Total messages scanned in history: %d", msg_count)
                 await self.client.close()
                 
             except Exception as e:
@@ -127,4 +188,3 @@ class Node1_Discord_Input:
 
         print(f"Node 1: Found {len(messages_data)} messages.")
         return messages_data
-
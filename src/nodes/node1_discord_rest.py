@@ -0,0 +1,178 @@
+import os
+import time
+import asyncio
+import threading
+import requests
+from typing import List, Dict, Any, Optional
+from datetime import datetime, timedelta, timezone
+from src.clients import get_client
+from src.utils import TARGET_INPUT_BOTS, get_concurrency_limiter
+import src.metrics as metrics
+
+DISCORD_API_BASE = "https://discord.com/api/v10"
+DISCORD_EPOCH_MS = 1420070400000
+PAGE_SIZE = 100
+
+def snowflake_time(snowflake: int) -> datetime:
+    """Returns the creation time encoded in a Discord snowflake."""
+    return datetime.fromtimestamp(((snowflake >> 22) + DISCORD_EPOCH_MS) / 1000, tz=timezone.utc)
+
+def time_snowflake(dt: datetime) -> int:
+    """Returns the smallest snowflake created at the given time."""
+    return (int(dt.timestamp() * 1000) - DISCORD_EPOCH_MS) << 22
+
+class Node1_Discord_REST_Input:
+    """
+    Node 1 (REST backend): Fetches messages from the Discord channel by calling the
+    channel-messages REST endpoint directly over a pooled keep-alive session.
+    Avoids importing discord.py, logging in and fetching the channel on every run.
+    Produces the same message dicts as Node1_Discord_Input.
+    """
+    def __init__(self) -> None:
+        """Initializes the shared HTTP session."""
+        self.token = os.getenv("DISCORD_TOKEN")
+        self.channel_id = int(os.getenv("DISCORD_CHANNEL_ID", "0"))
+        self.api_base = os.getenv("DISCORD_API_BASE", DISCORD_API_BASE)
+        self.max_retries = int(os.getenv("DISCORD_MAX_RETRIES", "5"))
+        # One keep-alive session per container (reused by warm invocations)
+        self.session = get_client('discord_http', requests.Session)
+        self.limiter = get_concurrency_limiter('discord')
+        # Newest message ID seen by the last fetch (including skipped ones)
+        self.last_scanned_id: Optional[str] = None
+        self._buckets: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    async def fetch_recent_messages(self, limit: int = 20, hours: int = 0, minutes: int = 15) -> List[Dict[str, Any]]:
+        """
+        Fetches recent messages from the configured channel.
+
+        Args:
+            limit (int): Max messages to check.
+            hours (int): Lookback period hours.
+            minutes (int): Lookback period minutes.
+
+        Returns:
+            List[Dict[str, Any]]: A list of raw message data.
+        """
+        cutoff_time = datetime.now(timezone.utc) - timedelta(hours=hours, minutes=minutes)
+        print(f"Node 1 (REST): Fetching messages after {cutoff_time.isoformat()}")
+        return await asyncio.to_thread(self._fetch_after, time_snowflake(cutoff_time), limit)
+
+    async def fetch_messages_after(self, after_id: str) -> List[Dict[str, Any]]:
+        """
+        Fetches every message newer than the given snowflake, oldest first.
+
+        Args:
+            after_id (str): ID of the last message already processed.
+
+        Returns:
+            List[Dict[str, Any]]: A list of raw message data.
+        """
+        print(f"Node 1 (REST): Fetching messages after {after_id}...")
+        return await asyncio.to_thread(self._fetch_after, int(after_id), None)
+
+    def _fetch_after(self, after_id: int, limit: Optional[int]) -> List[Dict[str, Any]]:
+        """
+        Pages through the channel history newer than after_id (oldest first).
+        Blocking (requests, rate-limit sleeps), so the async methods run it in a thread.
+        """
+        if not self.token or not self.channel_id:
+            print("Node 1: Discord Token or Channel ID missing.")
+            return []
+
+        messages_data = []
+        self.last_scanned_id = None
+        scanned = 0
+        try:
+            while limit is None or scanned < limit:
+                page_size = PAGE_SIZE if limit is None else min(PAGE_SIZE, limit - scanned)
+                page = self._request(
+                    f"/channels/{self.channel_id}/messages",
+                    params={"after": str(after_id), "limit": page_size}
+                )
+                if not page:
+                    break
+                # Discord returns newest first; process oldest first
+                page.sort(key=lambda message: int(message["id"]))
+                for message in page:
+                    scanned += 1
+                    self.last_scanned_id = message["id"]
+                    if self._is_target_message(message):
+                        messages_data.append(self._to_msg_data(message))
+                after_id = int(page[-1]["id"])
+                if len(page) < page_size:
+                    break
+        except Exception as e:
+            print(f"Node 1: Error fetching Discord messages: {e}")
+
+        print(f"Node 1: Found {len(messages_data)} messages ({scanned} scanned).")
+        return messages_data
+
+    def _request(self, path: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        """
+        GET request honoring Discord rate-limit headers: waits when the route's
+        bucket is exhausted and retries 429 responses after retry_after.
+        """
+        url = f"{self.api_base}{path}"
+        headers = {"Authorization": f"Bot {self.token}"}
+        for attempt in range(self.max_retries + 1):
+            with self._lock:
+                reset_at = self._buckets.get(path, 0)
+            wait = reset_at - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+
+            metrics.count_api_call('discord', 'get_messages')
+            with self.limiter.slot() as slot:
+                response = self.session.get(url, params=params, headers=headers, timeout=10)
+                if response.status_code == 429:
+                    # Also holds back the other Discord calls until retry_after
+                    slot.throttle(self._retry_after(response))
+
+            if response.headers.get("X-RateLimit-Remaining") == "0":
+                reset_after = float(response.headers.get("X-RateLimit-Reset-After", "0"))
+                with self._lock:
+                    self._buckets[path] = time.monotonic() + reset_after
+
+            if response.status_code == 429 and attempt < self.max_retries:
+                print(f"Node 1 (REST): Rate limited, retrying in {slot.retry_after:.2f}s...")
+                time.sleep(slot.retry_after)
+                continue
+
+            response.raise_for_status()
+            return response.json()
+
+    @staticmethod
+    def _retry_after(response: requests.Response) -> float:
+        """Seconds to wait before retrying a 429 response."""
+        try:
+            return float(response.json().get("retry_after", 1))
+        except ValueError:
+            return float(response.headers.get("Retry-After", "1"))
+
+    def _is_target_message(self, message: Dict[str, Any]) -> bool:
+        """Skips bot messages (to avoid loops) except the 'post' input webhook."""
+        author = message.get("author") or {}
+        if not author.get("bot"):
+            return True
+        return author.get("username") in TARGET_INPUT_BOTS
+
+    def _to_msg_data(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """Converts a REST message object to the raw message data passed to Node 2."""
+        msg_data = {
+            "id": str(message["id"]),
+            "text": message.get("content", ""),
+            "author": (message.get("author") or {}).get("username"),
+            "created_at": snowflake_time(int(message["id"])).isoformat(),
+            "attachments": [a["url"] for a in message.get("attachments", [])],
+            "embeds": []
+        }
+
+        for embed in message.get("embeds", []):
+            msg_data["embeds"].append({
+                "title": embed.get("title"),
+                "description": embed.get("description"),
+                "url": embed.get("url"),
+                "image": (embed.get("image") or {}).get("url")
+            })
+        return msg_data
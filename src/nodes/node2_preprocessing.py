@@ -1,11 +1,67 @@
+import os
 import re
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
 import src.utils as utils
+from src.link_resolver import LinkResolver
+
+# Compiled once per process
+URL_PATTERN = re.compile(r'https?://[^\s<>"\'`]+', re.IGNORECASE)
+TCO_PATTERN = re.compile(r'https?://t\.co/\w+', re.IGNORECASE)
+# Punctuation that ends a sentence rather than the link
+TRAILING_PUNCTUATION = '.,;:!?)]}>。、」』）'
+# Query parameters that only track where a link was shared
+TRACKING_PARAMS = re.compile(r'^(utm_\w+|fbclid|gclid|igshid|ref_src|ref_url)$')
+# X share links also name the sharer in s= and t=
+X_HOSTS = {"x.com", "twitter.com", "mobile.twitter.com"}
+X_TRACKING_PARAMS = {"s", "t"}
+
+def normalize_url(url: str) -> str:
+    """
+    Normalizes a link: lowercase scheme and host, no default port, no fragment
+    and no tracking parameters (utm_*, fbclid, ...; also s/t on X links).
+    Malformed links (bad port, broken IPv6 host) are returned unchanged.
+    """
+    try:
+        parsed = urlparse(url)
+        host = (parsed.hostname or "").lower()
+        port = parsed.port
+    except ValueError:
+        return url
+    netloc = host
+    if port and not (parsed.scheme == "http" and port == 80) \
+            and not (parsed.scheme == "https" and port == 443):
+        netloc = f"{host}:{port}"
+    query = [(name, value) for name, value in parse_qsl(parsed.query, keep_blank_values=True)
+             if not TRACKING_PARAMS.match(name) and not (host in X_HOSTS and name in X_TRACKING_PARAMS)]
+    return urlunparse((parsed.scheme.lower(), netloc, parsed.path or "/", parsed.params, urlencode(query), ""))
+
+def extract_urls(text: str) -> List[str]:
+    """Returns the links in a text, in order, without trailing punctuation."""
+    return [match.group(0).rstrip(TRAILING_PUNCTUATION) for match in URL_PATTERN.finditer(text or "")]
 
 class Node2_Preprocessing:
     """
     Node 2: Responsible for cleaning and structuring the raw tweet data.
+
+    Links in the text are collected into external_urls; t.co and other short
+    links are resolved to their targets first (concurrently across a batch,
+    with a cache, see LinkResolver).
     """
+    def __init__(self, resolver: Optional[LinkResolver] = None) -> None:
+        """
+        Args:
+            resolver (Optional[LinkResolver]): Resolves short links. Defaults to the /tmp
+                backed resolver unless LINK_RESOLUTION=false.
+        """
+        self.resolver = resolver
+        if self.resolver is None and os.getenv("LINK_RESOLUTION", "true").lower() == "true":
+            try:
+                self.resolver = LinkResolver()
+            except Exception as e:
+                print(f"Node 2: Link resolution disabled: {e}")
+        self.deadline_seconds = float(os.getenv("LINK_RESOLVE_DEADLINE_SECONDS", "5"))
+
     def process(self, raw_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Cleans the raw tweet text and structures the data for the LLM.
@@ -16,33 +72,55 @@ class Node2_Preprocessing:
         Returns:
             Dict[str, Any]: Structured data containing cleaned text and metadata.
         """
-        print("Node 2: Preprocessing data...")
-        
-        cleaned_text = raw_data.get("text", "")
-        
-        # Remove t.co links (simple regex approach)
-        cleaned_text = re.sub(r'https://t\.co/\w+', '', cleaned_text).strip()
-        
+        return self.process_many([raw_data])[0]
+
+    def process_many(self, raw_posts: List[Dict[str, Any]],
+                     deadline_seconds: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Structures a batch of messages, resolving all their short links at once.
+
+        Args:
+            raw_posts (List[Dict[str, Any]]): Raw message data from Node 1.
+            deadline_seconds (Optional[float]): Time allowed for resolving the batch's links.
+                Defaults to LINK_RESOLVE_DEADLINE_SECONDS or 5. Unresolved links are kept as they are.
+
+        Returns:
+            List[Dict[str, Any]]: Structured data per message, in input order.
+        """
+        print(f"Node 2: Preprocessing {len(raw_posts)} message(s)...")
+        links = [extract_urls(raw_data.get("text", "")) for raw_data in raw_posts]
+        targets: Dict[str, str] = {}
+        if self.resolver is not None:
+            short_links = [url for urls in links for url in urls if LinkResolver.is_short_link(url)]
+            if short_links:
+                targets = self.resolver.resolve_many(
+                    short_links, self.deadline_seconds if deadline_seconds is None else deadline_seconds)
+        return [self._structure(raw_data, urls, targets) for raw_data, urls in zip(raw_posts, links)]
+
+    def _structure(self, raw_data: Dict[str, Any], urls: List[str], targets: Dict[str, str]) -> Dict[str, Any]:
+        # t.co links carry no meaning in the text itself; their targets go to external_urls
+        cleaned_text = TCO_PATTERN.sub('', raw_data.get("text", "")).strip()
+
         # Extract images from attachments and embeds
         media_urls = []
-        
+
         # 1. Direct attachments
         if "attachments" in raw_data:
             media_urls.extend(raw_data["attachments"])
-            
+
         # 2. Embed images
         if "embeds" in raw_data:
             for embed in raw_data["embeds"]:
                 if embed.get("image"):
                     media_urls.append(embed["image"])
 
-        # Node 1 doesn't explicitly return external_urls list, 
-        # but we can try to extract links from text or use what's in raw_data
+        # Links from Node 1 (if any) first, then those found in the text
         external_urls = []
-        # If node1 provided external_urls key, use it, otherwise empty
-        if "external_urls" in raw_data:
-            external_urls = raw_data["external_urls"]
-        
+        for url in list(raw_data.get("external_urls") or []) + urls:
+            url = normalize_url(targets.get(url, url))
+            if url not in external_urls and url not in media_urls:
+                external_urls.append(url)
+
         structured_data = {
             "id": raw_data["id"],
             "text": cleaned_text,
@@ -50,5 +128,5 @@ class Node2_Preprocessing:
             "external_urls": external_urls,
             "created_at": raw_data["created_at"]
         }
-        
+
         return structured_data
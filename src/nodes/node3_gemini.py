@@ -1,73 +1,371 @@
 import os
+import time
+import asyncio
+import threading
 from google import genai
 from google.genai import types
-from typing import Dict, Any
+from google.genai import errors as genai_errors
+from typing import Dict, Any, Optional, List, Tuple, Iterator
 import src.utils as utils
+import src.metrics as metrics
+from src.rate_limit import backoff_delay
+from src.summary_cache import SummaryCache
+from src.media import MediaPipeline
+from src.prompt_template import get_prompt_template
+
+# Rough output size used to reserve TPM quota before the real usage is known
+OUTPUT_TOKEN_ESTIMATE = 2000
+# Streamed summaries larger than this are not kept in memory for the summary cache
+MAX_CACHEABLE_STREAM_CHARS = 64 * 1024
+# Web search (grounding) stays disabled. A request using the explicit context cache
+# cannot set tools itself, so the cache is created with these same tools.
+SUMMARY_TOOLS: List[types.Tool] = []
+
+class SummaryGenerationError(RuntimeError):
+    """Raised when Gemini could not generate a summary (a non-retryable error, or retries ran out)."""
 
 class Node3_Gemini:
     """
     Node 3: Responsible for generating summaries using Google's Gemini LLM.
+    The post's images (media_urls) are sent along as downscaled inline parts.
     """
-    def __init__(self) -> None:
-        """Initializes the Gemini model."""
-        self.client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+    def __init__(self, cache: Optional[SummaryCache] = None, media: Optional[MediaPipeline] = None) -> None:
+        """
+        Initializes the Gemini model, the summary cache and the media pipeline.
+
+        Args:
+            cache (Optional[SummaryCache]): Summary cache. Defaults to the /tmp backed cache.
+            media (Optional[MediaPipeline]): Prepares the post's images. Defaults to a new
+                pipeline unless MEDIA_ENABLED=false.
+        """
+        self.client = utils.get_gemini_client()
         self.model_name = 'gemini-2.5-flash'
+        self.cache = cache
+        if self.cache is None:
+            try:
+                self.cache = SummaryCache()
+            except Exception as e:
+                print(f"Node 3: Summary cache disabled: {e}")
+        self.media = media
+        if self.media is None and os.getenv("MEDIA_ENABLED", "true").lower() == "true":
+            self.media = MediaPipeline()
+        self.template = get_prompt_template()
+        self.prompt_version = self.template.version
+        self.rate_limiter = utils.get_gemini_rate_limiter()
+        self.concurrency = utils.get_concurrency_limiter('gemini')
+        self.max_retries = int(os.getenv("GEMINI_MAX_RETRIES", "5"))
+        # Optional explicit context cache for the static prompt prefix
+        self.use_explicit_cache = os.getenv("GEMINI_EXPLICIT_CACHE", "false").lower() == "true"
+        self.explicit_cache_ttl = int(os.getenv("GEMINI_EXPLICIT_CACHE_TTL_SECONDS", "3600"))
+        self._explicit_cache: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+        self.token_usage = {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0}
+
+    def _get_explicit_cache_name(self) -> Optional[str]:
+        """
+        Returns the name of a Gemini cached content holding the static prompt prefix,
+        creating (or re-creating after expiry) it on demand. None disables explicit caching.
+        """
+        if not self.use_explicit_cache:
+            return None
+        with self._lock:
+            if self._explicit_cache and self._explicit_cache["expires_at"] > time.time() + 60:
+                return self._explicit_cache["name"]
+            try:
+                metrics.count_api_call('gemini', 'caches.create')
+                with self.concurrency.slot():
+                    cached_content = self.client.caches.create(
+                        model=self.model_name,
+                        config=types.CreateCachedContentConfig(
+                            contents=[self.template.prefix],
+                            tools=SUMMARY_TOOLS,
+                            ttl=f"{self.explicit_cache_ttl}s",
+                            display_name=f"x-summary-prefix-{self.prompt_version}"
+                        )
+                    )
+                self._explicit_cache = {
+                    "name": cached_content.name,
+                    "expires_at": time.time() + self.explicit_cache_ttl
+                }
+                print(f"Node 3: Created Gemini context cache {cached_content.name}")
+                return cached_content.name
+            except Exception as e:
+                # e.g. prefix below the model's minimum cacheable size
+                print(f"Node 3: Explicit context cache unavailable, sending full prompt: {e}")
+                self.use_explicit_cache = False
+                return None
+
+    def _record_token_usage(self, response: Any) -> None:
+        """Prints prompt/cached token counts for one call and adds them to the running totals and run metrics."""
+        usage = getattr(response, 'usage_metadata', None)
+        prompt_tokens = getattr(usage, 'prompt_token_count', None)
+        cached_tokens = getattr(usage, 'cached_content_token_count', None)
+        output_tokens = getattr(usage, 'candidates_token_count', None)
+        prompt_tokens = prompt_tokens if isinstance(prompt_tokens, int) else 0
+        cached_tokens = cached_tokens if isinstance(cached_tokens, int) else 0
+        output_tokens = output_tokens if isinstance(output_tokens, int) else 0
+        with self._lock:
+            self.token_usage["calls"] += 1
+            self.token_usage["prompt_tokens"] += prompt_tokens
+            self.token_usage["cached_tokens"] += cached_tokens
+        metrics.increment("tokens.gemini.prompt", prompt_tokens)
+        metrics.increment("tokens.gemini.cached", cached_tokens)
+        metrics.increment("tokens.gemini.output", output_tokens)
+        print(f"Node 3: Prompt tokens: {prompt_tokens} (cached: {cached_tokens})")
         
+    def _get_cached_summary(self, cache_key: str) -> Optional[str]:
+        """Returns a cached summary for the key, if any."""
+        if self.cache is None:
+            return None
+        cached = self.cache.get(cache_key)
+        if cached:
+            metrics.increment("cache.summary.hits")
+            print("Node 3: Returning cached summary (same text seen before).")
+        return cached
+
+    def _prepare_media(self, structured_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Returns the post's images as prepared by the media pipeline (none if it is disabled)."""
+        if self.media is None or not structured_data.get('media_urls'):
+            return []
+        return self.media.prepare(structured_data['media_urls'])
+
+    def _make_cache_key(self, structured_data: Dict[str, Any], media: List[Dict[str, Any]]) -> str:
+        return SummaryCache.make_key(structured_data['text'], self.model_name, self.prompt_version,
+                                     list(structured_data.get('external_urls') or [])
+                                     + [image['key'] for image in media])
+
+    def _build_request(self, structured_data: Dict[str, Any],
+                       media: Optional[List[Dict[str, Any]]] = None) -> Tuple[Any, types.GenerateContentConfig, int]:
+        """
+        Builds the request contents and config, plus the token estimate to reserve.
+        With an explicit context cache only the per-post suffix is sent;
+        otherwise the static prefix and the post text are sent together.
+        Both use SUMMARY_TOOLS. Images go first, as inline parts.
+        """
+        urls = structured_data.get('external_urls') or []
+        cache_name = self._get_explicit_cache_name()
+        if cache_name:
+            prompt_text = self.template.suffix(structured_data['text'], urls)
+            config = types.GenerateContentConfig(cached_content=cache_name)
+        else:
+            prompt_text = self.template.build(structured_data['text'], urls)
+            # Explicitly disable tools to prevent web search
+            config = types.GenerateContentConfig(tools=SUMMARY_TOOLS)
+        estimated_tokens = self._estimate_tokens(prompt_text, media)
+        if not media:
+            return prompt_text, config, estimated_tokens
+        parts = [types.Part.from_bytes(data=image['data'], mime_type=image['mime_type']) for image in media]
+        return parts + [prompt_text], config, estimated_tokens
+
+    @staticmethod
+    def _estimate_tokens(prompt_text: str, media: Optional[List[Dict[str, Any]]] = None) -> int:
+        """Rough token estimate used to reserve TPM quota before the call."""
+        return len(prompt_text) // 3 + sum(image['tokens'] for image in media or []) + OUTPUT_TOKEN_ESTIMATE
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        """Quota (429) and server (5xx) errors are worth retrying."""
+        return isinstance(error, genai_errors.APIError) and (error.code == 429 or (error.code or 0) >= 500)
+
+    def _handle_response(self, response: Any, cache_key: str, estimated_tokens: int) -> str:
+        """Logs the response, updates quota accounting and the cache, and returns the text."""
+        usage = getattr(response, 'usage_metadata', None)
+        actual_tokens = getattr(usage, 'total_token_count', None)
+        self.rate_limiter.record_usage(estimated_tokens, actual_tokens if isinstance(actual_tokens, int) else None)
+        self._record_token_usage(response)
+
+        # Debug logs (formatted only when DEBUG=true)
+        if metrics.is_debug_enabled():
+            if response.candidates:
+                metrics.debug("Candidate 0 Finish Reason: %s", response.candidates[0].finish_reason)
+                metrics.debug("Candidate 0 Content: %s", response.candidates[0].content)
+            else:
+                metrics.debug("No candidates returned.")
+
+        if self.cache is not None and response.text:
+            self.cache.set(cache_key, response.text)
+        return response.text
+
     def generate_summary(self, structured_data: Dict[str, Any]) -> str:
         """
         Generates a markdown summary of the tweet content.
+        Waits for the shared rate limiter and retries 429/5xx errors with backoff.
 
         Args:
             structured_data (Dict[str, Any]): The structured tweet data from Node 2.
 
         Returns:
             str: The generated summary in Markdown format.
+
+        Raises:
+            SummaryGenerationError: If Gemini fails with a non-retryable error or retries run out.
         """
+        media = self._prepare_media(structured_data)
+        cache_key = self._make_cache_key(structured_data, media)
+        cached = self._get_cached_summary(cache_key)
+        if cached:
+            return cached
+
         print("Node 3: Generating summary with Gemini (Search Grounding Disabled)...")
+        contents, config, estimated_tokens = self._build_request(structured_data, media)
         
-        # Prepare content parts
-        
-        # System Prompt
-        system_prompt = "You are a helpful assistant that summarizes X posts. Analyze the intent and content. Output in Markdown."
-        try:
-            base_path = os.path.dirname(os.path.dirname(__file__)) # Go up one level to src/
-            file_path = os.path.join(base_path, "system_prompt.md")
-            with open(file_path, "r") as f:
-                system_prompt = f.read()
-                # Replace placeholder with actual post text
-                system_prompt = system_prompt.replace("{専門的なコメント}", structured_data['text'])
-        except FileNotFoundError:
-            pass
-            
-        prompt_text = system_prompt
-        prompt_text += f"\n\n【対象の投稿テキスト】\n{structured_data['text']}"
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire(estimated_tokens)
+            try:
+                metrics.count_api_call('gemini', 'generate_content')
+                # Generate content without tools (Web Search disabled)
+                with self.concurrency.slot():
+                    response = self.client.models.generate_content(
+                        model=self.model_name,
+                        contents=contents,
+                        config=config
+                    )
+                return self._handle_response(response, cache_key, estimated_tokens)
+            except Exception as e:
+                if self._is_retryable(e) and attempt < self.max_retries:
+                    delay = backoff_delay(attempt)
+                    print(f"Node 3: Gemini error {e.code}, retrying in {delay:.1f}s...")
+                    time.sleep(delay)
+                    continue
+                raise SummaryGenerationError(f"Error generating summary: {e}") from e
+
+    def generate_summary_stream(self, structured_data: Dict[str, Any]) -> Iterator[str]:
+        """
+        Streams a markdown summary of the tweet content chunk by chunk
+        (generate_content_stream), so the upload can start before generation ends.
+        Quota errors are retried only before the first chunk has been yielded;
+        a failure mid-stream is raised so the caller can abandon the upload.
+
+        The Gemini concurrency slot is held from the request until the stream
+        ends, fails or the generator is closed. Chunks are pulled by the caller,
+        so the slot spans the caller's work too: in the pipeline, the write
+        stage's Drive upload. Callers must drain or close() the generator; the
+        time spent waiting on the caller is left out of the slot's latency.
+
+        Args:
+            structured_data (Dict[str, Any]): The structured tweet data from Node 2.
+
+        Yields:
+            str: Markdown text chunks.
+
+        Raises:
+            SummaryGenerationError: If Gemini fails before the first chunk with a
+                non-retryable error or retries run out.
+        """
+        media = self._prepare_media(structured_data)
+        cache_key = self._make_cache_key(structured_data, media)
+        cached = self._get_cached_summary(cache_key)
+        if cached:
+            yield cached
+            return
+
+        print("Node 3: Streaming summary from Gemini (Search Grounding Disabled)...")
+        contents, config, estimated_tokens = self._build_request(structured_data, media)
         
-        # Explicitly mention NOT to use external search and rely on the text
-        prompt_text += "\n\n【指示】\n上記の【対象の投稿テキスト】の内容に基づいて、正確な解説を生成してください。\n外部情報の検索は行わず、提供されたテキスト情報のみを正として処理してください。\n全く無関係なトピックの生成は禁止します。\n最終的な出力は必ず日本語で行ってください。"
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire(estimated_tokens)
+            yielded = False
+            cacheable: Optional[List[str]] = []
+            cached_chars = 0
+            last_chunk = None
+            try:
+                metrics.count_api_call('gemini', 'generate_content_stream')
+                # Released when the stream ends, fails or the generator is closed
+                with self.concurrency.slot() as slot:
+                    for chunk in self.client.models.generate_content_stream(
+                        model=self.model_name,
+                        contents=contents,
+                        config=config
+                    ):
+                        last_chunk = chunk
+                        text = chunk.text
+                        if not text:
+                            continue
+                        if cacheable is not None:
+                            cached_chars += len(text)
+                            if cached_chars <= MAX_CACHEABLE_STREAM_CHARS:
+                                cacheable.append(text)
+                            else:
+                                cacheable = None
+                        yielded = True
+                        paused_at = time.monotonic()
+                        yield text
+                        slot.exclude(time.monotonic() - paused_at)
+            except Exception as e:
+                if yielded:
+                    raise
+                if self._is_retryable(e) and attempt < self.max_retries:
+                    delay = backoff_delay(attempt)
+                    print(f"Node 3: Gemini error {e.code}, retrying in {delay:.1f}s...")
+                    time.sleep(delay)
+                    continue
+                raise SummaryGenerationError(f"Error generating summary: {e}") from e
+
+            # The final chunk carries the usage metadata for the whole stream
+            if last_chunk is not None:
+                usage = getattr(last_chunk, 'usage_metadata', None)
+                actual_tokens = getattr(usage, 'total_token_count', None)
+                self.rate_limiter.record_usage(estimated_tokens, actual_tokens if isinstance(actual_tokens, int) else None)
+                self._record_token_usage(last_chunk)
+            if self.cache is not None and cacheable:
+                self.cache.set(cache_key, "".join(cacheable))
+            return
+
+    async def generate_summary_async(self, structured_data: Dict[str, Any]) -> str:
+        """
+        Async variant of generate_summary built on the SDK's async client.
+
+        Args:
+            structured_data (Dict[str, Any]): The structured tweet data from Node 2.
+
+        Returns:
+            str: The generated summary in Markdown format.
+
+        Raises:
+            SummaryGenerationError: If Gemini fails with a non-retryable error or retries run out.
+        """
+        # Downloads and resizing block; keep them off the event loop
+        media = await asyncio.to_thread(self._prepare_media, structured_data)
+        cache_key = self._make_cache_key(structured_data, media)
+        cached = self._get_cached_summary(cache_key)
+        if cached:
+            return cached
+
+        print("Node 3: Generating summary with Gemini (async)...")
+        # Creating the explicit context cache is a blocking call as well
+        contents, config, estimated_tokens = await asyncio.to_thread(self._build_request, structured_data, media)
         
-        try:
-            # Generate content without tools (Web Search disabled)
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=prompt_text,
-                config=types.GenerateContentConfig(
-                    # Explicitly disable tools to prevent web search
-                    tools=[]
-                )
-            )
-            
-            # Debug logs
-            print(f"DEBUG: Full Gemini Response: {response}")
-            if response.candidates:
-                print(f"DEBUG: Candidate 0 Finish Reason: {response.candidates[0].finish_reason}")
-                if response.candidates[0].content:
-                     print(f"DEBUG: Candidate 0 Content: {response.candidates[0].content}")
-                else:
-                     print("DEBUG: Candidate 0 has no content.")
-            else:
-                print("DEBUG: No candidates returned.")
-                
-            return response.text
-        except Exception as e:
-            print(f"Error generating summary: {e}")
-            return "# Error Generating Summary\n\nCould not generate summary due to an error."
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.acquire_async(estimated_tokens)
+            try:
+                metrics.count_api_call('gemini', 'generate_content')
+                async with self.concurrency.slot_async():
+                    response = await self.client.aio.models.generate_content(
+                        model=self.model_name,
+                        contents=contents,
+                        config=config
+                    )
+                return self._handle_response(response, cache_key, estimated_tokens)
+            except Exception as e:
+                if self._is_retryable(e) and attempt < self.max_retries:
+                    delay = backoff_delay(attempt)
+                    print(f"Node 3: Gemini error {e.code}, retrying in {delay:.1f}s...")
+                    await asyncio.sleep(delay)
+                    continue
+                raise SummaryGenerationError(f"Error generating summary: {e}") from e
+
+    async def generate_summaries_async(self, structured_list: List[Dict[str, Any]]) -> List[str]:
+        """
+        Generates summaries for many posts at once. Requests run concurrently and
+        are paced by the shared RPM/TPM limiter.
+
+        Args:
+            structured_list (List[Dict[str, Any]]): Structured data from Node 2.
+
+        Returns:
+            List[str]: Summaries in the same order as the input.
+
+        Raises:
+            SummaryGenerationError: If any summary fails (the other requests still complete).
+        """
+        return list(await asyncio.gather(*(self.generate_summary_async(data) for data in structured_list)))
@@ -1,25 +1,76 @@
 import os
 import datetime
+import threading
 from typing import Any, Optional
+from googleapiclient.errors import HttpError
 import src.utils as utils
+from src.folder_cache import FolderCache
+from src.archive_index import ArchiveIndex, get_archive_index
 
 class Node4_Folder_Management:
     """
     Node 4: Responsible for managing Google Drive folders (Year/Month/Day).
     """
-    def __init__(self) -> None:
-        """Initializes the Google Drive service."""
+    def __init__(self, cache: Optional[FolderCache] = None, archive: Optional[ArchiveIndex] = None) -> None:
+        """
+        Initializes the Google Drive service and the folder ID cache.
+
+        Args:
+            cache (Optional[FolderCache]): Folder ID cache. Defaults to the /tmp backed cache.
+            archive (Optional[ArchiveIndex]): Records the path of every resolved folder.
+                Defaults to the shared archive index (see get_archive_index).
+        """
         self.service = utils.get_drive_service()
         self.root_folder_id = os.getenv("DRIVE_ROOT_FOLDER_ID") # Optional
+        self.cache = cache if cache is not None else FolderCache()
+        self.archive = archive if archive is not None else get_archive_index()
+        # Serializes lookups so concurrent messages don't create duplicate folders
+        self._lock = threading.Lock()
+
+    def _is_folder_valid(self, folder_id: str) -> bool:
+        """Checks that a cached folder still exists and is not trashed."""
+        try:
+            meta = utils.execute_drive(self.service.files().get(fileId=folder_id, fields='id, trashed'))
+            return meta.get('trashed') is not True
+        except HttpError as e:
+            if e.resp.status == 404:
+                return False
+            print(f"Error validating folder {folder_id}: {e}")
+            return True
+        except Exception as e:
+            # Keep the entry on transient errors; it is re-validated next time
+            print(f"Error validating folder {folder_id}: {e}")
+            return True
+
+    def invalidate_folder(self, folder_id: str) -> None:
+        """Drops a folder (and its cached subfolders) from the cache, e.g. after it was trashed."""
+        self.cache.drop(folder_id)
         
     def _get_or_create_single_folder(self, folder_name: str, parent_id: Optional[str] = None) -> Optional[str]:
-        """Helper to get or create a single folder."""
+        """Helper to get or create a single folder, consulting the cache first."""
+        cached_id = self.cache.get(parent_id, folder_name)
+        if cached_id:
+            if not self.cache.is_stale(parent_id, folder_name):
+                return cached_id
+            if self._is_folder_valid(cached_id):
+                self.cache.set(parent_id, folder_name, cached_id)
+                return cached_id
+            print(f"Cached folder '{folder_name}' ({cached_id}) is gone. Dropping from cache.")
+            self.cache.drop(cached_id)
+
+        folder_id = self._lookup_or_create_single_folder(folder_name, parent_id)
+        if folder_id:
+            self.cache.set(parent_id, folder_name, folder_id)
+        return folder_id
+
+    def _lookup_or_create_single_folder(self, folder_name: str, parent_id: Optional[str] = None) -> Optional[str]:
+        """Queries Drive for a single folder and creates it if missing."""
         query = f"mimeType='application/vnd.google-apps.folder' and name='{folder_name}' and trashed=false"
         if parent_id:
             query += f" and '{parent_id}' in parents"
         
         try:
-            results = self.service.files().list(q=query, fields="files(id, name)").execute()
+            results = utils.execute_drive(self.service.files().list(q=query, fields="files(id, name)"))
             files = results.get('files', [])
             
             if files:
@@ -34,7 +85,7 @@ class Node4_Folder_Management:
                 if parent_id:
                     file_metadata['parents'] = [parent_id]
                     
-                file = self.service.files().create(body=file_metadata, fields='id').execute()
+                file = utils.execute_drive(self.service.files().create(body=file_metadata, fields='id'))
                 print(f"Created folder ID: {file.get('id')}")
                 return file.get('id')
         except Exception as e:
@@ -67,20 +118,26 @@ class Node4_Folder_Management:
             month_str = f"{dt.month:02d}"
             day_str = f"{dt.day:02d}"
             
-            # 1. Year Folder
-            parent_id = self.root_folder_id
-            year_folder_id = self._get_or_create_single_folder(year_str, parent_id)
-            if not year_folder_id: return None
-            
-            # 2. Month Folder
-            month_folder_id = self._get_or_create_single_folder(month_str, year_folder_id)
-            if not month_folder_id: return None
-            
-            # 3. Day Folder
-            day_folder_id = self._get_or_create_single_folder(day_str, month_folder_id)
-            if not day_folder_id: return None
-            
-            return day_folder_id
+            with self._lock:
+                # 1. Year Folder
+                parent_id = self.root_folder_id
+                year_folder_id = self._get_or_create_single_folder(year_str, parent_id)
+                if not year_folder_id: return None
+                
+                # 2. Month Folder
+                month_folder_id = self._get_or_create_single_folder(month_str, year_folder_id)
+                if not month_folder_id: return None
+                
+                # 3. Day Folder
+                day_folder_id = self._get_or_create_single_folder(day_str, month_folder_id)
+                if not day_folder_id: return None
+
+                if self.archive is not None:
+                    self.archive.record_folder(year_folder_id, year_str)
+                    self.archive.record_folder(month_folder_id, f"{year_str}/{month_str}")
+                    self.archive.record_folder(day_folder_id, f"{year_str}/{month_str}/{day_str}")
+                
+                return day_folder_id
 
         except Exception as e:
             print(f"Error in folder hierarchy creation: {e}")
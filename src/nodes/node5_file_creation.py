@@ -1,31 +1,48 @@
 import os
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Iterable, Set
 import src.utils as utils
+from src.archive_index import ArchiveIndex, get_archive_index
 
 class Node5_File_Creation:
     """
-    Node 5: Responsible for creating empty Markdown files in Google Drive.
+    Node 5: Responsible for the Markdown file metadata (name, day folder and
+    the Discord message ID in appProperties) that Node 6 sends together with
+    the content, so each summary file is created in a single request.
+
+    Idempotency checks are answered from the local archive index when it
+    knows the message; Drive is only queried on a miss.
     """
-    def __init__(self) -> None:
-        """Initializes the Google Drive service."""
+    def __init__(self, archive: Optional[ArchiveIndex] = None) -> None:
+        """
+        Initializes the Google Drive service.
+
+        Args:
+            archive (Optional[ArchiveIndex]): Local index of written files. Defaults to the
+                shared archive index (see get_archive_index).
+        """
         self.service = utils.get_drive_service()
+        self.archive = archive if archive is not None else get_archive_index()
 
     def check_file_exists(self, folder_id: str, message_id: str) -> bool:
         """
         Checks if a file for the given Discord message ID already exists in the folder.
         Uses appProperties to store and retrieve the message ID.
         """
+        archived = self.archive.get(message_id) if self.archive is not None else None
+        if archived and archived['folder_id'] == folder_id:
+            print(f"Node 5: File already exists for message {message_id} (ID: {archived['file_id']}, archive index)")
+            return True
         if not self.service:
             return False
             
         try:
             # Query for files in the folder with the specific message_id in appProperties
             query = f"'{folder_id}' in parents and appProperties has {{ key='discord_message_id' and value='{message_id}' }} and trashed = false"
-            results = self.service.files().list(
+            results = utils.execute_drive(self.service.files().list(
                 q=query,
                 fields="files(id, name)",
                 pageSize=1
-            ).execute()
+            ))
             
             files = results.get('files', [])
             if files:
@@ -36,9 +53,63 @@ class Node5_File_Creation:
             print(f"Error checking for existing file: {e}")
             return False
         
-    def create_file(self, folder_id: str, file_name: str, message_id: str = None) -> Optional[Dict[str, Any]]:
+    def list_processed_message_ids(self, folder_ids: Iterable[str]) -> Optional[Set[str]]:
         """
-        Creates a new file in the specified folder.
+        Bulk idempotency lookup: lists every file in the given folders once and
+        collects the Discord message IDs stored in their appProperties. The listed
+        files are added to the archive index.
+
+        Args:
+            folder_ids (Iterable[str]): IDs of the (day) folders to scan.
+
+        Returns:
+            Optional[Set[str]]: Message IDs that already have a file, or None on error
+            (callers should then fall back to check_file_exists).
+        """
+        if not self.service:
+            return None
+
+        folder_ids = sorted({folder_id for folder_id in folder_ids if folder_id})
+        message_ids = set()
+        if not folder_ids:
+            return message_ids
+
+        parents_query = " or ".join(f"'{folder_id}' in parents" for folder_id in folder_ids)
+        query = f"({parents_query}) and trashed = false"
+        
+        try:
+            page_token = None
+            while True:
+                results = utils.execute_drive(self.service.files().list(
+                    q=query,
+                    fields="nextPageToken, files(id, name, parents, webViewLink, createdTime, md5Checksum,"
+                           " appProperties)",
+                    pageSize=1000,
+                    pageToken=page_token
+                ))
+                
+                listed = [file for file in results.get('files', [])
+                          if (file.get('appProperties') or {}).get('discord_message_id')]
+                message_ids.update(file['appProperties']['discord_message_id'] for file in listed)
+                if self.archive is not None and listed:
+                    try:
+                        self.archive.record_files(listed)
+                    except Exception as e:
+                        print(f"Node 5: Could not update the archive index: {e}")
+                
+                page_token = results.get('nextPageToken')
+                if not page_token:
+                    break
+        except Exception as e:
+            print(f"Error listing existing files: {e}")
+            return None
+
+        print(f"Node 5: Found {len(message_ids)} processed messages in {len(folder_ids)} folder(s).")
+        return message_ids
+        
+    def build_file_metadata(self, folder_id: str, file_name: str, message_id: str = None) -> Dict[str, Any]:
+        """
+        Builds the Drive metadata (name, parents, mimeType, appProperties) for a new summary file.
 
         Args:
             folder_id (str): The ID of the parent folder.
@@ -46,12 +117,8 @@ class Node5_File_Creation:
             message_id (str, optional): The Discord message ID to store in appProperties.
 
         Returns:
-            Optional[Dict[str, Any]]: Metadata of the created file, or None on error.
+            Dict[str, Any]: The request body for files().create.
         """
-        print(f"Node 5: Creating file {file_name} in folder {folder_id}...")
-        if not self.service:
-            return None
-            
         file_metadata = {
             'name': file_name,
             'parents': [folder_id],
@@ -62,10 +129,29 @@ class Node5_File_Creation:
             file_metadata['appProperties'] = {
                 'discord_message_id': str(message_id)
             }
+        return file_metadata
+
+    def create_file(self, folder_id: str, file_name: str, message_id: str = None) -> Optional[Dict[str, Any]]:
+        """
+        Creates a new file in the specified folder.
+
+        Args:
+            folder_id (str): The ID of the parent folder.
+            file_name (str): The name of the file to create.
+            message_id (str, optional): The Discord message ID to store in appProperties.
+
+        Returns:
+            Optional[Dict[str, Any]]: Metadata of the created file, or None on error.
+        """
+        print(f"Node 5: Creating file {file_name} in folder {folder_id}...")
+        if not self.service:
+            return None
+            
+        file_metadata = self.build_file_metadata(folder_id, file_name, message_id)
         
         try:
             # Create an empty file first
-            file = self.service.files().create(body=file_metadata, fields='id, webViewLink').execute()
+            file = utils.execute_drive(self.service.files().create(body=file_metadata, fields='id, webViewLink'))
             print(f"Created file ID: {file.get('id')}")
             return file
         except Exception as e:
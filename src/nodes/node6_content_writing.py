@@ -1,15 +1,42 @@
+import hashlib
+import threading
 from googleapiclient.http import MediaIoBaseUpload
+from google.auth.transport.requests import AuthorizedSession
 from io import BytesIO
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Iterable
 import src.utils as utils
+import src.metrics as metrics
+from src.archive_index import ArchiveIndex, get_archive_index
+
+UPLOAD_URL = "https://www.googleapis.com/upload/drive/v3/files"
+FILE_FIELDS = 'id, name, webViewLink, createdTime, modifiedTime'
+# Drive requires every chunk except the last to be a multiple of 256 KiB
+UPLOAD_CHUNK_SIZE = 256 * 1024
+# Streamed content is indexed for search up to this length (the hash covers all of it)
+MAX_INDEXED_CHARS = 200_000
+# Chunk uploads in a row that Drive may answer without committing new bytes before the upload fails
+MAX_STALLED_CHUNK_ATTEMPTS = 5
 
 class Node6_Content_Writing:
     """
     Node 6: Responsible for writing content to the created Google Drive files.
+
+    Every written file is recorded in the local archive index (message ID,
+    folder, title, link, content hash and the text for full-text search).
     """
-    def __init__(self) -> None:
-        """Initializes the Google Drive service."""
+    def __init__(self, archive: Optional[ArchiveIndex] = None) -> None:
+        """
+        Initializes the Google Drive service.
+
+        Args:
+            archive (Optional[ArchiveIndex]): Local index of written files. Defaults to the
+                shared archive index (see get_archive_index).
+        """
         self.service = utils.get_drive_service()
+        self.archive = archive if archive is not None else get_archive_index()
+        self.limiter = utils.get_concurrency_limiter('drive')
+        self.chunk_size = UPLOAD_CHUNK_SIZE
+        self._local = threading.local()
         
     def write_content(self, file_metadata: Dict[str, Any], content: str) -> Optional[Dict[str, Any]]:
         """
@@ -34,14 +61,162 @@ class Node6_Content_Writing:
             # Try resumable=False to avoid potential quota issues with Service Accounts
             media = MediaIoBaseUpload(BytesIO(content.encode('utf-8')), mimetype='text/markdown', resumable=False)
             
-            updated_file = self.service.files().update(
+            updated_file = utils.execute_drive(self.service.files().update(
                 fileId=file_id,
                 media_body=media,
                 fields='id, name, webViewLink, createdTime, modifiedTime'
-            ).execute()
+            ))
             
             print("Content written successfully.")
+            self._record(dict(file_metadata, **updated_file), content)
             return updated_file
         except Exception as e:
             print(f"Error writing content: {e}")
             return None
+
+    def create_file_with_content(self, file_metadata: Dict[str, Any], content: str) -> Optional[Dict[str, Any]]:
+        """
+        Creates a file and uploads its content in a single multipart request,
+        so no empty file is left behind if the upload fails.
+
+        Args:
+            file_metadata (Dict[str, Any]): Metadata of the new file (see Node5.build_file_metadata).
+            content (str): The markdown content to write.
+
+        Returns:
+            Optional[Dict[str, Any]]: Created file metadata (id, name, webViewLink, timestamps), or None on error.
+        """
+        if not file_metadata or not self.service:
+            print("Invalid file metadata or service not ready.")
+            return None
+            
+        print(f"Node 6: Creating file {file_metadata.get('name')} with content...")
+        
+        try:
+            media = MediaIoBaseUpload(BytesIO(content.encode('utf-8')), mimetype='text/markdown', resumable=False)
+            
+            created_file = utils.execute_drive(self.service.files().create(
+                body=file_metadata,
+                media_body=media,
+                fields=FILE_FIELDS
+            ))
+            
+            print(f"Created file ID: {created_file.get('id')}")
+            self._record(dict(file_metadata, **created_file), content)
+            return created_file
+        except Exception as e:
+            print(f"Error creating file with content: {e}")
+            return None
+
+    def _record(self, file: Dict[str, Any], content: str, hash_value: Optional[str] = None) -> None:
+        """Adds a written file to the archive index (never fails the write)."""
+        if self.archive is None or not file.get('id'):
+            return
+        try:
+            self.archive.record_file(file, content=content, hash_value=hash_value)
+        except Exception as e:
+            print(f"Node 6: Could not add file {file.get('id')} to the archive index: {e}")
+
+    def _get_session(self) -> Optional[AuthorizedSession]:
+        """Returns a keep-alive authorized HTTP session for the current thread."""
+        if not hasattr(self._local, 'session'):
+            creds = utils.get_drive_credentials()
+            self._local.session = AuthorizedSession(creds) if creds else None
+        return self._local.session
+
+    def create_file_streaming(self, file_metadata: Dict[str, Any], chunks: Iterable[str]) -> Optional[Dict[str, Any]]:
+        """
+        Creates a file through a Drive resumable upload session, forwarding text
+        chunks as they arrive. Only one upload chunk is buffered at a time, so
+        memory stays flat regardless of the content length. If the stream fails,
+        the session is never finalized and no file is created.
+
+        Args:
+            file_metadata (Dict[str, Any]): Metadata of the new file (see Node5.build_file_metadata).
+            chunks (Iterable[str]): Streamed markdown text.
+
+        Returns:
+            Optional[Dict[str, Any]]: Created file metadata (id, name, webViewLink, timestamps), or None on error.
+        """
+        session = self._get_session()
+        if not file_metadata or session is None:
+            print("Invalid file metadata or service not ready.")
+            return None
+
+        print(f"Node 6: Streaming file {file_metadata.get('name')} to Drive...")
+        
+        try:
+            def start_session():
+                metrics.count_api_call('drive', 'files.create.resumable')
+                response = session.post(
+                    UPLOAD_URL,
+                    params={'uploadType': 'resumable', 'fields': FILE_FIELDS.replace(' ', '')},
+                    json=file_metadata,
+                    headers={'X-Upload-Content-Type': 'text/markdown'}
+                )
+                response.raise_for_status()
+                return response.headers['Location']
+            session_url = self.limiter.call(start_session)
+
+            buffer = bytearray()
+            offset = 0
+            hasher = hashlib.md5()
+            indexed = []
+            indexed_chars = 0
+            stalled = 0
+            for chunk in chunks:
+                hasher.update(chunk.encode('utf-8'))
+                if indexed_chars < MAX_INDEXED_CHARS:
+                    indexed.append(chunk[:MAX_INDEXED_CHARS - indexed_chars])
+                    indexed_chars += len(indexed[-1])
+                buffer.extend(chunk.encode('utf-8'))
+                while len(buffer) >= self.chunk_size:
+                    committed = self._upload_chunk(session, session_url, bytes(buffer[:self.chunk_size]), offset)
+                    # Drive never un-commits bytes; a missing Range header must not move the offset back
+                    committed = min(max(committed, offset), offset + self.chunk_size)
+                    if committed == offset:
+                        stalled += 1
+                        if stalled >= MAX_STALLED_CHUNK_ATTEMPTS:
+                            raise RuntimeError(f"Upload made no progress after {stalled} attempts at byte {offset}.")
+                        continue
+                    stalled = 0
+                    del buffer[:committed - offset]
+                    offset = committed
+
+            # Final request carries the total size and completes the upload
+            total = offset + len(buffer)
+            content_range = f"bytes {offset}-{total - 1}/{total}" if buffer else f"bytes */{total}"
+            metrics.count_api_call('drive', 'upload.chunk')
+            with self.limiter.slot():
+                response = session.put(session_url, data=bytes(buffer), headers={'Content-Range': content_range})
+                response.raise_for_status()
+            
+            created_file = response.json()
+            print(f"Created file ID: {created_file.get('id')}")
+            self._record(dict(file_metadata, **created_file), "".join(indexed), hasher.hexdigest())
+            return created_file
+        except Exception as e:
+            print(f"Error streaming content: {e}")
+            return None
+
+    def _upload_chunk(self, session: AuthorizedSession, session_url: str, data: bytes, offset: int) -> int:
+        """
+        Sends one intermediate chunk of a resumable upload.
+
+        Returns:
+            int: Number of bytes Drive has committed so far (may be less than sent).
+        """
+        metrics.count_api_call('drive', 'upload.chunk')
+        with self.limiter.slot():
+            response = session.put(
+                session_url,
+                data=data,
+                headers={'Content-Range': f"bytes {offset}-{offset + len(data) - 1}/*"},
+                allow_redirects=False
+            )
+            if response.status_code != 308:
+                response.raise_for_status()
+                raise RuntimeError(f"Unexpected upload response: {response.status_code}")
+        # Range: bytes=0-N  (absent if nothing was stored yet)
+        received = response.headers.get('Range')
+        return int(received.rsplit('-', 1)[1]) + 1 if received else 0
@@ -1,9 +1,33 @@
-from discord_webhook import DiscordWebhook
-from typing import List, Dict, Any, Optional
+import os
+import time
+import threading
+import requests
+from typing import List, Dict, Any, Optional, Tuple
+from src.clients import get_client
+from src.rate_limit import backoff_delay
+import src.utils as utils
+import src.metrics as metrics
+
+# Discord message limits
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_EMBED_DESCRIPTION_CHARS = 4096
+# Titles and descriptions of all embeds in one message combined
+MAX_MESSAGE_EMBED_CHARS = 6000
+# Longer summary titles are cut so one item never fills a whole embed
+MAX_ITEM_TITLE_CHARS = 200
+EMBED_TITLE = "New summaries"
+EMBED_COLOR = 0x1DA1F2
+# Appended to items that reuse the summary of an earlier near-identical post
+DUPLICATE_MARK = " (near duplicate of an earlier post)"
 
 class Node8_Discord_Notification:
     """
     Node 8: Responsible for sending notifications to Discord.
+
+    Items are packed into as few webhook messages as Discord's limits allow
+    (10 embeds per message, 4096 characters per embed description, 6000
+    characters per message) and posted in order over the shared keep-alive
+    session, honoring the webhook's rate-limit bucket.
     """
     def __init__(self, webhook_url: Optional[str]) -> None:
         """
@@ -11,33 +35,163 @@ class Node8_Discord_Notification:
             webhook_url (Optional[str]): The Discord Webhook URL.
         """
         self.webhook_url = webhook_url
-        
-    def send_notification(self, title_list: List[Dict[str, Any]]) -> None:
+        self.username = "X generate"
+        self.max_retries = int(os.getenv("DISCORD_MAX_RETRIES", "5"))
+        # Same keep-alive session as the REST input backend
+        self.session = get_client('discord_http', requests.Session)
+        self.limiter = utils.get_concurrency_limiter('discord')
+        self._bucket_reset_at = 0.0
+        self._lock = threading.Lock()
+
+    def send_notification(self, title_list: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
         """
-        Sends a formatted message to Discord with the list of new summaries.
+        Sends formatted messages to Discord with the list of new summaries.
+        A message that cannot be delivered does not stop the following ones.
+        Without a webhook URL notifications are disabled and every item counts as
+        delivered, so nothing is kept around to be retried.
 
         Args:
-            title_list (List[Dict[str, Any]]): List of metadata items to notify about.
+            title_list (List[Dict[str, Any]]): List of metadata items to notify about. Extra
+                keys (e.g. 'message_id') are not sent and are kept in the report.
+
+        Returns:
+            Dict[str, List[Dict[str, Any]]]: The items that were 'delivered' and those that 'failed'.
         """
         print("Node 8: Sending Discord notification...")
+        report: Dict[str, List[Dict[str, Any]]] = {'delivered': [], 'failed': []}
         if not self.webhook_url:
-            print("Discord Webhook URL not set.")
-            return
-            
+            print("Discord Webhook URL not set; notifications are disabled.")
+            report['delivered'] = list(title_list)
+            return report
+
         if not title_list:
             print("No new items to notify.")
-            return
-            
-        # Construct message
-        content = ""
+            return report
+
+        messages = self.build_messages(title_list)
+        for payload, items in messages:
+            try:
+                self._post(payload)
+                report['delivered'].extend(items)
+            except Exception as e:
+                print(f"Error sending notification: {e}")
+                report['failed'].extend(items)
+
+        print(f"Notification sent: {len(report['delivered'])} item(s) delivered in {len(messages)} message(s), "
+              f"{len(report['failed'])} failed.")
+        return report
+
+    def build_messages(self, title_list: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+        """
+        Packs the items, one markdown link line each, into webhook payloads within
+        Discord's embed and character limits.
+
+        Args:
+            title_list (List[Dict[str, Any]]): List of metadata items to notify about.
+
+        Returns:
+            List[Tuple[Dict[str, Any], List[Dict[str, Any]]]]: (webhook JSON body, items it carries) per message.
+        """
+        messages: List[Tuple[List[List[str]], List[Dict[str, Any]]]] = []
+        embeds: List[List[str]] = []
+        items: List[Dict[str, Any]] = []
+        message_chars = 0
+        embed_chars = 0
+
         for item in title_list:
-            title = item.get('title', 'Untitled')
-            url = item.get('url', '#')
-            content += f"- [{title}]({url})\n"
-            
-        webhook = DiscordWebhook(url=self.webhook_url, content=content, username="X generate")
+            line = self._format_line(item)
+            if embeds and embed_chars + 1 + len(line) <= MAX_EMBED_DESCRIPTION_CHARS \
+                    and message_chars + 1 + len(line) <= MAX_MESSAGE_EMBED_CHARS:
+                # Next line of the current embed
+                embeds[-1].append(line)
+                embed_chars += 1 + len(line)
+                message_chars += 1 + len(line)
+            elif embeds and len(embeds) < MAX_EMBEDS_PER_MESSAGE \
+                    and message_chars + len(line) <= MAX_MESSAGE_EMBED_CHARS:
+                # New embed in the current message
+                embeds.append([line])
+                embed_chars = len(line)
+                message_chars += len(line)
+            else:
+                # New message
+                if embeds:
+                    messages.append((embeds, items))
+                embeds, items = [[line]], []
+                embed_chars = len(line)
+                message_chars = len(EMBED_TITLE) + len(line)
+            items.append(item)
+        if embeds:
+            messages.append((embeds, items))
+
+        return [(self._build_payload(message_embeds), message_items) for message_embeds, message_items in messages]
+
+    def _format_line(self, item: Dict[str, Any]) -> str:
+        """Formats one item as a markdown link line (marked if it is a near duplicate)."""
+        title = (item.get('title') or 'Untitled').replace('[', '(').replace(']', ')')
+        if len(title) > MAX_ITEM_TITLE_CHARS:
+            title = title[:MAX_ITEM_TITLE_CHARS - 3] + "..."
+        url = item.get('url') or '#'
+        line = f"- [{title}]({url})"
+        if item.get('duplicate_of'):
+            line += DUPLICATE_MARK
+        return line[:MAX_EMBED_DESCRIPTION_CHARS]
+
+    def _build_payload(self, embeds: List[List[str]]) -> Dict[str, Any]:
+        """Builds the webhook JSON body; only the first embed carries the title."""
+        payload_embeds = []
+        for i, lines in enumerate(embeds):
+            embed = {"description": "\n".join(lines), "color": EMBED_COLOR}
+            if i == 0:
+                embed["title"] = EMBED_TITLE
+            payload_embeds.append(embed)
+        return {
+            "username": self.username,
+            "embeds": payload_embeds,
+            # Titles come from user content; never ping anyone
+            "allowed_mentions": {"parse": []},
+        }
+
+    def _post(self, payload: Dict[str, Any]) -> None:
+        """
+        Executes the webhook honoring Discord rate-limit headers: waits when the
+        bucket is exhausted, retries 429 responses after retry_after and 5xx
+        responses with backoff. Raises once retries are exhausted.
+        """
+        for attempt in range(self.max_retries + 1):
+            with self._lock:
+                wait = self._bucket_reset_at - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+
+            metrics.count_api_call('discord', 'webhook')
+            with self.limiter.slot() as slot:
+                response = self.session.post(self.webhook_url, params={"wait": "true"}, json=payload, timeout=10)
+                if response.status_code == 429:
+                    slot.throttle(self._retry_after(response))
+
+            if response.headers.get("X-RateLimit-Remaining") == "0":
+                reset_after = float(response.headers.get("X-RateLimit-Reset-After", "0"))
+                with self._lock:
+                    self._bucket_reset_at = time.monotonic() + reset_after
+
+            if attempt < self.max_retries:
+                if response.status_code == 429:
+                    print(f"Node 8: Rate limited, retrying in {slot.retry_after:.2f}s...")
+                    time.sleep(slot.retry_after)
+                    continue
+                if response.status_code >= 500:
+                    delay = backoff_delay(attempt, base_seconds=0.5)
+                    print(f"Node 8: Webhook error {response.status_code}, retrying in {delay:.1f}s...")
+                    time.sleep(delay)
+                    continue
+
+            response.raise_for_status()
+            return
+
+    @staticmethod
+    def _retry_after(response: requests.Response) -> float:
+        """Seconds to wait before retrying a 429 response."""
         try:
-            response = webhook.execute()
-            print(f"Notification sent. Status Code: {response.status_code}")
-        except Exception as e:
-            print(f"Error sending notification: {e}")
+            return float(response.json().get("retry_after", 1))
+        except ValueError:
+            return float(response.headers.get("Retry-After", "1"))
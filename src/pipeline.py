@@ -0,0 +1,215 @@
+import time
+import queue
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import src.metrics as metrics
+
+class SkipItem(Exception):
+    """Raised by a stage to stop an item without counting it as a failure (e.g. already processed)."""
+
+class StageTimeoutError(TimeoutError):
+    """Raised when a stage does not finish an item within its timeout."""
+
+class Stage:
+    """
+    One step of a Pipeline.
+
+    The stage function is called with the item's values named in `inputs`, as
+    positional arguments in that order. Its return value is stored under the name in `outputs`
+    (a tuple in the same order when there are several outputs).
+    """
+    def __init__(self, name: str, func: Callable[..., Any], inputs: List[str], outputs: List[str],
+                 concurrency: int = 1, timeout: Optional[float] = None, queue_size: int = 0) -> None:
+        """
+        Args:
+            name (str): Stage name used in logs and results.
+            func (Callable[..., Any]): Function doing the work for one item.
+            inputs (List[str]): Names of the item values passed to func.
+            outputs (List[str]): Names under which func's return value is stored.
+            concurrency (int): Max items in this stage at the same time.
+            timeout (Optional[float]): Seconds before an item fails with StageTimeoutError (None waits forever).
+            queue_size (int): Max items waiting for this stage (0 is unbounded). When full,
+                the previous stage waits, so a slow stage throttles the ones before it.
+        """
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.queue_size = queue_size
+
+    def run(self, values: Dict[str, Any]) -> Dict[str, Any]:
+        """Runs the stage for one item and returns its outputs by name (timed as 'stage.<name>')."""
+        start = time.perf_counter()
+        try:
+            result = self._call([values[name] for name in self.inputs])
+        finally:
+            metrics.observe(f"stage.{self.name}", (time.perf_counter() - start) * 1000)
+        if not self.outputs:
+            return {}
+        if len(self.outputs) == 1:
+            return {self.outputs[0]: result}
+        return dict(zip(self.outputs, result))
+
+    def _call(self, args: List[Any]) -> Any:
+        if not self.timeout:
+            return self.func(*args)
+
+        # Python threads cannot be cancelled: a timed-out call is abandoned and
+        # finishes in the background, but the item moves on as failed
+        outcome: Dict[str, Any] = {}
+
+        def target():
+            try:
+                outcome['value'] = self.func(*args)
+            except BaseException as e:
+                outcome['error'] = e
+
+        thread = threading.Thread(target=target, name=f"stage-{self.name}", daemon=True)
+        thread.start()
+        thread.join(self.timeout)
+        if thread.is_alive():
+            raise StageTimeoutError(f"Stage '{self.name}' timed out after {self.timeout}s")
+        if 'error' in outcome:
+            raise outcome['error']
+        return outcome.get('value')
+
+class ItemResult:
+    """
+    Outcome of one item.
+
+    Attributes:
+        index (int): Position of the item in the input.
+        values (Dict[str, Any]): Initial values plus the outputs of every stage that ran.
+        status (str): 'done', 'skipped' or 'failed'.
+        stage (Optional[str]): Stage that skipped or failed the item.
+        error (Optional[BaseException]): The exception of a failed item.
+    """
+    def __init__(self, index: int, values: Dict[str, Any], status: str,
+                 stage: Optional[str] = None, error: Optional[BaseException] = None) -> None:
+        self.index = index
+        self.values = values
+        self.status = status
+        self.stage = stage
+        self.error = error
+
+class Pipeline:
+    """
+    Runs items through a sequence of stages. Every stage has its own queue and
+    worker threads, so different items can be in different stages at the same
+    time (item N+1 can look up its folder while item N is being summarized).
+    An exception fails only the item that raised it.
+    """
+    def __init__(self, stages: List[Stage], inputs: List[str]) -> None:
+        """
+        Args:
+            stages (List[Stage]): Stages in execution order.
+            inputs (List[str]): Names of the values every item starts with.
+
+        Raises:
+            ValueError: If a stage reads a value no earlier stage (or the input) provides.
+        """
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage.")
+        available = set(inputs)
+        for stage in stages:
+            missing = [name for name in stage.inputs if name not in available]
+            if missing:
+                raise ValueError(f"Stage '{stage.name}' needs {missing}, which no earlier stage provides.")
+            available.update(stage.outputs)
+        self.stages = stages
+
+    def process(self, values: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Runs one item through every stage in the calling thread.
+
+        Returns:
+            Optional[Dict[str, Any]]: The item's values, or None if a stage skipped it.
+
+        Raises:
+            Exception: Whatever a stage raised.
+        """
+        values = dict(values)
+        for stage in self.stages:
+            try:
+                values.update(stage.run(values))
+            except SkipItem as e:
+                print(f"Skipping ({stage.name}): {e}")
+                return None
+        return values
+
+    def run(self, items: Iterable[Dict[str, Any]],
+            on_item_done: Optional[Callable[[ItemResult], None]] = None) -> List[ItemResult]:
+        """
+        Runs all items through the stages concurrently.
+
+        Args:
+            items (Iterable[Dict[str, Any]]): Initial values of each item.
+            on_item_done (Optional[Callable[[ItemResult], None]]): Called (from a worker
+                thread) as soon as an item is done, skipped or failed.
+
+        Returns:
+            List[ItemResult]: One result per item, in input order.
+        """
+        items = [dict(values) for values in items]
+        if not items:
+            return []
+
+        queues = [queue.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        results: List[Optional[ItemResult]] = [None] * len(items)
+        lock = threading.Lock()
+        all_done = threading.Event()
+        remaining = [len(items)]
+
+        def finish(result: ItemResult) -> None:
+            results[result.index] = result
+            if on_item_done:
+                try:
+                    on_item_done(result)
+                except Exception as e:
+                    print(f"Pipeline: on_item_done failed for item {result.index}: {e}")
+            with lock:
+                remaining[0] -= 1
+                if remaining[0] == 0:
+                    all_done.set()
+
+        def worker(position: int) -> None:
+            stage = self.stages[position]
+            while True:
+                entry = queues[position].get()
+                if entry is None:
+                    return
+                index, values = entry
+                try:
+                    values.update(stage.run(values))
+                except SkipItem as e:
+                    print(f"Skipping item {index} ({stage.name}): {e}")
+                    finish(ItemResult(index, values, 'skipped', stage=stage.name))
+                    continue
+                except Exception as e:
+                    print(f"Error in stage '{stage.name}' for item {index}: {e}")
+                    finish(ItemResult(index, values, 'failed', stage=stage.name, error=e))
+                    continue
+                if position + 1 < len(self.stages):
+                    queues[position + 1].put(entry)
+                else:
+                    finish(ItemResult(index, values, 'done'))
+
+        threads = [
+            threading.Thread(target=worker, args=(position,), name=f"pipeline-{stage.name}-{n}", daemon=True)
+            for position, stage in enumerate(self.stages)
+            for n in range(stage.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for index, values in enumerate(items):
+            queues[0].put((index, values))
+
+        all_done.wait()
+        for position, stage in enumerate(self.stages):
+            for _ in range(stage.concurrency):
+                queues[position].put(None)
+        for thread in threads:
+            thread.join()
+        return results
@@ -0,0 +1,70 @@
+import os
+import hashlib
+import functools
+from typing import Optional, Sequence
+
+# Bump when the prompt layout below changes,
+# so cached summaries from the old prompt are not reused.
+PROMPT_VERSION = "3"
+
+PLACEHOLDER = "{専門的なコメント}"
+POST_LABEL = "【対象の投稿テキスト】"
+LINKS_LABEL = "【投稿内のリンク】"
+
+DEFAULT_SYSTEM_PROMPT = "You are a helpful assistant that summarizes X posts. Analyze the intent and content. Output in Markdown."
+
+# Explicitly mention NOT to use external search and rely on the text
+INSTRUCTIONS = (
+    "\n\n【指示】\n末尾の" + POST_LABEL + "の内容に基づいて、正確な解説を生成してください。"
+    "\n外部情報の検索は行わず、提供されたテキスト情報のみを正として処理してください。"
+    "\n全く無関係なトピックの生成は禁止します。"
+    "\n最終的な出力は必ず日本語で行ってください。"
+)
+
+DEFAULT_TEMPLATE_PATH = os.path.join(os.path.dirname(__file__), "system_prompt.md")
+
+class PromptTemplate:
+    """
+    Compiled prompt for Node 3.
+    Everything that does not depend on the post (system prompt + instructions)
+    forms a byte-identical static prefix; the post text is only appended at the
+    end, so provider-side prefix/context caching can reuse the prefix.
+    """
+    def __init__(self, system_prompt: str) -> None:
+        """
+        Args:
+            system_prompt (str): Contents of system_prompt.md.
+        """
+        # The post is referenced by label instead of being spliced into the middle
+        self.prefix = system_prompt.replace(PLACEHOLDER, POST_LABEL) + INSTRUCTIONS
+        self.version = f"{PROMPT_VERSION}:{hashlib.sha256(self.prefix.encode('utf-8')).hexdigest()[:12]}"
+
+    def suffix(self, text: str, urls: Sequence[str] = ()) -> str:
+        """Returns the per-post part of the prompt: the post text and its (resolved) links."""
+        suffix = f"\n\n{POST_LABEL}\n{text}"
+        if urls:
+            suffix += f"\n\n{LINKS_LABEL}\n" + "\n".join(urls)
+        return suffix
+
+    def build(self, text: str, urls: Sequence[str] = ()) -> str:
+        """Returns the full prompt: static prefix followed by the post text and links."""
+        return self.prefix + self.suffix(text, urls)
+
+@functools.lru_cache(maxsize=None)
+def get_prompt_template(path: Optional[str] = None) -> PromptTemplate:
+    """
+    Loads and compiles the prompt template once per process.
+
+    Args:
+        path (Optional[str]): Template file. Defaults to src/system_prompt.md.
+
+    Returns:
+        PromptTemplate: The compiled template.
+    """
+    system_prompt = DEFAULT_SYSTEM_PROMPT
+    try:
+        with open(path or DEFAULT_TEMPLATE_PATH, "r") as f:
+            system_prompt = f.read()
+    except FileNotFoundError:
+        pass
+    return PromptTemplate(system_prompt)
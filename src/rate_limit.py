@@ -0,0 +1,348 @@
+import time
+import random
+import asyncio
+import threading
+import email.utils
+from contextlib import contextmanager, asynccontextmanager
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Callable, Iterator, Optional, Tuple, TypeVar
+import src.metrics as metrics
+
+T = TypeVar('T')
+
+# Responses that mean "slow down"
+THROTTLE_STATUSES = (429, 503)
+# Successful calls needed before latency is used as a congestion signal
+LATENCY_WARMUP_SAMPLES = 5
+# Weight of the newest sample in the smoothed latency
+LATENCY_EWMA_ALPHA = 0.2
+# Latency increases smaller than this are treated as jitter
+LATENCY_SLACK_SECONDS = 0.05
+# How fast the latency baseline drifts up towards slower samples (per sample)
+BASELINE_DRIFT = 1.01
+# How often async callers re-check a full limiter
+ASYNC_POLL_SECONDS = 0.01
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `rate_per_minute`.
+    Callers reserve capacity up front and sleep for the returned delay, so the
+    same bucket can be shared by threads and asyncio tasks.
+    """
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None) -> None:
+        """
+        Args:
+            rate_per_minute (float): Sustained refill rate.
+            capacity (Optional[float]): Burst size. Defaults to one minute's worth.
+        """
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate_per_second)
+        self._updated = now
+
+    def reserve(self, amount: float = 1) -> float:
+        """
+        Takes `amount` tokens (the balance may go negative) and returns how many
+        seconds the caller must wait before the reservation is covered.
+        """
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate_per_second
+
+    def adjust(self, delta: float) -> None:
+        """Corrects an earlier reservation once the real cost is known (positive = used more)."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens - delta)
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute limits for one API.
+    """
+    def __init__(self, requests_per_minute: float, tokens_per_minute: Optional[float] = None) -> None:
+        """
+        Args:
+            requests_per_minute (float): RPM quota.
+            tokens_per_minute (Optional[float]): TPM quota. None disables token limiting.
+        """
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    def _reserve(self, tokens: int) -> float:
+        wait = self.requests.reserve(1)
+        if self.tokens:
+            wait = max(wait, self.tokens.reserve(tokens))
+        return wait
+
+    def acquire(self, tokens: int = 0) -> None:
+        """Blocks until one request using `tokens` tokens is allowed."""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: int = 0) -> None:
+        """Waits (without blocking the event loop) until one request using `tokens` tokens is allowed."""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """Replaces the estimated token cost of a finished request with the real one."""
+        if self.tokens and actual_tokens is not None:
+            self.tokens.adjust(actual_tokens - estimated_tokens)
+
+def backoff_delay(attempt: int, base_seconds: float = 1.0, max_seconds: float = 60.0) -> float:
+    """Exponential backoff with full jitter for the given (0-based) retry attempt."""
+    return random.uniform(0, min(max_seconds, base_seconds * (2 ** attempt)))
+
+def parse_retry_after(value: Any) -> Optional[float]:
+    """Parses a Retry-After value (seconds or an HTTP date) into seconds from now."""
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(str(value))
+    except (TypeError, ValueError, IndexError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+def throttle_info(error: BaseException) -> Tuple[bool, Optional[float]]:
+    """
+    Tells whether an API client exception means the service is throttling
+    (429/503, or Drive's 403 rateLimitExceeded) and extracts its Retry-After.
+
+    Understands googleapiclient HttpError (.resp), google-genai APIError (.code),
+    requests HTTPError (.response) and discord.py HTTPException (.status).
+
+    Returns:
+        Tuple[bool, Optional[float]]: (throttled, Retry-After in seconds or None).
+    """
+    resp = getattr(error, 'resp', None)
+    response = getattr(error, 'response', None)
+    status = None
+    for candidate in (getattr(resp, 'status', None), getattr(error, 'code', None),
+                      getattr(error, 'status', None), getattr(response, 'status_code', None)):
+        if isinstance(candidate, int):
+            status = candidate
+            break
+    if status == 403:
+        content = getattr(error, 'content', None) or b''
+        if isinstance(content, str):
+            content = content.encode('utf-8', 'replace')
+        throttled = b'ateLimitExceeded' in content
+    else:
+        throttled = status in THROTTLE_STATUSES
+    if not throttled:
+        return False, None
+
+    for headers in (resp, getattr(response, 'headers', None)):
+        if headers is not None and hasattr(headers, 'get'):
+            value = headers.get('retry-after') or headers.get('Retry-After')
+            if value is not None:
+                return True, parse_retry_after(value)
+    return True, None
+
+class ConcurrencySlot:
+    """One in-flight call admitted by an AdaptiveConcurrencyLimiter."""
+    def __init__(self) -> None:
+        self.started_at = time.monotonic()
+        self.throttled = False
+        self.failed = False
+        self.retry_after: Optional[float] = None
+
+    def throttle(self, retry_after: Optional[float] = None) -> None:
+        """Reports a throttled response that did not raise (e.g. a 429 status code)."""
+        self.throttled = True
+        self.retry_after = retry_after
+
+    def exclude(self, seconds: float) -> None:
+        """Leaves time spent outside the call (e.g. a consumer holding a stream) out of its latency."""
+        self.started_at += seconds
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD (additive increase, multiplicative decrease) limit on the number of
+    concurrent calls to one service, in the spirit of TCP congestion control.
+
+    Every successful call grows the limit by 1/limit (about +1 per full window).
+    A throttled call, or a smoothed latency above `latency_tolerance` times the
+    service's baseline, multiplies it by `backoff_factor`; calls that started
+    before the last decrease don't cut it again, so one burst of 429s counts as
+    a single congestion signal. A Retry-After holds back every new call until it
+    has passed. Other errors leave the limit unchanged.
+    """
+    def __init__(self, name: str, initial_limit: int = 4, min_limit: int = 1, max_limit: int = 32,
+                 backoff_factor: float = 0.5, latency_tolerance: Optional[float] = 2.0) -> None:
+        """
+        Args:
+            name (str): Service name, used in logs and metrics (e.g. 'drive').
+            initial_limit (int): Concurrency to start with.
+            min_limit (int): Floor of the limit (at least 1).
+            max_limit (int): Ceiling of the limit.
+            backoff_factor (float): Multiplier applied on congestion.
+            latency_tolerance (Optional[float]): Latency/baseline ratio treated as congestion.
+                None or 0 disables the latency signal.
+        """
+        self.name = name
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self.backoff_factor = backoff_factor
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self._samples = 0
+        self._baseline: Optional[float] = None
+        self._smoothed: Optional[float] = None
+        self._blocked_until = 0.0
+        self._last_decrease = float('-inf')
+        self._condition = threading.Condition()
+
+    def _try_acquire(self) -> Optional[float]:
+        """
+        Takes a slot if one is free. Must hold the condition.
+
+        Returns:
+            Optional[float]: None if acquired, the remaining Retry-After pause, or 0.0 if full.
+        """
+        wait = self._blocked_until - time.monotonic()
+        if wait > 0:
+            return wait
+        if self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return None
+        return 0.0
+
+    def acquire(self) -> ConcurrencySlot:
+        """Blocks until a call may start."""
+        with self._condition:
+            while True:
+                wait = self._try_acquire()
+                if wait is None:
+                    return ConcurrencySlot()
+                self._condition.wait(wait or None)
+
+    async def acquire_async(self) -> ConcurrencySlot:
+        """Waits (without blocking the event loop) until a call may start."""
+        while True:
+            with self._condition:
+                wait = self._try_acquire()
+            if wait is None:
+                return ConcurrencySlot()
+            await asyncio.sleep(wait or ASYNC_POLL_SECONDS)
+
+    def release(self, slot: ConcurrencySlot) -> None:
+        """Ends a call and adjusts the limit from its outcome and latency."""
+        now = time.monotonic()
+        with self._condition:
+            self.in_flight -= 1
+            if slot.throttled:
+                metrics.increment(f"limiter.{self.name}.throttled")
+                if slot.retry_after:
+                    self._blocked_until = max(self._blocked_until, now + slot.retry_after)
+                self._decrease(slot.started_at, now)
+            elif not slot.failed:
+                self._observe_latency(now - slot.started_at)
+                if self._is_latency_congested():
+                    self._decrease(slot.started_at, now)
+                    # Require the slowdown to persist before cutting again
+                    self._smoothed = self._baseline
+                else:
+                    self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+    def _observe_latency(self, latency: float) -> None:
+        self._samples += 1
+        if self._smoothed is None:
+            self._smoothed = latency
+        else:
+            self._smoothed += LATENCY_EWMA_ALPHA * (latency - self._smoothed)
+        # Lowest recent latency; drifts up slowly so a lasting change becomes the new normal
+        self._baseline = latency if self._baseline is None else min(latency, self._baseline * BASELINE_DRIFT)
+
+    def _is_latency_congested(self) -> bool:
+        if not self.latency_tolerance or self._samples < LATENCY_WARMUP_SAMPLES or self._baseline is None:
+            return False
+        return self._smoothed > self._baseline * self.latency_tolerance + LATENCY_SLACK_SECONDS
+
+    def _decrease(self, started_at: float, now: float) -> None:
+        if started_at < self._last_decrease:
+            return
+        previous = self.limit
+        self.limit = max(float(self.min_limit), self.limit * self.backoff_factor)
+        self._last_decrease = now
+        metrics.increment(f"limiter.{self.name}.decreases")
+        print(f"Limiter ({self.name}): Congestion, concurrency {previous:.1f} -> {self.limit:.1f}")
+
+    def _finish(self, slot: ConcurrencySlot, error: Optional[BaseException]) -> None:
+        if error is not None and not slot.throttled:
+            throttled, retry_after = throttle_info(error) if isinstance(error, Exception) else (False, None)
+            if throttled:
+                slot.throttle(retry_after)
+            else:
+                slot.failed = True
+        self.release(slot)
+
+    @contextmanager
+    def slot(self) -> Iterator[ConcurrencySlot]:
+        """
+        Runs the block as one call. Exceptions are classified with throttle_info;
+        responses that signal throttling without raising are reported via slot.throttle().
+        """
+        slot = self.acquire()
+        error = None
+        try:
+            yield slot
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._finish(slot, error)
+
+    @asynccontextmanager
+    async def slot_async(self) -> AsyncIterator[ConcurrencySlot]:
+        """Async variant of slot()."""
+        slot = await self.acquire_async()
+        error = None
+        try:
+            yield slot
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._finish(slot, error)
+
+    def call(self, func: Callable[[], T], max_retries: int = 3) -> T:
+        """
+        Runs func() as one call, retrying throttled attempts after their Retry-After
+        (or an exponential backoff when there is none). Other errors are raised as is.
+        """
+        attempt = 0
+        while True:
+            try:
+                with self.slot():
+                    return func()
+            except Exception as e:
+                throttled, retry_after = throttle_info(e)
+                if not throttled or attempt >= max_retries:
+                    raise
+                delay = retry_after if retry_after is not None else backoff_delay(attempt)
+                print(f"Limiter ({self.name}): Throttled, retrying in {delay:.1f}s...")
+                # acquire() already waits out a Retry-After
+                if retry_after is None:
+                    time.sleep(delay)
+                attempt += 1
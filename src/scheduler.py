@@ -0,0 +1,164 @@
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+import src.metrics as metrics
+
+ORDERINGS = ("oldest", "newest", "fair")
+# Cost of one message when there is no latency history yet (cold start)
+DEFAULT_MESSAGE_COST_MS = 20000
+# Kept free for the notification, the Drive flushes and the metrics record
+DEFAULT_RESERVE_MS = 5000
+
+def get_remaining_time_ms(context: Any = None) -> Optional[float]:
+    """
+    Returns the time left in this invocation: RUN_TIME_BUDGET_MS if set (local
+    runs), else the Lambda context's get_remaining_time_in_millis().
+
+    Returns:
+        Optional[float]: Milliseconds left, or None if there is no limit.
+    """
+    budget = os.getenv("RUN_TIME_BUDGET_MS")
+    if budget:
+        try:
+            return float(budget)
+        except ValueError:
+            print(f"Scheduler: Ignoring invalid RUN_TIME_BUDGET_MS={budget!r}")
+    get_remaining = getattr(context, "get_remaining_time_in_millis", None)
+    if callable(get_remaining):
+        return float(get_remaining())
+    return None
+
+class AdmissionScheduler:
+    """
+    Decides which fetched messages a run can still finish before the Lambda
+    time limit, so a large batch is not killed mid-message.
+
+    The cost of one message is the sum of the p95 stage latencies ('stage.*')
+    in the metrics history of recent runs. Stages overlap, so throughput is set
+    by the bottleneck stage (the highest latency per parallel slot): n messages
+    are estimated at ceil(n / slots) times its latency, plus the other stages
+    of one message. Without history a message is one stage of the default cost
+    run `workers` at a time. Whatever does not fit is deferred: it is never
+    committed to the checkpoint, so the next invocation fetches it again.
+
+    Admission runs after the Drive sync, so its time is already spent; the
+    batch preprocessing (Node 2 link resolution) that follows is reserved.
+    """
+    def __init__(self, remaining_ms: Optional[float], workers: int = 1, ordering: Optional[str] = None,
+                 stage_latencies: Optional[Dict[str, float]] = None, reserve_ms: Optional[float] = None,
+                 default_message_cost_ms: Optional[float] = None,
+                 stage_concurrency: Optional[Union[Dict[str, int], Callable[[], Dict[str, int]]]] = None) -> None:
+        """
+        Args:
+            remaining_ms (Optional[float]): Time left in the invocation (None is unlimited).
+            workers (int): Messages a stage handles in parallel unless `stage_concurrency` says otherwise.
+            ordering (Optional[str]): 'oldest' (default), 'newest' or 'fair' (round robin across
+                authors). Defaults to SCHEDULER_ORDER.
+            stage_latencies (Optional[Dict[str, float]]): Milliseconds per stage of one message.
+                Defaults to the p95 of each 'stage.*' timing in the metrics history.
+            reserve_ms (Optional[float]): Time kept free for the end of the run, on top of the
+                p95 of the notification and of the batch preprocessing (or, without history, the
+                link-resolve deadline). Defaults to SCHEDULER_RESERVE_MS or 5000.
+            default_message_cost_ms (Optional[float]): Cost of one message without history.
+                Defaults to SCHEDULER_DEFAULT_MESSAGE_MS or 20000.
+            stage_concurrency (Optional[Union[Dict[str, int], Callable[[], Dict[str, int]]]]):
+                Messages each stage ('stage.<name>') actually runs at once, e.g. capped by a
+                service's concurrency limiter. A callable is read again on every capacity check.
+        """
+        self.deadline = time.monotonic() + remaining_ms / 1000 if remaining_ms is not None else None
+        self.workers = max(1, workers)
+        ordering = (ordering or os.getenv("SCHEDULER_ORDER", "oldest")).lower()
+        if ordering not in ORDERINGS:
+            print(f"Scheduler: Unknown ordering '{ordering}', using 'oldest'.")
+            ordering = "oldest"
+        self.ordering = ordering
+        if reserve_ms is None:
+            reserve_ms = float(os.getenv("SCHEDULER_RESERVE_MS", str(DEFAULT_RESERVE_MS)))
+        if default_message_cost_ms is None:
+            default_message_cost_ms = float(os.getenv("SCHEDULER_DEFAULT_MESSAGE_MS", str(DEFAULT_MESSAGE_COST_MS)))
+        if stage_latencies is None and self.deadline is not None:
+            stage_latencies, notify_ms, preprocess_ms = self._load_history()
+            reserve_ms += notify_ms + preprocess_ms
+        self.reserve_ms = reserve_ms
+        self.stage_latencies = {name: ms for name, ms in (stage_latencies or {}).items() if ms > 0}
+        self.stage_concurrency = stage_concurrency or {}
+        self.message_cost_ms = sum(self.stage_latencies.values()) or default_message_cost_ms
+
+    @staticmethod
+    def _load_history() -> Tuple[Dict[str, float], float, float]:
+        """
+        Returns the p95 stage latencies, notification time and batch preprocessing
+        time from the metrics history. Without preprocessing history, the link-resolve
+        deadline (LINK_RESOLVE_DEADLINE_SECONDS, default 5) bounds it.
+        """
+        deadline_ms = float(os.getenv("LINK_RESOLVE_DEADLINE_SECONDS", "5")) * 1000
+        try:
+            history = metrics.summarize_history()
+        except Exception as e:
+            print(f"Scheduler: Could not read metrics history: {e}")
+            return {}, 0.0, deadline_ms
+        stages = {name: stats['p95'] for name, stats in history.items()
+                  if name.startswith("stage.") and stats['p95'] is not None}
+        notify = history.get("node8.notify", {}).get('p95') or 0.0
+        preprocess = history.get("node2.preprocess", {}).get('p95')
+        return stages, notify, preprocess if preprocess is not None else deadline_ms
+
+    def remaining_ms(self) -> Optional[float]:
+        """Returns the milliseconds left before the deadline, or None if there is none."""
+        if self.deadline is None:
+            return None
+        return (self.deadline - time.monotonic()) * 1000
+
+    def capacity(self) -> Optional[int]:
+        """Returns how many messages can still be finished in time, or None if unlimited."""
+        remaining = self.remaining_ms()
+        if remaining is None:
+            return None
+        concurrency = self.stage_concurrency() if callable(self.stage_concurrency) else self.stage_concurrency
+        if not self.stage_latencies:
+            # One stage of the default cost, run as many at a time as Gemini allows
+            workers = max(1, min(self.workers, concurrency.get('stage.summarize', self.workers)))
+            rounds = int((remaining - self.reserve_ms) // self.message_cost_ms)
+            return max(0, rounds) * workers
+        slots = {name: max(1, concurrency.get(name, self.workers)) for name in self.stage_latencies}
+        bottleneck = max(self.stage_latencies, key=lambda name: self.stage_latencies[name] / slots[name])
+        latency = self.stage_latencies[bottleneck]
+        # The other stages add one message's worth of pipeline fill and drain time
+        rounds = int((remaining - self.reserve_ms - (self.message_cost_ms - latency)) // latency)
+        return max(0, rounds) * slots[bottleneck]
+
+    def order(self, posts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Returns the messages in admission order."""
+        by_age = sorted(posts, key=lambda post: int(post['id']))
+        if self.ordering == "newest":
+            return by_age[::-1]
+        if self.ordering == "fair":
+            # Round robin across authors, each author's oldest message first
+            queues: Dict[str, List[Dict[str, Any]]] = {}
+            for post in by_age:
+                queues.setdefault(post.get('author') or "", []).append(post)
+            ordered = []
+            for i in range(max((len(q) for q in queues.values()), default=0)):
+                ordered += [q[i] for q in queues.values() if i < len(q)]
+            return ordered
+        return by_age
+
+    def admit(self, posts: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Splits the messages into those to process now and those deferred to the next invocation.
+
+        Returns:
+            Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]: (admitted, deferred), each in admission order.
+        """
+        ordered = self.order(posts)
+        capacity = self.capacity()
+        if capacity is None or capacity >= len(ordered):
+            admitted, deferred = ordered, []
+        else:
+            admitted, deferred = ordered[:capacity], ordered[capacity:]
+        if deferred:
+            print(f"Scheduler: {self.remaining_ms():.0f}ms left, ~{self.message_cost_ms:.0f}ms per message; "
+                  f"admitting {len(admitted)} message(s), deferring {len(deferred)} to the next run.")
+        metrics.increment("scheduler.admitted", len(admitted))
+        metrics.increment("scheduler.deferred", len(deferred))
+        return admitted, deferred
@@ -0,0 +1,95 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from typing import Iterable, Optional
+
+DEFAULT_CACHE_PATH = "/tmp/summary_cache.sqlite3"
+
+def normalize_text(text: str) -> str:
+    """Normalizes post text so trivially different copies share a cache key."""
+    text = unicodedata.normalize("NFKC", text or "")
+    return re.sub(r'\s+', ' ', text).strip()
+
+class SummaryCache:
+    """
+    Persistent cache of generated summaries keyed by a hash of the normalized
+    post text, the model name and the prompt version.
+    Backed by SQLite under /tmp so warm Lambda invocations reuse it.
+    Entries expire after a TTL and the least recently used ones are evicted
+    once the cache grows past max_entries.
+    """
+    def __init__(self, path: Optional[str] = None, ttl_seconds: Optional[int] = None,
+                 max_entries: Optional[int] = None) -> None:
+        """
+        Args:
+            path (Optional[str]): SQLite file. Defaults to SUMMARY_CACHE_PATH or
+                /tmp/summary_cache.sqlite3. An empty string keeps the cache in memory only.
+            ttl_seconds (Optional[int]): Entry lifetime. Defaults to SUMMARY_CACHE_TTL_SECONDS or 7 days.
+            max_entries (Optional[int]): LRU size bound. Defaults to SUMMARY_CACHE_MAX_ENTRIES or 1000.
+        """
+        self.path = path if path is not None else os.getenv("SUMMARY_CACHE_PATH", DEFAULT_CACHE_PATH)
+        if ttl_seconds is None:
+            ttl_seconds = int(os.getenv("SUMMARY_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+        if max_entries is None:
+            max_entries = int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", "1000"))
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path or ":memory:", check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS summaries ("
+            " key TEXT PRIMARY KEY,"
+            " summary TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS summaries_last_used ON summaries (last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(text: str, model_name: str, prompt_version: str, extra: Iterable[str] = ()) -> str:
+        """Builds the cache key for a post; `extra` adds whatever else goes into the prompt (links, image hashes)."""
+        payload = "\x00".join([normalize_text(text), model_name, prompt_version, *extra])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the cached summary, or None on a miss or expired entry."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary, created_at FROM summaries WHERE key = ?", (key,)
+            ).fetchone()
+            if not row:
+                return None
+            summary, created_at = row
+            if now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM summaries WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE summaries SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            return summary
+
+    def set(self, key: str, summary: str) -> None:
+        """Stores a summary and evicts expired and least recently used entries."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO summaries (key, summary, created_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, summary, now, now)
+            )
+            self._conn.execute("DELETE FROM summaries WHERE created_at < ?", (now - self.ttl_seconds,))
+            self._conn.execute(
+                "DELETE FROM summaries WHERE key IN ("
+                " SELECT key FROM summaries ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
@@ -1,9 +1,24 @@
 import re
 import os
 import datetime
-from typing import Optional, List, Dict, Any
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
+import threading
+from typing import Optional, List, Dict, Any, Iterator, Tuple
+from src.clients import get_client
+from src.rate_limit import RateLimiter, AdaptiveConcurrencyLimiter
+import src.metrics as metrics
+
+# Bot/webhook authors whose messages are still treated as input.
+# The user "post" is the iOS Shortcut webhook posting the INPUT content;
+# other bots (e.g. "yt_research", the output bot) are skipped to avoid loops.
+TARGET_INPUT_BOTS = ["post"]
+
+# Starting point, ceiling and latency signal of each service's adaptive concurrency limit.
+# Gemini latency grows with the summary length, so only its 429/503s count as congestion.
+CONCURRENCY_LIMITS = {
+    'drive': {'initial_limit': 4, 'max_limit': 16, 'latency_tolerance': 2.0},
+    'gemini': {'initial_limit': 4, 'max_limit': 16, 'latency_tolerance': None},
+    'discord': {'initial_limit': 2, 'max_limit': 8, 'latency_tolerance': 2.0},
+}
 
 def format_file_name(content: str) -> str:
     """
@@ -37,9 +52,95 @@ def format_file_name(content: str) -> str:
         
     return f"{clean_name}.md"
 
+def _build_thread_safe_service(creds):
+    """
+    Builds a Drive service that can be shared across worker threads.
+
+    httplib2.Http is not thread-safe, so every thread gets its own authorized
+    Http object (keeping keep-alive connections per thread) instead of sharing
+    the one bound to the service. Each request is also counted in the run metrics.
+    """
+    # Imported here so polls that never touch Drive don't pay for the client library
+    import httplib2
+    import google_auth_httplib2
+    from googleapiclient.discovery import build
+    from googleapiclient.http import HttpRequest
+
+    local = threading.local()
+
+    def build_request(http, *args, **kwargs):
+        # Every Drive API request goes through here, e.g. 'drive.files.list'
+        metrics.count_api_call('drive', (kwargs.get('methodId') or 'unknown').replace('drive.', '', 1))
+        if not hasattr(local, 'http'):
+            local.http = google_auth_httplib2.AuthorizedHttp(creds, http=httplib2.Http())
+        return HttpRequest(local.http, *args, **kwargs)
+
+    authorized_http = google_auth_httplib2.AuthorizedHttp(creds, http=httplib2.Http())
+    # Use the discovery document bundled with google-api-python-client (no network fetch)
+    return build('drive', 'v3', http=authorized_http, requestBuilder=build_request,
+                 static_discovery=True, cache_discovery=False)
+
 def get_drive_service():
     """
-    Authenticates with Google Drive API using OAuth 2.0 (preferred) or service account credentials.
+    Returns the process-wide Google Drive service, building it on first use.
+    Warm invocations reuse it without paying the auth or discovery cost again.
+    """
+    return get_client('drive', build_drive_service)
+
+def get_gemini_client():
+    """Returns the process-wide Gemini client, building it on first use."""
+    def build_gemini_client():
+        from google import genai
+        return genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+    return get_client('gemini', build_gemini_client)
+
+def get_gemini_rate_limiter() -> RateLimiter:
+    """
+    Returns the process-wide Gemini rate limiter (GEMINI_RPM requests and
+    GEMINI_TPM tokens per minute), shared by every Node3 call.
+    """
+    def build_limiter():
+        return RateLimiter(
+            requests_per_minute=float(os.getenv("GEMINI_RPM", "60")),
+            tokens_per_minute=float(os.getenv("GEMINI_TPM", "1000000"))
+        )
+    return get_client('gemini_rate_limiter', build_limiter)
+
+def get_concurrency_limiter(service: str) -> AdaptiveConcurrencyLimiter:
+    """
+    Returns the process-wide adaptive concurrency limiter of a backend service
+    ('drive', 'gemini' or 'discord'), shared by every node calling it.
+    The ceiling can be overridden with <SERVICE>_MAX_CONCURRENCY.
+    """
+    def build_limiter():
+        settings = dict(CONCURRENCY_LIMITS.get(service, {}))
+        max_limit = os.getenv(f"{service.upper()}_MAX_CONCURRENCY")
+        if max_limit:
+            settings['max_limit'] = int(max_limit)
+        return AdaptiveConcurrencyLimiter(service, **settings)
+    return get_client(f'{service}_concurrency_limiter', build_limiter)
+
+def execute_drive(request: Any) -> Any:
+    """
+    Executes a Drive API request through the Drive concurrency limiter,
+    retrying throttled responses (DRIVE_MAX_RETRIES, default 3).
+
+    Args:
+        request (Any): An unexecuted request, e.g. service.files().list(...).
+
+    Returns:
+        Any: The response of request.execute().
+    """
+    limiter = get_concurrency_limiter('drive')
+    return limiter.call(request.execute, max_retries=int(os.getenv("DRIVE_MAX_RETRIES", "3")))
+
+def get_drive_credentials():
+    """Returns the process-wide Google credentials used for Drive, building them on first use."""
+    return get_client('drive_credentials', build_drive_credentials)
+
+def build_drive_credentials():
+    """
+    Loads Google Drive credentials using OAuth 2.0 (preferred) or a service account.
     """
     SCOPES = ['https://www.googleapis.com/auth/drive']
     
@@ -48,7 +149,7 @@ def get_drive_service():
     if refresh_token:
         try:
             from google.oauth2.credentials import Credentials
-            creds = Credentials(
+            return Credentials(
                 None, # No access token initially
                 refresh_token=refresh_token,
                 token_uri="https://oauth2.googleapis.com/token",
@@ -56,8 +157,6 @@ def get_drive_service():
                 client_secret=os.getenv('GOOGLE_CLIENT_SECRET'),
                 scopes=SCOPES
             )
-            service = build('drive', 'v3', credentials=creds)
-            return service
         except Exception as e:
             print(f"Error authenticating with OAuth 2.0: {e}")
             # Fallback to Service Account if OAuth fails? Or just return None.
@@ -67,10 +166,9 @@ def get_drive_service():
     
     if creds_file and os.path.exists(creds_file):
         try:
-            creds = service_account.Credentials.from_service_account_file(
+            from google.oauth2 import service_account
+            return service_account.Credentials.from_service_account_file(
                 creds_file, scopes=SCOPES)
-            service = build('drive', 'v3', credentials=creds)
-            return service
         except Exception as e:
             print(f"Error authenticating with Service Account: {e}")
             return None
@@ -78,6 +176,52 @@ def get_drive_service():
     print("No valid authentication credentials found (OAuth or Service Account).")
     return None
 
+def build_drive_service():
+    """
+    Builds the Google Drive API service from the shared credentials.
+    The returned service is safe to use from multiple threads.
+    """
+    creds = get_drive_credentials()
+    if not creds:
+        return None
+    try:
+        return _build_thread_safe_service(creds)
+    except Exception as e:
+        print(f"Error building Drive service: {e}")
+        return None
+
+def peek_first_line(chunks: Iterator[str]) -> Tuple[str, Iterator[str]]:
+    """
+    Reads a text stream until its first non-empty line is complete.
+
+    Args:
+        chunks (Iterator[str]): Streamed text chunks.
+
+    Returns:
+        Tuple[str, Iterator[str]]: The first line (as used by format_file_name) and a
+        generator that replays the buffered chunks followed by the rest of the stream.
+        Closing it closes the stream too.
+    """
+    chunks = iter(chunks)
+    buffered = []
+    text = ""
+    for chunk in chunks:
+        buffered.append(chunk)
+        text += chunk
+        if '\n' in text.lstrip():
+            break
+    first_line = text.strip().split('\n')[0].strip() if text.strip() else ""
+    return first_line, _replay(buffered, chunks)
+
+def _replay(buffered: List[str], chunks: Iterator[str]) -> Iterator[str]:
+    try:
+        yield from buffered
+        yield from chunks
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
 def format_date_folder(date_str: str) -> str:
     """
     Formats date string into folder name (YYYY).
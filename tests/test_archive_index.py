@@ -0,0 +1,81 @@
+import unittest
+import os
+import sys
+import tempfile
+import subprocess
+
+# Add project root to path to import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.archive_index import ArchiveIndex, content_hash
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+def make_file(file_id, name, message_id, folder_id="day"):
+    return {'id': file_id, 'name': name, 'parents': [folder_id], 'webViewLink': f"https://drive/{file_id}",
+            'createdTime': "2025-12-17T12:00:00.000Z", 'appProperties': {'discord_message_id': message_id}}
+
+class TestArchiveIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = ArchiveIndex(path="")
+        self.index.record_folder("day", "2025/12/17")
+        self.index.record_file(make_file("f1", "市議会が公園計画を承認.md", "1"),
+                               content="# 市議会が公園計画を承認\n川沿いの新しい公園は来春着工。")
+        self.index.record_file(make_file("f2", "New GPU benchmark results.md", "2"),
+                               content="# New GPU benchmark results\nAI training throughput doubled.")
+
+    def test_lookup_by_message(self):
+        row = self.index.get("1")
+
+        self.assertEqual(row['file_id'], "f1")
+        self.assertEqual(row['folder_path'], "2025/12/17")
+        self.assertEqual(row['title'], "市議会が公園計画を承認")
+        self.assertEqual(row['web_view_link'], "https://drive/f1")
+        self.assertEqual(row['content_hash'], content_hash("# 市議会が公園計画を承認\n川沿いの新しい公園は来春着工。"))
+        self.assertIsNone(self.index.get("3"))
+        self.assertEqual(self.index.processed_message_ids(["1", "2", "3"]), {"1", "2"})
+        self.assertEqual([row['file_id'] for row in self.index.in_folder("2025/12/17")], ["f1", "f2"])
+
+    def test_full_text_search(self):
+        # Japanese text has no word boundaries; any 3+ character substring matches
+        self.assertEqual([row['file_id'] for row in self.index.search("川沿い")], ["f1"])
+        self.assertIn("[川沿い]", self.index.search("川沿い")[0]['snippet'])
+        self.assertEqual([row['file_id'] for row in self.index.search("gpu throughput")], ["f2"])
+        # Terms shorter than a trigram are still found
+        self.assertEqual([row['file_id'] for row in self.index.search("AI")], ["f2"])
+        self.assertEqual(self.index.search("gpu 公園"), [])
+
+    def test_listing_backfill_keeps_body(self):
+        # A Drive listing carries no content; the indexed text stays searchable
+        self.index.record_files([{'id': "f1", 'md5Checksum': "abc", 'appProperties': {'discord_message_id': "1"}}])
+
+        row = self.index.get("1")
+        self.assertEqual(row['content_hash'], "abc")
+        self.assertEqual(row['title'], "市議会が公園計画を承認")
+        self.assertEqual(row['web_view_link'], "https://drive/f1")
+        self.assertEqual([row['file_id'] for row in self.index.search("川沿い")], ["f1"])
+
+        self.index.forget_file("f1")
+        self.assertIsNone(self.index.get("1"))
+        self.assertEqual(self.index.search("川沿い"), [])
+
+    def test_cli_searches_persisted_index(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "archive.sqlite3")
+            index = ArchiveIndex(path=path)
+            index.record_folder("day", "2025/12/17")
+            index.record_file(make_file("f1", "Park plan approved.md", "1"), content="# Park plan approved\nRiverside.")
+
+            result = subprocess.run([sys.executable, "-m", "src.archive_index", "riverside", "--path", path],
+                                    cwd=PROJECT_ROOT, capture_output=True, text=True)
+            missing = subprocess.run([sys.executable, "-m", "src.archive_index", "--message", "9", "--path", path],
+                                     cwd=PROJECT_ROOT, capture_output=True, text=True)
+
+        self.assertEqual(result.returncode, 0)
+        self.assertIn("2025/12/17/Park plan approved", result.stdout)
+        self.assertIn("https://drive/f1", result.stdout)
+        self.assertEqual(missing.returncode, 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+from unittest.mock import MagicMock
+import os
+import sys
+import tempfile
+
+# Add project root to path to import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.checkpoint import MessageCheckpoint
+
+class TestMessageCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.path = os.path.join(self.tmp_dir.name, "checkpoint.json")
+
+    def test_cursor_waits_for_oldest_open_message(self):
+        checkpoint = MessageCheckpoint(self.path)
+        checkpoint.start(["10", "20", "30"], scanned_up_to="35")
+
+        checkpoint.commit("20")
+        self.assertIsNone(checkpoint.cursor)
+        checkpoint.commit("10")
+        self.assertEqual(checkpoint.cursor, "20")
+        checkpoint.commit("30")
+        # All done: skip past filtered-out messages as well
+        self.assertEqual(checkpoint.cursor, "35")
+        self.assertEqual(MessageCheckpoint(self.path).load(), "35")
+
+    def test_empty_poll_advances_to_scanned_messages(self):
+        checkpoint = MessageCheckpoint(self.path)
+        checkpoint.start([], scanned_up_to="50")
+        self.assertEqual(checkpoint.cursor, "50")
+
+    def test_drive_fallback_and_flush(self):
+        drive = MagicMock()
+        drive.files().list().execute.return_value = {
+            'files': [{'id': 'marker', 'appProperties': {'last_message_id': '40'}}]
+        }
+
+        checkpoint = MessageCheckpoint("", drive_service=drive)
+        self.assertEqual(checkpoint.load(), "40")
+
+        checkpoint.flush()
+        drive.files().update.assert_not_called()
+
+        checkpoint.start(["41"])
+        checkpoint.commit("41")
+        checkpoint.flush()
+        body = drive.files().update.call_args.kwargs['body']
+        self.assertEqual(body['appProperties']['last_message_id'], '41')
+        drive.files().create.assert_not_called()
+
+    def test_idle_poll_does_not_build_drive_service(self):
+        drive = MagicMock()
+        drive.files().list().execute.return_value = {'files': []}
+        drive.files().create().execute.return_value = {'id': 'marker'}
+        MessageCheckpoint(self.path, drive_service=drive).flush()
+        checkpoint = MessageCheckpoint(self.path, drive_service=drive)
+        checkpoint.start(["60"])
+        checkpoint.commit("60")
+        checkpoint.flush()
+
+        factory = MagicMock(return_value=drive)
+        checkpoint = MessageCheckpoint(self.path, drive_service_factory=factory)
+        self.assertEqual(checkpoint.load(), "60")
+        checkpoint.start([], scanned_up_to=None)
+        checkpoint.flush()
+        # Cursor and Drive copy both come from the local file
+        factory.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import os
+import sys
+
+# Add project root to path to import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import src.utils as utils
+from src.clients import get_client, reset_clients
+
+class TestClientRegistry(unittest.TestCase):
+
+    def setUp(self):
+        reset_clients()
+        self.addCleanup(reset_clients)
+
+    def test_factory_runs_once(self):
+        factory = MagicMock(return_value=object())
+
+        first = get_client('drive', factory)
+        second = get_client('drive', factory)
+
+        self.assertIs(first, second)
+        factory.assert_called_once()
+
+    def test_failed_build_is_retried(self):
+        factory = MagicMock(side_effect=[None, 'service'])
+
+        self.assertIsNone(get_client('drive', factory))
+        self.assertEqual(get_client('drive', factory), 'service')
+
+    @patch('src.utils.build_drive_service')
+    def test_drive_service_shared_between_calls(self, mock_build):
+        mock_build.return_value = MagicMock()
+
+        self.assertIs(utils.get_drive_service(), utils.get_drive_service())
+        mock_build.assert_called_once()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import asyncio
+import os
+import sys
+from datetime import datetime, timezone
+
+# Add project root to path to import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import src.daemon as daemon
+import src.metrics as metrics
+from src.checkpoint import MessageCheckpoint
+from src.job_store import JobStore
+from src.nodes.node1_discord_input import Node1_Discord_Input
+
+def make_message(message_id, channel_id=1, author="user", bot=False):
+    message = MagicMock()
+    message.id = message_id
+    message.channel.id = channel_id
+    message.author.name = author
+    message.author.bot = bot
+    message.content = f"text {message_id}"
+    message.created_at = datetime(2025, 12, 17, tzinfo=timezone.utc)
+    message.attachments = []
+    message.embeds = []
+    return message
+
+class TestGatewayListener(unittest.TestCase):
+
+    @patch.dict(os.environ, {"DISCORD_TOKEN": "token", "DISCORD_CHANNEL_ID": "1"})
+    def test_on_message_queues_qualifying_messages(self):
+        node = Node1_Discord_Input()
+        queue = asyncio.Queue()
+
+        async def fake_start(token):
+            for message in [
+                make_message(10),
+                make_message(11, channel_id=2),
+                make_message(12, author="yt_research", bot=True),
+                make_message(13, author="post", bot=True),
+            ]:
+                await node.client.on_message(message)
+
+        with patch.object(node.client, 'start', side_effect=fake_start):
+            asyncio.run(node.listen(queue))
+
+        queued = [queue.get_nowait()["id"] for _ in range(queue.qsize())]
+        self.assertEqual(queued, ["10", "13"])
+
+class TestDaemonWorkers(unittest.TestCase):
+
+    @patch.dict(os.environ, {"METRICS_HISTORY_PATH": ""})
+    def test_workers_process_and_notify_each_message(self):
+        def process(post, nodes, **kwargs):
+            if post["id"] == "2":
+                raise RuntimeError("boom")
+            return {"title": post["id"]}
+        node8 = MagicMock()
+
+        async def run():
+            queue = asyncio.Queue()
+            for i in range(4):
+                queue.put_nowait({"id": str(i)})
+            workers = [asyncio.create_task(daemon.worker(queue, {}, node8)) for _ in range(2)]
+            await queue.join()
+            for task in workers:
+                task.cancel()
+
+        with patch.object(daemon, 'process_post', side_effect=process):
+            asyncio.run(run())
+
+        notified = sorted(call.args[0][0]["title"] for call in node8.send_notification.call_args_list)
+        self.assertEqual(notified, ["0", "1", "3"])
+
+    @patch.dict(os.environ, {"METRICS_HISTORY_PATH": ""})
+    def test_metrics_are_emitted_per_interval_without_losing_samples(self):
+        collector = metrics.start_run()
+
+        def process(post, nodes, **kwargs):
+            metrics.observe("stage.summarize", float(post["id"]))
+            return {"title": post["id"]}
+        node8 = MagicMock()
+        node8.send_notification.side_effect = lambda items: {'delivered': items, 'failed': []}
+        emitted = []
+
+        async def run():
+            queue = asyncio.Queue()
+            for i in range(4):
+                queue.put_nowait({"id": str(i), "created_at": "2025-12-17T00:00:00+00:00"})
+            emitter = asyncio.create_task(daemon.emit_metrics(3600))
+            workers = [asyncio.create_task(daemon.worker(queue, {}, node8)) for _ in range(2)]
+            await queue.join()
+            for task in workers + [emitter]:
+                task.cancel()
+            await asyncio.gather(*workers, emitter, return_exceptions=True)
+
+        with patch.object(daemon, 'process_post', side_effect=process), \
+                patch.object(metrics.RunMetrics, 'emit', autospec=True, side_effect=emitted.append):
+            asyncio.run(run())
+
+        # Workers share one collector; the last record on shutdown holds all four messages
+        self.assertIs(metrics.current(), collector)
+        self.assertEqual(len(emitted), 1)
+        self.assertEqual(sorted(emitted[0].timings["stage.summarize"]), [0.0, 1.0, 2.0, 3.0])
+        self.assertEqual(len(emitted[0].timings["capture_to_notify"]), 4)
+        self.assertTrue(collector.is_empty())
+
+class TestDaemonCatchUp(unittest.TestCase):
+
+    @patch.dict(os.environ, {"METRICS_HISTORY_PATH": ""})
+    def test_catch_up_backfills_from_checkpoint_and_notifies_unnotified_jobs(self):
+        checkpoint = MessageCheckpoint(path="")
+        jobs = JobStore(path="", drive_sync=False)
+        jobs.advance("90", "written", meta={"title": "earlier", "url": "u"})
+        backfill_node = MagicMock()
+        backfill_node.last_scanned_id = "103"
+
+        async def fetch_after(after_id):
+            self.assertEqual(after_id, "100")
+            return [{"id": "101"}, {"id": "102"}]
+        backfill_node.fetch_messages_after.side_effect = fetch_after
+        node8 = MagicMock()
+        node8.send_notification.side_effect = lambda items: {'delivered': items, 'failed': []}
+        queue = asyncio.Queue()
+
+        with patch.object(checkpoint, 'load', return_value="100"), \
+                patch.object(daemon, 'build_input_node', return_value=backfill_node):
+            asyncio.run(daemon.catch_up(queue, {}, node8, jobs, checkpoint))
+
+        self.assertEqual([queue.get_nowait()["id"] for _ in range(queue.qsize())], ["101", "102"])
+        node8.send_notification.assert_called_once_with([{"title": "earlier", "url": "u", "message_id": "90"}])
+        self.assertEqual(jobs.unnotified(), [])
+
+    @patch.dict(os.environ, {"METRICS_HISTORY_PATH": ""})
+    def test_workers_commit_checkpoint_and_run_duplicates_once(self):
+        checkpoint = MessageCheckpoint(path="")
+        checkpoint.cursor = "100"
+        checkpoint.start(["101", "102"], "102")
+        processed = []
+
+        def process(post, nodes, **kwargs):
+            processed.append(post["id"])
+            if post["id"] == "102":
+                raise RuntimeError("boom")
+            return None
+
+        async def run():
+            queue = asyncio.Queue()
+            # The gateway queued 103 while the catch-up queued 101 - 103
+            for message_id in ["103", "101", "102", "103"]:
+                queue.put_nowait({"id": message_id})
+            claimed = set()
+            workers = [asyncio.create_task(daemon.worker(queue, {}, MagicMock(), None, checkpoint, claimed))
+                       for _ in range(2)]
+            await queue.join()
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        with patch.object(daemon, 'process_post', side_effect=process):
+            asyncio.run(run())
+
+        self.assertEqual(sorted(processed), ["101", "102", "103"])
+        # 102 failed, so the cursor stops before it and the next start fetches it again
+        self.assertEqual(checkpoint.cursor, "101")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import asyncio
+import os
+import sys
+import time
+
+# Add project root to path to import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import discord.http
+from benchmarks.fake_discord_api import FakeDiscordAPI, make_messages, CHANNEL_ID
+from src.clients import reset_clients
+from src.nodes.node1_discord_input import Node1_Discord_Input
+from src.nodes.node1_discord_rest import Node1_Discord_REST_Input
+
+class TestDiscordRestInput(unittest.TestCase):
+
+    def setUp(self):
+        reset_clients('discord_http')
+        self.addCleanup(reset_clients, 'discord_http')
+
+    def run_against(self, api):
+        env = {"DISCORD_TOKEN": "token", "DISCORD_CHANNEL_ID": CHANNEL_ID, "DISCORD_API_BASE": api.url}
+        return patch.dict(os.environ, env)
+
+    def test_same_output_as_discord_client(self):
+        messages = make_messages(3) + make_messages(2, author="yt_research") + make_messages(2, author="user", bot=False)
+        with FakeDiscordAPI(messages) as api, self.run_against(api), \
+                patch.object(discord.http.Route, 'BASE', api.url):
+            client_posts = asyncio.run(Node1_Discord_Input().fetch_recent_messages(limit=50, minutes=60))
+            rest_node = Node1_Discord_REST_Input()
+            rest_posts = asyncio.run(rest_node.fetch_recent_messages(limit=50, minutes=60))
+
+        self.assertEqual(len(rest_posts), 5)
+        self.assertEqual(rest_posts, client_posts)
+        self.assertEqual(rest_node.last_scanned_id, max(m["id"] for m in messages))
+
+    def test_fetch_after_paginates_whole_burst(self):
+        messages = make_messages(250)
+        with FakeDiscordAPI(messages) as api, self.run_against(api):
+            posts = asyncio.run(Node1_Discord_REST_Input().fetch_messages_after(messages[9]["id"]))
+            requests_made = api.request_count
+
+        self.assertEqual([p["id"] for p in posts], [m["id"] for m in messages[10:]])
+        self.assertEqual(requests_made, 3)
+
+    @patch('src.nodes.node1_discord_rest.time.sleep')
+    def test_retries_after_429(self, mock_sleep):
+        limited = MagicMock(status_code=429, headers={})
+        limited.json.return_value = {"retry_after": 0.5}
+        ok = MagicMock(status_code=200, headers={"X-RateLimit-Remaining": "0", "X-RateLimit-Reset-After": "2"})
+        ok.json.return_value = []
+        with patch.dict(os.environ, {"DISCORD_TOKEN": "token", "DISCORD_CHANNEL_ID": "1"}):
+            node = Node1_Discord_REST_Input()
+        node.session = MagicMock()
+        node.session.get.side_effect = [limited, ok, ok]
+
+        node._request("/channels/1/messages")
+        node._request("/channels/1/messages")
+
+        self.assertEqual(mock_sleep.call_args_list[0].args[0], 0.5)
+        # Second call waits for the exhausted bucket to reset
+        self.assertAlmostEqual(mock_sleep.call_args_list[1].args[0], 2, delta=0.1)
+
+    def test_rate_limit_wait_does_not_block_event_loop(self):
+        def slow_get(*args, **kwargs):
+            time.sleep(0.2)
+            response = MagicMock(status_code=200, headers={})
+            response.json.return_value = []
+            return response
+        with patch.dict(os.environ, {"DISCORD_TOKEN": "token", "DISCORD_CHANNEL_ID": "1"}):
+            node = Node1_Discord_REST_Input()
+        node.session = MagicMock()
+        node.session.get.side_effect = slow_get
+        ticks = []
+
+        async def run():
+            async def ticker():
+                while True:
+                    ticks.append(time.monotonic())
+                    await asyncio.sleep(0.01)
+            task = asyncio.create_task(ticker())
+            await node.fetch_messages_after("1")
+            task.cancel()
+
+        asyncio.run(run())
+
+        # Other coroutines keep running while the request blocks its thread
+        self.assertGreater(len(ticks), 5)
+
+if __name__ == '__main__':
+    unittest.main()
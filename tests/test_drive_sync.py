@@ -0,0 +1,101 @@
+import unittest
+from unittest.mock import patch
+import os
+import sys
+
+# Add project root to path to import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.fakes import FakeDriveService
+from src.archive_index import ArchiveIndex
+from src.clients import get_client, reset_clients
+from src.drive_sync import DriveSync, PAGE_TOKEN_KEY
+from src.folder_cache import FolderCache
+from src.nodes.node4_folder_management import Node4_Folder_Management
+from src.nodes.node5_file_creation import Node5_File_Creation
+from src.nodes.node6_content_writing import Node6_Content_Writing
+
+class TestDriveSync(unittest.TestCase):
+
+    def setUp(self):
+        self.drive = FakeDriveService()
+        reset_clients()
+        get_client('drive', lambda: self.drive)
+        self.addCleanup(reset_clients)
+        patcher = patch.dict(os.environ, {"DRIVE_ROOT_FOLDER_ID": "root"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.archive = ArchiveIndex(path="")
+        self.cache = FolderCache(path="")
+        self.node4 = Node4_Folder_Management(cache=self.cache, archive=self.archive)
+        self.sync = DriveSync(self.archive, self.cache)
+        # The first sync only starts tracking
+        self.assertEqual(self.sync.sync(), {'changes': 0, 'applied': 0})
+        self.assertTrue(self.archive.get_meta(PAGE_TOKEN_KEY))
+
+        self.day_id = self.node4.get_or_create_folder("2025-12-17T12:00:00+00:00")
+        file_meta = Node5_File_Creation(archive=self.archive).build_file_metadata(self.day_id, "Park.md", "42")
+        self.file = Node6_Content_Writing(archive=self.archive).create_file_with_content(file_meta, "# Park\nBody")
+        self.sync.sync()
+        self.month_id = self.cache.locate(self.day_id)[0]
+
+    def test_only_new_changes_are_read(self):
+        list_calls = self.drive.calls.get('files.list', 0)
+
+        self.assertEqual(self.sync.sync()['changes'], 0)
+        self.drive.files().update(fileId=self.file['id'], body={'name': "Park plan.md"}).execute()
+        self.assertEqual(self.sync.sync(), {'changes': 1, 'applied': 1})
+        self.assertEqual(self.drive.calls.get('files.list', 0), list_calls)
+        self.assertEqual(self.archive.get("42")['title'], "Park plan")
+
+    def test_renamed_folder_updates_paths_and_cache(self):
+        self.drive.files().update(fileId=self.month_id, body={'name': "12-old"}).execute()
+        self.sync.sync()
+
+        self.assertEqual(self.archive.get("42")['folder_path'], "2025/12-old/17")
+        self.assertIsNone(self.cache.locate(self.day_id))
+        # Node 4 no longer finds the renamed folder under its old name
+        self.assertNotEqual(self.node4.get_or_create_folder("2025-12-17T12:00:00+00:00"), self.day_id)
+
+    def test_trashed_and_moved_files_are_forgotten(self):
+        node5 = Node5_File_Creation(archive=self.archive)
+        self.assertTrue(node5.check_file_exists(self.day_id, "42"))
+
+        self.drive.files().update(fileId=self.file['id'], body={'trashed': True}).execute()
+        self.sync.sync()
+        self.assertIsNone(self.archive.get("42"))
+        self.assertFalse(node5.check_file_exists(self.day_id, "42"))
+
+        self.drive.files().update(fileId=self.file['id'], body={'trashed': False}).execute()
+        self.sync.sync()
+        self.assertEqual(self.archive.get("42")['file_id'], self.file['id'])
+
+        self.drive.files().update(fileId=self.file['id'], addParents="elsewhere", removeParents=self.day_id).execute()
+        self.sync.sync()
+        self.assertIsNone(self.archive.get("42"))
+
+    def test_deleted_folder_drops_everything_below(self):
+        self.drive.files().delete(fileId=self.month_id).execute()
+        self.sync.sync()
+
+        self.assertIsNone(self.archive.get("42"))
+        self.assertIsNone(self.archive.folder_path(self.day_id))
+        self.assertIsNone(self.cache.locate(self.month_id))
+
+    def test_rejected_token_restarts_tracking(self):
+        self.archive.set_meta(PAGE_TOKEN_KEY, "not-a-number")
+        with patch.object(self.drive, '_list_changes', side_effect=_http_error(400)):
+            self.sync.sync()
+        self.assertEqual(self.archive.get_meta(PAGE_TOKEN_KEY), "")
+
+        self.sync.sync()
+        self.assertTrue(self.archive.get_meta(PAGE_TOKEN_KEY))
+
+def _http_error(status):
+    from googleapiclient.errors import HttpError
+    import httplib2
+    return HttpError(httplib2.Response({'status': status}), b'{"error": {"code": 400, "message": "Invalid token"}}')
+
+if __name__ == '__main__':
+    unittest.main()
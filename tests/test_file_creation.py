@@ -0,0 +1,79 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import os
+import sys
+
+# Add project root to path to import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.archive_index import ArchiveIndex
+from src.nodes.node5_file_creation import Node5_File_Creation
+from src.nodes.node6_content_writing import Node6_Content_Writing
+
+class TestNode5BulkLookup(unittest.TestCase):
+
+    @patch('src.nodes.node5_file_creation.utils.get_drive_service')
+    def test_collects_message_ids_across_pages(self, mock_get_service):
+        mock_service = MagicMock()
+        mock_get_service.return_value = mock_service
+        mock_service.files().list().execute.side_effect = [
+            {'files': [{'id': 'a', 'appProperties': {'discord_message_id': '1'}},
+                       {'id': 'b'}],
+             'nextPageToken': 'page2'},
+            {'files': [{'id': 'c', 'appProperties': {'discord_message_id': '2'}}]},
+        ]
+        mock_service.files().list.reset_mock()
+
+        archive = ArchiveIndex(path="")
+        node = Node5_File_Creation(archive=archive)
+        message_ids = node.list_processed_message_ids(['day1', 'day2', 'day1'])
+
+        self.assertEqual(message_ids, {'1', '2'})
+        # Listed files are backfilled into the archive index
+        self.assertEqual(archive.processed_message_ids(['1', '2', '3']), {'1', '2'})
+        calls = mock_service.files().list.call_args_list
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(calls[1].kwargs['pageToken'], 'page2')
+        self.assertIn("'day1' in parents or 'day2' in parents", calls[0].kwargs['q'])
+        self.assertIn('appProperties', calls[0].kwargs['fields'])
+
+    @patch('src.nodes.node5_file_creation.utils.get_drive_service')
+    def test_returns_none_on_error(self, mock_get_service):
+        mock_service = MagicMock()
+        mock_get_service.return_value = mock_service
+        mock_service.files().list().execute.side_effect = Exception("quota")
+
+        node = Node5_File_Creation(archive=ArchiveIndex(path=""))
+
+        self.assertIsNone(node.list_processed_message_ids(['day1']))
+
+class TestCreateWithContent(unittest.TestCase):
+
+    @patch('src.nodes.node6_content_writing.utils.get_drive_service')
+    @patch('src.nodes.node5_file_creation.utils.get_drive_service')
+    def test_single_create_request(self, mock_node5_service, mock_node6_service):
+        mock_service = MagicMock()
+        mock_node6_service.return_value = mock_service
+        mock_service.files().create().execute.return_value = {
+            'id': 'file_id', 'webViewLink': 'http://link', 'createdTime': 'now'
+        }
+        mock_service.files().create.reset_mock()
+
+        archive = ArchiveIndex(path="")
+        file_meta = Node5_File_Creation(archive=archive).build_file_metadata('folder_id', 'Title.md', message_id='42')
+        created = Node6_Content_Writing(archive=archive).create_file_with_content(file_meta, "# Title\nBody")
+
+        self.assertEqual(created['webViewLink'], 'http://link')
+        mock_service.files().create.assert_called_once()
+        kwargs = mock_service.files().create.call_args.kwargs
+        self.assertEqual(kwargs['body']['parents'], ['folder_id'])
+        self.assertEqual(kwargs['body']['appProperties'], {'discord_message_id': '42'})
+        self.assertIn('createdTime', kwargs['fields'])
+        self.assertIsNotNone(kwargs['media_body'])
+        mock_service.files().update.assert_not_called()
+        # Recorded in the archive index, so the next idempotency check needs no Drive call
+        self.assertEqual(archive.get('42')['web_view_link'], 'http://link')
+        self.assertTrue(Node5_File_Creation(archive=archive).check_file_exists('folder_id', '42'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import os
+import sys
+import tempfile
+
+# Add project root to path to import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.folder_cache import FolderCache
+from src.archive_index import ArchiveIndex
+from src.nodes.node4_folder_management import Node4_Folder_Management
+
+class TestFolderCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.path = os.path.join(self.tmp_dir.name, "folder_cache.json")
+
+    def test_entries_persist_across_instances(self):
+        FolderCache(self.path).set("root", "2025", "year_id")
+
+        self.assertEqual(FolderCache(self.path).get("root", "2025"), "year_id")
+        self.assertIsNone(FolderCache(self.path).get("other_root", "2025"))
+
+    def test_drop_removes_children(self):
+        cache = FolderCache(self.path)
+        cache.set("root", "2025", "year_id")
+        cache.set("year_id", "12", "month_id")
+        cache.set("month_id", "17", "day_id")
+        cache.set("root", "2026", "other_year_id")
+
+        cache.drop("year_id")
+
+        self.assertIsNone(cache.get("year_id", "12"))
+        self.assertIsNone(cache.get("month_id", "17"))
+        self.assertEqual(cache.get("root", "2026"), "other_year_id")
+
+    def test_stale_after_ttl(self):
+        cache = FolderCache(self.path, ttl_seconds=-1)
+        cache.set("root", "2025", "year_id")
+        self.assertTrue(cache.is_stale("root", "2025"))
+
+    @patch('src.nodes.node4_folder_management.utils.get_drive_service')
+    def test_node4_uses_cache_on_second_lookup(self, mock_get_service):
+        mock_service = MagicMock()
+        mock_get_service.return_value = mock_service
+        mock_service.files().list().execute.return_value = {'files': [{'id': 'folder_id'}]}
+        mock_service.files.reset_mock()
+
+        archive = ArchiveIndex(path="")
+        node = Node4_Folder_Management(cache=FolderCache(self.path), archive=archive)
+        node.get_or_create_folder("2025-12-17T12:34:59+00:00")
+        self.assertEqual(mock_service.files().list.call_count, 3)
+        self.assertEqual(archive.folder_id("2025/12/17"), 'folder_id')
+
+        mock_service.files.reset_mock()
+        warm_node = Node4_Folder_Management(cache=FolderCache(self.path), archive=archive)
+        folder_id = warm_node.get_or_create_folder("2025-12-17T08:00:00+00:00")
+
+        self.assertEqual(folder_id, 'folder_id')
+        mock_service.files().list.assert_not_called()
+
+    @patch('src.nodes.node4_folder_management.utils.get_drive_service')
+    def test_node4_drops_trashed_folder(self, mock_get_service):
+        mock_service = MagicMock()
+        mock_get_service.return_value = mock_service
+        mock_service.files().get().execute.return_value = {'id': 'old_year', 'trashed': True}
+        mock_service.files().list().execute.return_value = {'files': []}
+        mock_service.files().create().execute.return_value = {'id': 'new_folder_id'}
+
+        cache = FolderCache(self.path, ttl_seconds=-1)
+        cache.set(None, "2025", "old_year")
+        node = Node4_Folder_Management(cache=cache, archive=ArchiveIndex(path=""))
+        node.root_folder_id = None
+
+        folder_id = node.get_or_create_folder("2025-12-17T12:34:59+00:00")
+
+        self.assertEqual(folder_id, 'new_folder_id')
+        self.assertEqual(cache.get(None, "2025"), 'new_folder_id')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+import os
+import sys
+import tempfile
+
+# Add project root to path to import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.fakes import FakeDriveService
+from src.job_store import JobStore, SNAPSHOT_PROPERTY
+
+class TestJobStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.path = os.path.join(self.tmp_dir.name, "jobs.sqlite3")
+
+    def test_stages_only_move_forward(self):
+        jobs = JobStore(self.path)
+        jobs.advance("1", "generated", content="# Title")
+        jobs.advance("1", "fetched")
+        jobs.advance("1", "written", file={"id": "f1"})
+
+        job = JobStore(self.path).get("1")
+        self.assertEqual(job["stage"], "written")
+        self.assertEqual(job["data"], {"content": "# Title", "file": {"id": "f1"}})
+        self.assertTrue(JobStore.reached(job, "generated"))
+        self.assertFalse(JobStore.reached(job, "notified"))
+        self.assertIsNone(jobs.get("2"))
+        with self.assertRaises(ValueError):
+            jobs.advance("1", "uploaded")
+
+    def test_unnotified_jobs(self):
+        jobs = JobStore(self.path)
+        for message_id in ["30", "4", "100"]:
+            jobs.advance(message_id, "written", file={"id": message_id}, content="# Title")
+        jobs.advance("5", "generated", content="# Title")
+
+        self.assertEqual([job["message_id"] for job in jobs.unnotified(exclude=["100"])], ["4", "30"])
+        jobs.mark_notified(["4", "30"])
+        self.assertEqual([job["message_id"] for job in jobs.unnotified()], ["100"])
+        self.assertNotIn("content", jobs.get("4")["data"])
+
+    def test_prune_drops_expired_jobs(self):
+        jobs = JobStore(self.path, ttl_seconds=-1)
+        jobs.advance("1", "fetched")
+        self.assertEqual(jobs.prune(), 1)
+        self.assertEqual(len(jobs), 0)
+
+    def test_drive_snapshot_restores_unfinished_jobs(self):
+        drive = FakeDriveService()
+        jobs = JobStore(self.path, drive_sync=True, drive_service=drive)
+        jobs.advance("1", "written", file={"id": "f1"})
+        jobs.advance("2", "notified")
+        jobs.flush()
+        self.assertEqual(len(drive.find(**{SNAPSHOT_PROPERTY: "snapshot"})), 1)
+
+        # Unchanged jobs are not uploaded again
+        calls = dict(drive.calls)
+        jobs.flush()
+        self.assertEqual(drive.calls, calls)
+
+        # A cold start without the local database restores from Drive
+        restored = JobStore(os.path.join(self.tmp_dir.name, "cold.sqlite3"), drive_sync=True, drive_service=drive)
+        self.assertEqual(restored.get("1")["data"], {"file": {"id": "f1"}})
+        self.assertIsNone(restored.get("2"))
+
+if __name__ == '__main__':
+    unittest.main()
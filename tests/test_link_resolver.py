@@ -0,0 +1,81 @@
+import unittest
+from unittest.mock import patch
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+# Add project root to path to import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.clients import reset_clients
+from src.link_resolver import LinkResolver
+from src.nodes.node2_preprocessing import Node2_Preprocessing, normalize_url, extract_urls
+from benchmarks.fake_links import FakeShortLinkServer
+
+def make_post(post_id, text):
+    return {"id": post_id, "text": text, "attachments": [], "embeds": [], "created_at": datetime.now().isoformat()}
+
+class TestLinkResolver(unittest.TestCase):
+
+    def setUp(self):
+        reset_clients()
+        self.addCleanup(reset_clients)
+        self.links = FakeShortLinkServer({
+            "a1": "https://example.com/a",
+            # A t.co link to another shortener is followed to the end
+            "b2": "https://t.co/c3",
+            "c3": "https://example.com/c#section",
+        })
+        self.links.__enter__()
+        self.addCleanup(self.links.__exit__)
+        patcher = patch.dict(os.environ, {"TCO_BASE_URL": self.links.url})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_extract_and_normalize_urls(self):
+        self.assertEqual(extract_urls("see https://t.co/abc, and (https://example.com/x)."),
+                         ["https://t.co/abc", "https://example.com/x"])
+        self.assertEqual(normalize_url("HTTPS://Example.com:443/a?utm_source=x&id=3#frag"), "https://example.com/a?id=3")
+        self.assertEqual(normalize_url("https://x.com/user/status/1?s=20&t=abc"), "https://x.com/user/status/1")
+
+    def test_process_many_resolves_links_once(self):
+        path = os.path.join(tempfile.mkdtemp(), "links.sqlite3")
+        node = Node2_Preprocessing(resolver=LinkResolver(path=path))
+        posts = [make_post("1", "First https://t.co/a1 https://example.com/plain"),
+                 make_post("2", "Second https://t.co/b2 and again https://t.co/a1.")]
+
+        structured = node.process_many(posts)
+        self.assertEqual(structured[0]["text"], "First  https://example.com/plain")
+        self.assertEqual(structured[0]["external_urls"], ["https://example.com/a", "https://example.com/plain"])
+        self.assertEqual(structured[1]["external_urls"], ["https://example.com/c", "https://example.com/a"])
+        self.assertEqual(self.links.request_count, 3)
+
+        # The mappings persist across instances
+        Node2_Preprocessing(resolver=LinkResolver(path=path)).process_many(posts)
+        self.assertEqual(self.links.request_count, 3)
+
+    def test_malformed_links_are_kept_as_they_are(self):
+        node = Node2_Preprocessing(resolver=LinkResolver(path=""))
+        posts = [make_post("1", "Bad port https://example.com:abc/x and http://a.com:99999/"),
+                 make_post("2", "Broken IPv6 https://[oops and https://t.co/a1")]
+
+        structured = node.process_many(posts)
+
+        self.assertEqual(structured[0]["external_urls"], ["https://example.com:abc/x", "http://a.com:99999/"])
+        self.assertEqual(structured[1]["external_urls"], ["https://[oops", "https://example.com/a"])
+        self.assertFalse(LinkResolver.is_short_link("https://[oops"))
+
+    def test_deadline_keeps_unresolved_links(self):
+        self.links.latency_ms = 500
+        node = Node2_Preprocessing(resolver=LinkResolver(path=""))
+        structured = node.process_many([make_post("1", "Slow https://t.co/a1")], deadline_seconds=0.05)
+        self.assertEqual(structured[0]["external_urls"], ["https://t.co/a1"])
+
+    def test_only_short_links_are_requested(self):
+        resolver = LinkResolver(path="")
+        self.assertEqual(resolver.resolve_many(["https://example.com/page"]), {})
+        self.assertEqual(self.links.request_count, 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,396 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import os
+import sys
+import json
+import tempfile
+import subprocess
+import threading
+import time
+
+# Add project root to path to import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import src.main as main_module
+from src.archive_index import get_archive_index
+from src.checkpoint import MessageCheckpoint
+from src.clients import reset_clients
+from src.nodes.node3_gemini import SummaryGenerationError
+
+def make_posts(count):
+    return [
+        {"id": str(i), "text": f"Post {i}", "author": "post",
+         "created_at": "2025-12-17T12:34:59+00:00", "attachments": [], "embeds": []}
+        for i in range(count)
+    ]
+
+class TestMainPipeline(unittest.TestCase):
+
+    def setUp(self):
+        patchers = {
+            name: patch.object(main_module.pipeline_nodes, name)
+            for name in [
+                'Node1_Discord_Input', 'Node2_Preprocessing', 'Node3_Gemini',
+                'Node4_Folder_Management', 'Node5_File_Creation',
+                'Node6_Content_Writing', 'Node7_Metadata_Extraction',
+                'Node8_Discord_Notification',
+            ]
+        }
+        self.mocks = {name: p.start() for name, p in patchers.items()}
+        for p in patchers.values():
+            self.addCleanup(p.stop)
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.checkpoint = MessageCheckpoint(path=os.path.join(tmp_dir.name, "checkpoint.json"))
+        for p in [patch.object(main_module, 'MessageCheckpoint', return_value=self.checkpoint),
+                  patch.object(main_module.utils, 'get_drive_service', return_value=None),
+                  patch.dict(os.environ, {"METRICS_HISTORY_PATH": "",
+                                          "JOB_STORE_PATH": os.path.join(tmp_dir.name, "jobs.sqlite3"),
+                                          "NEAR_DUP_INDEX_PATH": "", "ARCHIVE_INDEX_PATH": ""})]:
+            p.start()
+            self.addCleanup(p.stop)
+        reset_clients('archive_index')
+        self.addCleanup(reset_clients, 'archive_index')
+
+        node2 = self.mocks['Node2_Preprocessing'].return_value
+        node2.process.side_effect = lambda post: {"id": post["id"], "text": post["text"]}
+        node2.process_many.side_effect = lambda posts: [node2.process(post) for post in posts]
+        node4 = self.mocks['Node4_Folder_Management'].return_value
+        node4.get_or_create_folder.return_value = "day_folder"
+        node5 = self.mocks['Node5_File_Creation'].return_value
+        node5.check_file_exists.return_value = False
+        node5.list_processed_message_ids.return_value = set()
+        node5.build_file_metadata.side_effect = lambda folder_id, name, message_id=None: {"id": message_id}
+        node6 = self.mocks['Node6_Content_Writing'].return_value
+        node6.create_file_with_content.side_effect = lambda meta, content: meta
+        node7 = self.mocks['Node7_Metadata_Extraction'].return_value
+        node7.extract.side_effect = lambda meta, content: {"title": content, "url": meta["id"]}
+        node8 = self.mocks['Node8_Discord_Notification'].return_value
+        node8.send_notification.side_effect = lambda items: {'delivered': list(items), 'failed': []}
+
+    def run_main(self, posts, workers="4"):
+        node1 = self.mocks['Node1_Discord_Input'].return_value
+        node1.last_scanned_id = None
+
+        async def fetch(*args, **kwargs):
+            return posts
+        node1.fetch_recent_messages.side_effect = fetch
+        node1.fetch_messages_after.side_effect = fetch
+
+        with patch.dict(os.environ, {"MAX_WORKERS": workers}):
+            main_module.main()
+        node8 = self.mocks['Node8_Discord_Notification'].return_value
+        if not node8.send_notification.called:
+            return []
+        return node8.send_notification.call_args[0][0]
+
+    def test_title_list_keeps_message_order(self):
+        def slow_summary(data):
+            # Earlier messages finish last
+            time.sleep(0.01 * (10 - int(data["id"])))
+            return f"# Title {data['id']}"
+        self.mocks['Node3_Gemini'].return_value.generate_summary.side_effect = slow_summary
+
+        title_list = self.run_main(make_posts(10))
+
+        self.assertEqual([item["url"] for item in title_list], [str(i) for i in range(10)])
+
+    def test_failure_does_not_stop_other_messages(self):
+        def summary(data):
+            if data["id"] == "1":
+                raise RuntimeError("boom")
+            return f"# Title {data['id']}"
+        self.mocks['Node3_Gemini'].return_value.generate_summary.side_effect = summary
+
+        title_list = self.run_main(make_posts(3))
+
+        self.assertEqual([item["url"] for item in title_list], ["0", "2"])
+
+    def test_checkpoint_stops_before_failed_message(self):
+        def summary(data):
+            if data["id"] == "102":
+                raise RuntimeError("boom")
+            return f"# Title {data['id']}"
+        self.mocks['Node3_Gemini'].return_value.generate_summary.side_effect = summary
+        posts = make_posts(4)
+        for post in posts:
+            post["id"] = str(100 + int(post["id"]))
+
+        self.run_main(posts)
+        self.assertEqual(self.checkpoint.cursor, "101")
+
+        # Next poll resumes after the checkpoint
+        self.run_main([])
+        node1 = self.mocks['Node1_Discord_Input'].return_value
+        node1.fetch_messages_after.assert_called_with("101")
+
+    def test_failed_summary_writes_no_file_and_holds_checkpoint(self):
+        def summary(data):
+            if data["id"] == "101":
+                raise SummaryGenerationError("Error generating summary: 400 bad request")
+            return f"# Title {data['id']}"
+        self.mocks['Node3_Gemini'].return_value.generate_summary.side_effect = summary
+        posts = make_posts(3)
+        for post in posts:
+            post["id"] = str(100 + int(post["id"]))
+
+        title_list = self.run_main(posts)
+
+        self.assertEqual([item["url"] for item in title_list], ["100", "102"])
+        written = [call.args[0]["id"] for call in
+                   self.mocks['Node6_Content_Writing'].return_value.create_file_with_content.call_args_list]
+        self.assertNotIn("101", written)
+        self.assertEqual(self.checkpoint.cursor, "100")
+
+    def test_defers_messages_beyond_time_budget(self):
+        self.mocks['Node3_Gemini'].return_value.generate_summary.side_effect = lambda data: f"# Title {data['id']}"
+        posts = make_posts(5)
+        for post in posts:
+            post["id"] = str(100 + int(post["id"]))
+
+        # Two 1s messages fit in 3s minus 0.5s kept for link resolution with one worker;
+        # the rest wait for the next invocation
+        env = {"SCHEDULER_DEFAULT_MESSAGE_MS": "1000", "SCHEDULER_RESERVE_MS": "0",
+               "LINK_RESOLVE_DEADLINE_SECONDS": "0.5"}
+        context = MagicMock()
+        context.get_remaining_time_in_millis.return_value = 3000
+        with patch.dict(os.environ, dict(env, MAX_WORKERS="1")):
+            node1 = self.mocks['Node1_Discord_Input'].return_value
+            node1.last_scanned_id = None
+
+            async def fetch(*args, **kwargs):
+                return posts
+            node1.fetch_recent_messages.side_effect = fetch
+            main_module.main(context=context)
+
+        title_list = self.mocks['Node8_Discord_Notification'].return_value.send_notification.call_args[0][0]
+        self.assertEqual([item["url"] for item in title_list], ["100", "101"])
+        self.assertEqual(self.checkpoint.cursor, "101")
+
+    def test_bulk_lookup_filters_processed_messages(self):
+        node3 = self.mocks['Node3_Gemini'].return_value
+        node3.generate_summary.side_effect = lambda data: f"# Title {data['id']}"
+        node5 = self.mocks['Node5_File_Creation'].return_value
+        node5.list_processed_message_ids.return_value = {"0", "2"}
+
+        title_list = self.run_main(make_posts(4))
+
+        self.assertEqual([item["url"] for item in title_list], ["1", "3"])
+        node5.list_processed_message_ids.assert_called_once_with({"day_folder"})
+        node5.check_file_exists.assert_not_called()
+
+    def test_archive_index_answers_idempotency(self):
+        self.mocks['Node3_Gemini'].return_value.generate_summary.side_effect = lambda data: f"# Title {data['id']}"
+        node5 = self.mocks['Node5_File_Creation'].return_value
+        for message_id in ["0", "1"]:
+            get_archive_index().record_file({'id': f"file{message_id}", 'name': "Done.md", 'parents': ["day_folder"],
+                                             'appProperties': {'discord_message_id': message_id}})
+
+        with patch.dict(os.environ, {"STREAMING_MODE": "false"}):
+            self.run_main(make_posts(2))
+            node5.list_processed_message_ids.assert_not_called()
+
+            title_list = self.run_main(make_posts(3))
+
+        # Only the unknown message goes to Drive and Gemini
+        node5.list_processed_message_ids.assert_called_once()
+        self.mocks['Node3_Gemini'].return_value.generate_summary.assert_called_once()
+        self.assertEqual([item["url"] for item in title_list], ["2"])
+
+    def test_batch_preprocessing_failure_isolates_bad_message(self):
+        self.mocks['Node3_Gemini'].return_value.generate_summary.side_effect = lambda data: f"# Title {data['id']}"
+        node2 = self.mocks['Node2_Preprocessing'].return_value
+
+        def process(post):
+            if post["id"] == "1":
+                raise ValueError("Invalid IPv6 URL")
+            return {"id": post["id"], "text": post["text"]}
+        node2.process.side_effect = process
+
+        title_list = self.run_main(make_posts(3))
+
+        self.assertEqual([item["url"] for item in title_list], ["0", "2"])
+        self.assertEqual(self.checkpoint.cursor, "0")
+
+    def test_falls_back_to_per_message_check(self):
+        node3 = self.mocks['Node3_Gemini'].return_value
+        node3.generate_summary.side_effect = lambda data: f"# Title {data['id']}"
+        node5 = self.mocks['Node5_File_Creation'].return_value
+        node5.list_processed_message_ids.return_value = None
+        node5.check_file_exists.side_effect = lambda folder_id, message_id: message_id == "1"
+
+        title_list = self.run_main(make_posts(3))
+
+        self.assertEqual([item["url"] for item in title_list], ["0", "2"])
+
+    def test_streaming_mode_uses_first_line_as_title(self):
+        node3 = self.mocks['Node3_Gemini'].return_value
+        node3.generate_summary_stream.side_effect = lambda data: iter([f"# Title {data['id']}\n", "Body"])
+        node5 = self.mocks['Node5_File_Creation'].return_value
+        node6 = self.mocks['Node6_Content_Writing'].return_value
+        node6.create_file_streaming.side_effect = lambda meta, chunks: {"id": meta["id"], "body": "".join(chunks)}
+
+        with patch.dict(os.environ, {"STREAMING_MODE": "true"}):
+            title_list = self.run_main(make_posts(2))
+
+        self.assertEqual([item["title"] for item in title_list], ["# Title 0", "# Title 1"])
+        file_names = sorted(call.args[1] for call in node5.build_file_metadata.call_args_list)
+        self.assertEqual(file_names, ["Title 0.md", "Title 1.md"])
+        node3.generate_summary.assert_not_called()
+
+    def test_worker_limit_is_respected(self):
+        lock = threading.Lock()
+        state = {"active": 0, "peak": 0}
+
+        def summary(data):
+            with lock:
+                state["active"] += 1
+                state["peak"] = max(state["peak"], state["active"])
+            time.sleep(0.02)
+            with lock:
+                state["active"] -= 1
+            return "# Title"
+        self.mocks['Node3_Gemini'].return_value.generate_summary.side_effect = summary
+
+        self.run_main(make_posts(8), workers="2")
+
+        self.assertLessEqual(state["peak"], 2)
+
+    def test_resumes_at_first_incomplete_stage(self):
+        node3 = self.mocks['Node3_Gemini'].return_value
+        node3.generate_summary.side_effect = lambda data: f"# Title {data['id']}"
+        node6 = self.mocks['Node6_Content_Writing'].return_value
+        node6.create_file_with_content.side_effect = lambda meta, content: None
+
+        with patch.dict(os.environ, {"STREAMING_MODE": "false"}):
+            self.assertEqual(self.run_main(make_posts(1)), [])
+
+            # The retry reuses the generated summary instead of calling Gemini again
+            node6.create_file_with_content.side_effect = lambda meta, content: meta
+            title_list = self.run_main(make_posts(1))
+        self.assertEqual([item["title"] for item in title_list], ["# Title 0"])
+        self.assertEqual(node3.generate_summary.call_count, 1)
+
+    def test_undelivered_notifications_are_sent_next_run(self):
+        self.mocks['Node3_Gemini'].return_value.generate_summary.side_effect = lambda data: f"# Title {data['id']}"
+        node8 = self.mocks['Node8_Discord_Notification'].return_value
+        node8.send_notification.side_effect = lambda items: {'delivered': [], 'failed': list(items)}
+        self.run_main(make_posts(2))
+
+        node8.send_notification.side_effect = lambda items: {'delivered': list(items), 'failed': []}
+        title_list = self.run_main([])
+        self.assertEqual([item["url"] for item in title_list], ["0", "1"])
+
+        node8.send_notification.reset_mock()
+        self.run_main([])
+        node8.send_notification.assert_not_called()
+
+    def test_delivery_is_matched_by_message_id(self):
+        self.mocks['Node3_Gemini'].return_value.generate_summary.side_effect = lambda data: f"# Title {data['id']}"
+        node8 = self.mocks['Node8_Discord_Notification'].return_value
+        # Node 8 may report copies of the items; only message 1 is delivered
+        node8.send_notification.side_effect = lambda items: {
+            'delivered': [dict(item) for item in items if item['message_id'] == "1"],
+            'failed': [dict(item) for item in items if item['message_id'] != "1"]}
+        title_list = self.run_main(make_posts(2))
+        self.assertEqual([item["message_id"] for item in title_list], ["0", "1"])
+
+        node8.send_notification.side_effect = lambda items: {'delivered': list(items), 'failed': []}
+        title_list = self.run_main([])
+        self.assertEqual([item["message_id"] for item in title_list], ["0"])
+
+    def test_near_duplicate_reuses_earlier_summary(self):
+        node3 = self.mocks['Node3_Gemini'].return_value
+        node3.generate_summary.side_effect = lambda data: f"# Title {data['id']}"
+        story = ("Breaking: the city council approved the new riverside park plan on Tuesday, "
+                 "with construction expected to begin next spring and finish by 2028.")
+        first, second = make_posts(2)
+        first["text"] = story
+        second["text"] = story.replace("on Tuesday", "this Tuesday") + " Big news!"
+
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+                patch.dict(os.environ, {"STREAMING_MODE": "false",
+                                        "NEAR_DUP_INDEX_PATH": os.path.join(tmp_dir, "index.sqlite3")}):
+            self.run_main([first])
+            title_list = self.run_main([second])
+
+        # The copy reuses the first message's file and title instead of a new summary
+        self.assertEqual(node3.generate_summary.call_count, 1)
+        self.assertEqual(len(title_list), 1)
+        self.assertEqual(title_list[0]["url"], "0")
+        self.assertEqual(title_list[0]["title"], "# Title 0")
+        self.assertEqual(title_list[0]["duplicate_of"], "0")
+        self.mocks['Node6_Content_Writing'].return_value.create_file_with_content.assert_called_once()
+
+    def test_near_duplicate_in_the_same_batch_reuses_summary(self):
+        node3 = self.mocks['Node3_Gemini'].return_value
+        node3.generate_summary.side_effect = lambda data: f"# Title {data['id']}"
+        story = ("Breaking: the city council approved the new riverside park plan on Tuesday, "
+                 "with construction expected to begin next spring and finish by 2028.")
+        first, other, second = make_posts(3)
+        first["text"] = story
+        second["text"] = story.replace("on Tuesday", "this Tuesday") + " Big news!"
+
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+                patch.dict(os.environ, {"STREAMING_MODE": "false",
+                                        "NEAR_DUP_INDEX_PATH": os.path.join(tmp_dir, "index.sqlite3")}):
+            title_list = self.run_main([first, other, second])
+
+        self.assertEqual(node3.generate_summary.call_count, 2)
+        self.assertEqual([item["url"] for item in title_list], ["0", "1", "0"])
+        self.assertEqual([item.get("duplicate_of") for item in title_list], [None, None, "0"])
+        self.assertEqual(self.checkpoint.cursor, "2")
+
+    def test_near_duplicate_is_not_announced_again_when_cursor_is_held_back(self):
+        node3 = self.mocks['Node3_Gemini'].return_value
+
+        def summary(data):
+            if data["id"] == "1":
+                raise RuntimeError("boom")
+            return f"# Title {data['id']}"
+        node3.generate_summary.side_effect = summary
+        story = ("Breaking: the city council approved the new riverside park plan on Tuesday, "
+                 "with construction expected to begin next spring and finish by 2028.")
+        first, failing, copy = make_posts(3)
+        first["text"] = story
+        copy["text"] = story.replace("on Tuesday", "this Tuesday") + " Big news!"
+        node8 = self.mocks['Node8_Discord_Notification'].return_value
+
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+                patch.dict(os.environ, {"STREAMING_MODE": "false",
+                                        "NEAR_DUP_INDEX_PATH": os.path.join(tmp_dir, "index.sqlite3")}):
+            self.run_main([first])
+            title_list = self.run_main([failing, copy])
+            self.assertEqual([item.get("duplicate_of") for item in title_list], ["0"])
+            self.assertEqual(self.checkpoint.cursor, "0")
+
+            # The failed message holds the cursor back, so the next poll fetches the copy again
+            node8.send_notification.reset_mock()
+            self.run_main([failing, copy])
+
+        node8.send_notification.assert_not_called()
+        self.assertEqual(self.checkpoint.cursor, "0")
+
+    def test_empty_poll_skips_downstream_nodes(self):
+        self.run_main([])
+
+        for name in ['Node2_Preprocessing', 'Node3_Gemini', 'Node4_Folder_Management',
+                     'Node5_File_Creation', 'Node6_Content_Writing', 'Node7_Metadata_Extraction',
+                     'Node8_Discord_Notification']:
+            self.mocks[name].assert_not_called()
+
+class TestLazyImports(unittest.TestCase):
+
+    def test_importing_main_does_not_load_sdks(self):
+        heavy = ["discord", "google.genai", "googleapiclient", "httplib2"]
+        code = (
+            "import sys, json; import src.main; "
+            f"print(json.dumps([m for m in {heavy!r} if m in sys.modules]))"
+        )
+        root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+        output = subprocess.run([sys.executable, "-c", code], cwd=root,
+                                capture_output=True, text=True, check=True).stdout
+        self.assertEqual(json.loads(output.strip().splitlines()[-1]), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import unittest
+from unittest.mock import patch
+import io
+import os
+import sys
+import tempfile
+
+from PIL import Image
+
+# Add project root to path to import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.clients import get_client, reset_clients
+from src.media import MediaCache, MediaPipeline, downscale_image, estimate_image_tokens, get_process_pool
+from src.summary_cache import SummaryCache
+from src.nodes.node3_gemini import Node3_Gemini
+from benchmarks.fakes import FakeGeminiClient
+from benchmarks.fake_discord_api import FakeDiscordAPI
+
+def make_png(width, height, color=(200, 30, 30, 128)):
+    output = io.BytesIO()
+    Image.new("RGBA", (width, height), color).save(output, "PNG")
+    return output.getvalue()
+
+class TestMediaPipeline(unittest.TestCase):
+
+    def setUp(self):
+        reset_clients()
+        self.addCleanup(reset_clients)
+        patcher = patch.dict(os.environ, {"MEDIA_PROCESS_WORKERS": "0"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.attachments = {"big.png": make_png(3000, 2000), "small.png": make_png(100, 100, (0, 0, 255, 255)),
+                            "broken.png": b"not an image"}
+
+    def test_downscale_image(self):
+        data, mime_type, width, height = downscale_image(self.attachments["big.png"], 1024, 80)
+        self.assertEqual(mime_type, "image/jpeg")
+        self.assertEqual((width, height), (1024, 683))
+        self.assertEqual(Image.open(io.BytesIO(data)).size, (1024, 683))
+
+    def test_estimate_image_tokens(self):
+        self.assertEqual(estimate_image_tokens(300, 200), 258)
+        self.assertEqual(estimate_image_tokens(1024, 683), 2 * 258)
+
+    def test_prepare_downloads_each_image_once(self):
+        with FakeDiscordAPI([], attachments=self.attachments) as api:
+            media = MediaPipeline(cache=MediaCache(directory=""))
+            urls = [api.attachment_url("big.png"), api.attachment_url("broken.png"),
+                    api.attachment_url("small.png")]
+            images = media.prepare(urls)
+            self.assertEqual([(image['width'], image['height']) for image in images], [(768, 512), (100, 100)])
+            self.assertEqual(api.attachment_requests, 3)
+
+            # Re-signed links of the same files are served from the cache
+            images = media.prepare([api.attachment_url("big.png", signature="other"),
+                                    api.attachment_url("small.png", signature="other")])
+            self.assertEqual(len(images), 2)
+            self.assertEqual(api.attachment_requests, 3)
+
+    def test_same_content_is_resized_once(self):
+        self.attachments["copy.png"] = self.attachments["big.png"]
+        cache = MediaCache(directory=tempfile.mkdtemp())
+        with FakeDiscordAPI([], attachments=self.attachments) as api, \
+                patch('src.media.downscale_image', wraps=downscale_image) as downscale:
+            media = MediaPipeline(cache=cache)
+            media.prepare([api.attachment_url("big.png")])
+            images = media.prepare([api.attachment_url("copy.png")])
+        self.assertEqual(downscale.call_count, 1)
+        self.assertEqual(len(images), 1)
+        self.assertEqual(len(cache), 1)
+
+    def test_prepare_respects_budgets(self):
+        with FakeDiscordAPI([], attachments=self.attachments) as api, \
+                patch.dict(os.environ, {"MEDIA_MAX_TOKENS": "600", "MEDIA_MAX_SIDE": "1024"}):
+            media = MediaPipeline(cache=MediaCache(directory=""))
+            images = media.prepare([api.attachment_url("small.png"), api.attachment_url("big.png"),
+                                    api.attachment_url("small.png", signature="other")])
+        # The 516-token image does not fit after the small one, whose copy is sent once
+        self.assertEqual([image['tokens'] for image in images], [258])
+
+    def test_process_pool_downscales(self):
+        with patch.dict(os.environ, {"MEDIA_PROCESS_WORKERS": "1"}):
+            pool = get_process_pool()
+        self.assertIsNotNone(pool)
+        self.addCleanup(pool.shutdown)
+        media = MediaPipeline(cache=MediaCache(directory=""))
+        with patch.dict(os.environ, {"MEDIA_PROCESS_WORKERS": "1"}):
+            _, mime_type, width, height = media._downscale(self.attachments["big.png"])
+        self.assertEqual((mime_type, width, height), ("image/jpeg", 768, 512))
+
+    def test_node3_sends_images_as_inline_parts(self):
+        gemini = FakeGeminiClient()
+        get_client('gemini', lambda: gemini)
+        with FakeDiscordAPI([], attachments=self.attachments) as api:
+            node = Node3_Gemini(cache=SummaryCache(path=""), media=MediaPipeline(cache=MediaCache(directory="")))
+            structured_data = {"text": "Some text", "external_urls": [], "media_urls": [api.attachment_url("big.png")]}
+            summary = node.generate_summary(structured_data)
+            # Same text without the image is a different summary
+            node.generate_summary(dict(structured_data, media_urls=[]))
+
+        self.assertTrue(summary.startswith("# Some text"))
+        self.assertEqual(gemini.calls, 2)
+        self.assertEqual(gemini.media_parts, 1)
+
+    def test_default_budgets_send_four_large_images(self):
+        colors = [(200, 30, 30, 255), (30, 200, 30, 255), (30, 30, 200, 255), (200, 200, 30, 255)]
+        self.attachments.update({f"photo{i}.png": make_png(3000, 2000, color) for i, color in enumerate(colors)})
+        gemini = FakeGeminiClient()
+        get_client('gemini', lambda: gemini)
+        defaults = {name: value for name, value in os.environ.items()
+                    if not name.startswith("MEDIA_") or name == "MEDIA_PROCESS_WORKERS"}
+        with FakeDiscordAPI([], attachments=self.attachments) as api, patch.dict(os.environ, defaults, clear=True):
+            node = Node3_Gemini(cache=SummaryCache(path=""), media=MediaPipeline(cache=MediaCache(directory="")))
+            node.generate_summary({"text": "Four photos", "external_urls": [],
+                                   "media_urls": [api.attachment_url(f"photo{i}.png") for i in range(4)]})
+
+        self.assertEqual(gemini.media_parts, 4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import unittest
+from unittest.mock import patch
+import os
+import sys
+import json
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+# Add project root to path to import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import src.metrics as metrics
+from src.metrics import RunMetrics, percentile, summarize_history
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.history = os.path.join(self.tmp_dir.name, "history.jsonl")
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile([7], 95), 7)
+        self.assertIsNone(percentile([], 50))
+
+    def test_emf_record(self):
+        run = RunMetrics()
+        run.observe("stage.summarize", 120.0)
+        run.observe("stage.summarize", 80.0)
+        run.count_api_call("drive", "files.list")
+        run.count_api_call("drive", "files.list")
+        run.record_capture_to_notify((datetime.now(timezone.utc) - timedelta(seconds=30)).isoformat())
+
+        with patch('builtins.print') as mock_print:
+            record = run.emit(history_path=self.history)
+
+        self.assertEqual(json.loads(mock_print.call_args.args[0]), record)
+        definitions = {d["Name"]: d["Unit"] for d in record["_aws"]["CloudWatchMetrics"][0]["Metrics"]}
+        self.assertEqual(definitions["stage.summarize"], "Milliseconds")
+        self.assertEqual(definitions["api.drive.files.list"], "Count")
+        self.assertEqual(record["stage.summarize"], [120.0, 80.0])
+        self.assertEqual(record["api.drive.files.list"], 2)
+        self.assertGreaterEqual(record["capture_to_notify"][0], 30000)
+        self.assertEqual(record["summary"]["stage.summarize"]["p95"], 120.0)
+
+    def test_history_summary_across_runs(self):
+        for latency in [10, 20, 30, 40]:
+            run = RunMetrics()
+            run.observe("run", latency)
+            run.increment("api.gemini.generate_content", latency // 10)
+            with patch('builtins.print'):
+                run.emit(history_path=self.history)
+
+        summary = summarize_history(self.history)
+
+        self.assertEqual(summary["run"]["runs"], 4)
+        self.assertEqual(summary["run"]["p50"], 20)
+        self.assertEqual(summary["run"]["p95"], 40)
+        self.assertEqual(summary["api.gemini.generate_content"]["p50"], 2)
+
+    def test_drain_keeps_every_sample_exactly_once(self):
+        run = RunMetrics()
+        run.observe("stage.summarize", 120.0)
+        with run.timer("stage.write"):
+            # A sample recorded while the collector is drained lands in the next record
+            drained = run.drain()
+        run.increment("messages.done")
+
+        self.assertEqual(drained.timings, {"stage.summarize": [120.0]})
+        self.assertEqual(drained.counters, {})
+        self.assertEqual(list(run.timings), ["stage.write"])
+        self.assertEqual(run.counters, {"messages.done": 1})
+        self.assertTrue(RunMetrics().is_empty())
+        self.assertFalse(run.is_empty())
+
+    def test_debug_does_not_format_when_disabled(self):
+        class Expensive:
+            formatted = 0
+            def __str__(self):
+                Expensive.formatted += 1
+                return "expensive"
+
+        with patch('builtins.print') as mock_print:
+            metrics.set_debug(False)
+            metrics.debug("Response: %s", Expensive())
+            self.assertEqual(Expensive.formatted, 0)
+            mock_print.assert_not_called()
+            metrics.set_debug(True)
+            try:
+                metrics.debug("Response: %s", Expensive())
+            finally:
+                metrics.set_debug(None)
+        self.assertEqual(Expensive.formatted, 1)
+        mock_print.assert_called_once_with("DEBUG: Response: expensive")
+
+    def test_debug_follows_environment_set_after_import(self):
+        with patch.dict(os.environ, {"DEBUG": "true"}):
+            self.assertTrue(metrics.is_debug_enabled())
+            metrics.set_debug(False)
+            try:
+                self.assertFalse(metrics.is_debug_enabled())
+            finally:
+                metrics.set_debug(None)
+        with patch.dict(os.environ, {"DEBUG": "false"}):
+            self.assertFalse(metrics.is_debug_enabled())
+
+if __name__ == '__main__':
+    unittest.main()
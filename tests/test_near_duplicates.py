@@ -0,0 +1,76 @@
+import unittest
+import os
+import sys
+import tempfile
+
+# Add project root to path to import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.near_duplicates import NearDuplicateIndex, choose_bands, minhash_signature, similarity
+
+STORY = ("Breaking: the city council approved the new riverside park plan on Tuesday, "
+         "with construction expected to begin next spring and finish by 2028.")
+REWORDED = ("BREAKING - The city council approved the new riverside park plan this Tuesday, "
+            "with construction expected to begin next spring and finish by 2028. Big news!")
+OTHER = ("Breaking: the school board rejected the new downtown stadium proposal on Monday, "
+         "saying the costs were too high and the timeline unrealistic for the district.")
+
+class TestNearDuplicates(unittest.TestCase):
+
+    def test_signature_similarity(self):
+        self.assertEqual(minhash_signature(STORY), minhash_signature(STORY))
+        self.assertGreaterEqual(similarity(minhash_signature(STORY), minhash_signature(REWORDED)), 0.7)
+        self.assertLess(similarity(minhash_signature(STORY), minhash_signature(OTHER)), 0.7)
+
+    def test_band_layout_follows_threshold(self):
+        # Higher thresholds need longer (fewer) bands to keep dissimilar posts apart
+        self.assertGreaterEqual(choose_bands(0.5), choose_bands(0.7))
+        self.assertGreaterEqual(choose_bands(0.7), choose_bands(0.9))
+        self.assertEqual(64 % choose_bands(0.7), 0)
+
+    def test_finds_near_duplicate_only(self):
+        index = NearDuplicateIndex(path="")
+        file = {"id": "f1", "name": "Park.md", "webViewLink": "http://drive/f1"}
+        self.assertTrue(index.add("1", STORY, {"title": "Park", "url": "http://drive/f1"}, file))
+
+        match = index.find(REWORDED)
+        self.assertEqual(match["message_id"], "1")
+        self.assertEqual(match["file"], file)
+        self.assertEqual(match["meta"]["title"], "Park")
+        self.assertIsNone(index.find(OTHER))
+
+    def test_groups_copies_within_a_batch(self):
+        index = NearDuplicateIndex(path="")
+        followers = index.group_batch([("1", STORY), ("2", OTHER), ("3", REWORDED), ("4", "short"), ("5", STORY)])
+        self.assertEqual(followers, {"3": "1", "5": "1"})
+        # Nothing is indexed until the leader is processed
+        self.assertEqual(len(index), 0)
+
+    def test_short_texts_are_not_indexed(self):
+        index = NearDuplicateIndex(path="")
+
+        self.assertFalse(index.add("1", "lol", {"title": "lol"}))
+        self.assertIsNone(index.find("lol"))
+        self.assertEqual(len(index), 0)
+
+    def test_persists_and_expires(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "index.sqlite3")
+            NearDuplicateIndex(path=path).add("1", STORY, {"title": "Park"})
+
+            self.assertEqual(NearDuplicateIndex(path=path).find(REWORDED)["message_id"], "1")
+            # Re-indexing a message replaces its buckets instead of adding more
+            index = NearDuplicateIndex(path=path)
+            index.add("1", OTHER, {"title": "Stadium"})
+            self.assertIsNone(index.find(REWORDED))
+            self.assertEqual(index.find(OTHER)["meta"]["title"], "Stadium")
+            # A different threshold changes the band layout, so the index starts over
+            self.assertEqual(len(NearDuplicateIndex(path=path, threshold=0.9)), 0)
+
+            index = NearDuplicateIndex(path=path)
+            index.add("2", STORY, {"title": "Park"})
+            self.assertEqual(len(NearDuplicateIndex(path=path)), 1)
+            self.assertEqual(len(NearDuplicateIndex(path=path, ttl_seconds=-1)), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,137 +1,136 @@
 import unittest
-from unittest.mock import MagicMock, patch
+from unittest.mock import patch
 import sys
 import os
+import asyncio
 from datetime import datetime
 
-# Add src to path to import nodes
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+# Add project root to path to import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from nodes.node1_x_api import Node1_X_API
-from nodes.node2_preprocessing import Node2_Preprocessing
-from nodes.node3_gemini import Node3_Gemini
-from nodes.node4_folder_management import Node4_Folder_Management
-from nodes.node5_file_creation import Node5_File_Creation
-from nodes.node6_content_writing import Node6_Content_Writing
-from nodes.node7_metadata_extraction import Node7_Metadata_Extraction
-from nodes.node8_discord_notification import Node8_Discord_Notification
+from src.clients import get_client, reset_clients
+from src.folder_cache import FolderCache
+from src.summary_cache import SummaryCache
+from src.link_resolver import LinkResolver
+from src.nodes.node1_discord_rest import Node1_Discord_REST_Input
+from src.nodes.node2_preprocessing import Node2_Preprocessing
+from src.nodes.node3_gemini import Node3_Gemini
+from src.nodes.node4_folder_management import Node4_Folder_Management
+from src.nodes.node5_file_creation import Node5_File_Creation
+from src.nodes.node6_content_writing import Node6_Content_Writing
+from src.nodes.node7_metadata_extraction import Node7_Metadata_Extraction
+from src.nodes.node8_discord_notification import Node8_Discord_Notification
+from benchmarks.fakes import FakeDriveService, FakeGeminiClient
+from benchmarks.fake_discord_api import FakeDiscordAPI, make_messages, CHANNEL_ID
+from benchmarks.fake_links import FakeShortLinkServer
 
 class TestXBookmarkAgent(unittest.TestCase):
 
-    @patch('nodes.node1_x_api.tweepy.Client')
-    def test_node1_fetch_bookmarks(self, mock_client):
-        # Setup mock
-        mock_response = MagicMock()
-        mock_tweet = MagicMock()
-        mock_tweet.id = "123"
-        mock_tweet.text = "Test Tweet"
-        mock_tweet.created_at = datetime.now()
-        mock_tweet.attachments = {}
-        mock_tweet.entities = {}
-        
-        mock_response.data = [mock_tweet]
-        mock_response.includes = {}
-        mock_client.return_value.get_bookmarks.return_value = mock_response
-        
-        # Test
-        node = Node1_X_API()
-        bookmarks = node.fetch_bookmarks("user_id")
-        
-        self.assertEqual(len(bookmarks), 1)
-        self.assertEqual(bookmarks[0]['id'], "123")
-        self.assertEqual(bookmarks[0]['text'], "Test Tweet")
+    def setUp(self):
+        self.drive = FakeDriveService()
+        self.gemini = FakeGeminiClient()
+        reset_clients()
+        get_client('drive', lambda: self.drive)
+        get_client('gemini', lambda: self.gemini)
+        self.addCleanup(reset_clients)
+        patcher = patch.dict(os.environ, {"ARCHIVE_INDEX_PATH": ""})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_node1_fetch_messages(self):
+        messages = make_messages(3) + make_messages(1, author="yt_research")
+        with FakeDiscordAPI(messages) as api, \
+                patch.dict(os.environ, {"DISCORD_TOKEN": "token", "DISCORD_CHANNEL_ID": CHANNEL_ID,
+                                        "DISCORD_API_BASE": api.url}):
+            fetched = asyncio.run(Node1_Discord_REST_Input().fetch_messages_after("0"))
+
+        self.assertEqual([m["id"] for m in fetched], [m["id"] for m in messages[:3]])
+        self.assertEqual(fetched[0]["text"], messages[0]["content"])
 
     def test_node2_preprocessing(self):
-        node = Node2_Preprocessing()
         raw_data = {
             "id": "123",
             "text": "Hello world https://t.co/xyz",
-            "media_urls": [],
-            "external_urls": [],
-            "created_at": datetime.now()
+            "attachments": ["https://cdn.example/a.png"],
+            "embeds": [],
+            "created_at": datetime.now().isoformat()
         }
-        
-        processed = node.process(raw_data)
+
+        with FakeShortLinkServer({"xyz": "https://example.com/article?utm_source=x"}) as links, \
+                patch.dict(os.environ, {"TCO_BASE_URL": links.url}):
+            processed = Node2_Preprocessing(resolver=LinkResolver(path="")).process(raw_data)
         self.assertEqual(processed['text'], "Hello world")
+        self.assertEqual(processed['media_urls'], ["https://cdn.example/a.png"])
+        self.assertEqual(processed['external_urls'], ["https://example.com/article"])
 
-    @patch('nodes.node3_gemini.genai.GenerativeModel')
-    @patch('nodes.node3_gemini.genai.configure')
-    def test_node3_gemini(self, mock_configure, mock_model):
-        mock_model_instance = mock_model.return_value
-        mock_response = MagicMock()
-        mock_response.text = "# Summary\nThis is a summary."
-        mock_model_instance.generate_content.return_value = mock_response
-        
-        node = Node3_Gemini()
+    def test_node3_gemini(self):
+        node = Node3_Gemini(cache=SummaryCache(path=""))
         structured_data = {
             "text": "Some text",
             "external_urls": [],
             "media_urls": []
         }
-        
+
         summary = node.generate_summary(structured_data)
-        self.assertIn("# Summary", summary)
-
-    @patch('nodes.node4_folder_management.utils.get_drive_service')
-    def test_node4_folder_management(self, mock_get_service):
-        mock_service = MagicMock()
-        mock_get_service.return_value = mock_service
-        
-        # Mock list returns empty (folder doesn't exist)
-        mock_service.files().list().execute.return_value = {'files': []}
-        # Mock create returns new folder
-        mock_service.files().create().execute.return_value = {'id': 'new_folder_id'}
-        
-        node = Node4_Folder_Management()
-        folder_id = node.get_or_create_folder(datetime.now())
-        
-        self.assertEqual(folder_id, 'new_folder_id')
-
-    @patch('nodes.node5_file_creation.utils.get_drive_service')
-    def test_node5_file_creation(self, mock_get_service):
-        mock_service = MagicMock()
-        mock_get_service.return_value = mock_service
-        
-        mock_service.files().create().execute.return_value = {'id': 'new_file_id', 'webViewLink': 'http://link'}
-        
+        self.assertTrue(summary.startswith("# Some text"))
+        self.assertEqual(self.gemini.calls, 1)
+
+    def test_node4_folder_management(self):
+        node = Node4_Folder_Management(cache=FolderCache(path=""))
+        folder_id = node.get_or_create_folder("2025-12-17T12:34:59+00:00")
+
+        names = [self.drive.files_by_id[folder_id]['name']]
+        parent = self.drive.files_by_id[folder_id]['parents'][0]
+        while parent in self.drive.files_by_id:
+            names.append(self.drive.files_by_id[parent]['name'])
+            parent = (self.drive.files_by_id[parent]['parents'] or [None])[0]
+        self.assertEqual(len(names), 3)
+
+        # Reuses the existing folders instead of creating new ones
+        node = Node4_Folder_Management(cache=FolderCache(path=""))
+        self.assertEqual(node.get_or_create_folder("2025-12-17T01:00:00+00:00"), folder_id)
+        self.assertEqual(self.drive.calls['files.create'], 3)
+
+    def test_node5_file_creation(self):
         node = Node5_File_Creation()
-        file_meta = node.create_file('folder_id', 'file_name')
-        
-        self.assertEqual(file_meta['id'], 'new_file_id')
-
-    @patch('nodes.node6_content_writing.utils.get_drive_service')
-    @patch('nodes.node6_content_writing.MediaIoBaseUpload')
-    def test_node6_content_writing(self, mock_media_upload, mock_get_service):
-        mock_service = MagicMock()
-        mock_get_service.return_value = mock_service
-        
-        mock_service.files().update().execute.return_value = {'id': 'file_id', 'name': 'updated_file'}
-        
+        file_meta = node.create_file('folder_id', 'file_name', message_id="42")
+
+        self.assertTrue(file_meta['webViewLink'])
+        self.assertTrue(node.check_file_exists('folder_id', "42"))
+        self.assertFalse(node.check_file_exists('other_folder', "42"))
+        self.assertEqual(node.list_processed_message_ids(['folder_id', 'other_folder']), {"42"})
+
+    def test_node6_content_writing(self):
         node = Node6_Content_Writing()
-        file_metadata = {'id': 'file_id'}
-        updated_file = node.write_content(file_metadata, "Some content")
-        
-        self.assertEqual(updated_file['name'], 'updated_file')
+        file_metadata = {'name': 'Title.md', 'parents': ['folder_id'], 'mimeType': 'text/markdown'}
+        created = node.create_file_with_content(file_metadata, "# Title\nSome content")
+
+        self.assertEqual(created['name'], 'Title.md')
+        self.assertEqual(self.drive.files_by_id[created['id']]['content'], "# Title\nSome content")
+
+        updated = node.write_content({'id': created['id']}, "New content")
+        self.assertEqual(updated['name'], 'Title.md')
+        self.assertEqual(self.drive.files_by_id[created['id']]['content'], "New content")
 
     def test_node7_metadata_extraction(self):
         node = Node7_Metadata_Extraction()
         content = "# My Title\nSome content."
         file_metadata = {'webViewLink': 'http://drive.google.com/file'}
-        
+
         metadata = node.extract(file_metadata, content)
         self.assertEqual(metadata['title'], "My Title")
         self.assertEqual(metadata['url'], 'http://drive.google.com/file')
 
-    @patch('nodes.node8_discord_notification.DiscordWebhook')
-    def test_node8_discord_notification(self, mock_webhook):
-        mock_webhook_instance = mock_webhook.return_value
-        mock_webhook_instance.execute.return_value.status_code = 200
-        
-        node = Node8_Discord_Notification("http://webhook.url")
-        title_list = [{'title': 'Title 1', 'url': 'http://url1'}]
-        
-        node.send_notification(title_list)
-        mock_webhook_instance.execute.assert_called_once()
+    def test_node8_discord_notification(self):
+        with FakeDiscordAPI([]) as api:
+            node = Node8_Discord_Notification(api.webhook_url)
+            title_list = [{'title': 'Title 1', 'url': 'http://url1'}]
+
+            report = node.send_notification(title_list)
+
+        self.assertEqual(report['delivered'], title_list)
+        self.assertEqual(len(api.webhook_posts), 1)
+        self.assertIn("[Title 1](http://url1)", api.webhook_posts[0]["embeds"][0]["description"])
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import os
+import sys
+
+# Add project root to path to import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.fake_discord_api import FakeDiscordAPI, _check_webhook_limits
+from src.clients import reset_clients
+from src.nodes.node8_discord_notification import Node8_Discord_Notification, MAX_EMBEDS_PER_MESSAGE, DUPLICATE_MARK
+
+def make_items(count, title_length=60):
+    return [{'title': f"{i:04d} " + "x" * title_length, 'url': f"https://drive.google.com/file/d/{i}/view"}
+            for i in range(count)]
+
+class TestDiscordNotification(unittest.TestCase):
+
+    def setUp(self):
+        reset_clients()
+        self.addCleanup(reset_clients)
+
+    def test_packs_items_within_discord_limits(self):
+        items = make_items(500)
+        messages = Node8_Discord_Notification("http://webhook").build_messages(items)
+
+        for payload, _ in messages:
+            self.assertIsNone(_check_webhook_limits(payload))
+            self.assertLessEqual(len(payload["embeds"]), MAX_EMBEDS_PER_MESSAGE)
+        # Every item exactly once, in order
+        self.assertEqual([item for _, message_items in messages for item in message_items], items)
+        total_chars = sum(len(embed["description"]) for payload, _ in messages for embed in payload["embeds"])
+        self.assertLessEqual(len(messages), total_chars // 6000 + 2)
+
+    def test_long_titles_are_truncated(self):
+        node = Node8_Discord_Notification("http://webhook")
+        messages = node.build_messages([{'title': "t" * 5000, 'url': "http://url"}])
+
+        self.assertEqual(len(messages), 1)
+        self.assertIsNone(_check_webhook_limits(messages[0][0]))
+
+    def test_near_duplicates_are_marked(self):
+        items = make_items(2)
+        items[1]['duplicate_of'] = "123"
+        messages = Node8_Discord_Notification("http://webhook").build_messages(items)
+
+        lines = messages[0][0]["embeds"][0]["description"].split("\n")
+        self.assertFalse(lines[0].endswith(DUPLICATE_MARK))
+        self.assertTrue(lines[1].endswith(DUPLICATE_MARK))
+        self.assertIn(items[1]['url'], lines[1])
+
+    def test_burst_is_delivered_in_order(self):
+        items = make_items(300)
+        with FakeDiscordAPI([]) as api:
+            report = Node8_Discord_Notification(api.webhook_url).send_notification(items)
+
+        self.assertEqual(report['delivered'], items)
+        self.assertEqual(report['failed'], [])
+        self.assertGreater(len(api.webhook_posts), 1)
+        descriptions = "\n".join(embed["description"] for post in api.webhook_posts for embed in post["embeds"])
+        self.assertEqual(descriptions.count("\n") + 1, 300)
+        self.assertLess(descriptions.index("[0000 "), descriptions.index("[0299 "))
+
+    def test_reports_undelivered_items(self):
+        items = make_items(3)
+        with FakeDiscordAPI([], webhook_error_rate=1.0) as api, \
+                patch.dict(os.environ, {"DISCORD_MAX_RETRIES": "0"}):
+            report = Node8_Discord_Notification(api.webhook_url).send_notification(items)
+
+        self.assertEqual(report, {'delivered': [], 'failed': items})
+
+    def test_disabled_notifications_count_as_delivered(self):
+        items = make_items(3)
+        node = Node8_Discord_Notification(None)
+        node.session = MagicMock()
+
+        self.assertEqual(node.send_notification(items), {'delivered': items, 'failed': []})
+        node.session.post.assert_not_called()
+
+    @patch('src.nodes.node8_discord_notification.time.sleep')
+    def test_honors_rate_limits(self, mock_sleep):
+        limited = MagicMock(status_code=429, headers={})
+        limited.json.return_value = {"retry_after": 0.5}
+        ok = MagicMock(status_code=200, headers={"X-RateLimit-Remaining": "0", "X-RateLimit-Reset-After": "2"})
+        node = Node8_Discord_Notification("http://webhook")
+        node.session = MagicMock()
+        node.session.post.side_effect = [limited, ok, ok]
+
+        node.send_notification(make_items(1))
+        node.send_notification(make_items(1))
+
+        self.assertEqual(node.session.post.call_count, 3)
+        self.assertEqual(mock_sleep.call_args_list[0].args[0], 0.5)
+        # Second notification waits for the exhausted bucket to reset
+        self.assertAlmostEqual(mock_sleep.call_args_list[1].args[0], 2, delta=0.1)
+
+if __name__ == '__main__':
+    unittest.main()
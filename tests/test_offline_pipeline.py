@@ -0,0 +1,65 @@
+import unittest
+import os
+import sys
+
+# Add project root to path to import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.fakes import FakeDriveService
+from benchmarks.bench_pipeline import run_benchmark
+
+class TestFakeDrive(unittest.TestCase):
+
+    def test_query_filtering_and_paging(self):
+        drive = FakeDriveService()
+        files = drive.files()
+        for i in range(5):
+            files.create(body={'name': f"{i}.md", 'parents': ['a' if i % 2 else 'b'],
+                               'appProperties': {'discord_message_id': str(i)}}).execute()
+        files.create(body={'name': 'x', 'mimeType': 'application/vnd.google-apps.folder', 'parents': ['a']}).execute()
+
+        query = "'a' in parents and appProperties has { key='discord_message_id' and value='3' } and trashed = false"
+        self.assertEqual([f['name'] for f in files.list(q=query, fields="files(id, name)").execute()['files']], ["3.md"])
+
+        query = "('a' in parents or 'b' in parents) and mimeType != 'application/vnd.google-apps.folder'"
+        first = files.list(q=query, fields="nextPageToken, files(id, appProperties)", pageSize=3).execute()
+        second = files.list(q=query, fields="nextPageToken, files(id, appProperties)", pageSize=3,
+                            pageToken=first['nextPageToken']).execute()
+        ids = [f['appProperties']['discord_message_id'] for f in first['files'] + second['files']]
+        self.assertEqual(sorted(ids), ["0", "1", "2", "3", "4"])
+        self.assertNotIn('nextPageToken', second)
+        self.assertEqual(set(first['files'][0]), {'id', 'appProperties'})
+
+class TestOfflinePipeline(unittest.TestCase):
+
+    def test_main_end_to_end(self):
+        result = run_benchmark(5)
+
+        self.assertEqual(result["processed"], 5)
+        drive = result["drive"]
+        summaries = [f for f in drive.files_by_id.values() if 'discord_message_id' in f['appProperties']]
+        self.assertEqual(len(summaries), 5)
+        self.assertEqual(len(drive.find(discord_message_id=summaries[0]['appProperties']['discord_message_id'])), 1)
+        self.assertEqual(len(result["discord"].webhook_posts), 1)
+        counters = result["summary"]["counters"]
+        self.assertEqual(counters["api.gemini.generate_content"], 5)
+        self.assertEqual(counters["api.discord.get_messages"], 1)
+        self.assertIn("stage.summarize", result["summary"]["timings"])
+
+    def test_errors_are_isolated(self):
+        result = run_benchmark(20, gemini_error_rate=0.2, discord_error_rate=0.3, seed=3)
+
+        # Gemini errors are retried (or end in an error summary); nothing is lost
+        self.assertEqual(result["processed"], 20)
+        self.assertGreater(result["summary"]["counters"]["api.discord.get_messages"], 1)
+
+    def test_adapts_to_drive_quota(self):
+        result = run_benchmark(30, drive_latency_ms=10, drive_quota=2, seed=1)
+
+        # 429s are retried, and the Drive limiter backs off
+        self.assertEqual(result["processed"], 30)
+        self.assertGreater(result["drive"].throttled, 0)
+        self.assertGreater(result["summary"]["counters"]["limiter.drive.decreases"], 0)
+
+if __name__ == '__main__':
+    unittest.main()
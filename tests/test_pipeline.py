@@ -0,0 +1,92 @@
+import unittest
+import os
+import sys
+import threading
+import time
+
+# Add project root to path to import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.pipeline import Pipeline, Stage, SkipItem, StageTimeoutError
+
+class TestPipeline(unittest.TestCase):
+
+    def test_stages_overlap_across_items(self):
+        second_item_started = threading.Event()
+        overlapped = []
+
+        def lookup(n):
+            if n == 1:
+                second_item_started.set()
+            return n
+
+        def generate(n):
+            if n == 0:
+                # Item 1 reaches the first stage while item 0 is still here
+                overlapped.append(second_item_started.wait(timeout=1))
+            return n * 10
+
+        pipeline = Pipeline([
+            Stage("lookup", lookup, inputs=['n'], outputs=['n']),
+            Stage("generate", generate, inputs=['n'], outputs=['result'], concurrency=2),
+        ], inputs=['n'])
+        results = pipeline.run([{'n': 0}, {'n': 1}])
+
+        self.assertEqual(overlapped, [True])
+        self.assertEqual([r.values['result'] for r in results], [0, 10])
+
+    def test_concurrency_limit_per_stage(self):
+        lock = threading.Lock()
+        state = {"active": 0, "peak": 0}
+
+        def slow(n):
+            with lock:
+                state["active"] += 1
+                state["peak"] = max(state["peak"], state["active"])
+            time.sleep(0.02)
+            with lock:
+                state["active"] -= 1
+            return n
+
+        pipeline = Pipeline([Stage("slow", slow, inputs=['n'], outputs=['out'], concurrency=3)], inputs=['n'])
+        results = pipeline.run([{'n': i} for i in range(10)])
+
+        self.assertEqual(state["peak"], 3)
+        self.assertEqual([r.values['out'] for r in results], list(range(10)))
+
+    def test_errors_skips_and_timeouts_are_per_item(self):
+        def work(n):
+            if n == 1:
+                raise RuntimeError("boom")
+            if n == 2:
+                raise SkipItem("nothing to do")
+            if n == 3:
+                time.sleep(0.5)
+            return n
+
+        done = []
+        pipeline = Pipeline([
+            Stage("work", work, inputs=['n'], outputs=['out'], concurrency=4, timeout=0.1),
+            Stage("finish", lambda out: out + 100, inputs=['out'], outputs=['final']),
+        ], inputs=['n'])
+        results = pipeline.run([{'n': i} for i in range(5)], on_item_done=lambda r: done.append(r.index))
+
+        self.assertEqual([r.status for r in results], ['done', 'failed', 'skipped', 'failed', 'done'])
+        self.assertIsInstance(results[3].error, StageTimeoutError)
+        self.assertEqual(results[1].stage, "work")
+        self.assertEqual(results[4].values['final'], 104)
+        self.assertEqual(sorted(done), list(range(5)))
+
+    def test_process_runs_inline(self):
+        pipeline = Pipeline([
+            Stage("double", lambda n: n * 2, inputs=['n'], outputs=['n2']),
+            Stage("split", lambda n, n2: (n, n2), inputs=['n', 'n2'], outputs=['a', 'b']),
+        ], inputs=['n'])
+        self.assertEqual(pipeline.process({'n': 3}), {'n': 3, 'n2': 6, 'a': 3, 'b': 6})
+
+    def test_rejects_missing_inputs(self):
+        with self.assertRaises(ValueError):
+            Pipeline([Stage("write", lambda content: content, inputs=['content'], outputs=[])], inputs=['post'])
+
+if __name__ == '__main__':
+    unittest.main()
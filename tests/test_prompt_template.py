@@ -0,0 +1,93 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+import os
+import sys
+import asyncio
+import threading
+from types import SimpleNamespace
+
+# Add project root to path to import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.prompt_template import PromptTemplate, get_prompt_template, PLACEHOLDER
+from src.summary_cache import SummaryCache
+from src.nodes.node3_gemini import Node3_Gemini
+
+class TestPromptTemplate(unittest.TestCase):
+
+    def test_prefix_is_identical_for_every_post(self):
+        template = PromptTemplate(f"Explain {PLACEHOLDER}.\n#{PLACEHOLDER}")
+
+        first = template.build("post one")
+        second = template.build("a completely different post")
+
+        self.assertTrue(first.startswith(template.prefix))
+        self.assertTrue(second.startswith(template.prefix))
+        self.assertTrue(first.endswith("post one"))
+        self.assertNotIn(PLACEHOLDER, template.prefix)
+        self.assertNotIn("post one", template.prefix)
+
+    def test_template_is_loaded_once(self):
+        self.assertIs(get_prompt_template(), get_prompt_template())
+
+    def test_version_changes_with_template(self):
+        self.assertNotEqual(PromptTemplate("a").version, PromptTemplate("b").version)
+
+class TestNode3PromptRequests(unittest.TestCase):
+
+    def setUp(self):
+        patcher = patch('src.nodes.node3_gemini.utils.get_gemini_client')
+        self.mock_client = MagicMock()
+        patcher.start().return_value = self.mock_client
+        self.addCleanup(patcher.stop)
+        response = MagicMock(text="# Summary")
+        response.usage_metadata.prompt_token_count = 1200
+        response.usage_metadata.cached_content_token_count = 1000
+        response.usage_metadata.total_token_count = 2000
+        self.mock_client.models.generate_content.return_value = response
+
+    def test_sends_static_prefix_then_post(self):
+        node = Node3_Gemini(cache=SummaryCache(""))
+        node.generate_summary({"text": "post body"})
+
+        contents = self.mock_client.models.generate_content.call_args.kwargs['contents']
+        self.assertTrue(contents.startswith(node.template.prefix))
+        self.assertTrue(contents.endswith("post body"))
+        self.assertEqual(node.token_usage, {"calls": 1, "prompt_tokens": 1200, "cached_tokens": 1000})
+
+    def test_explicit_cache_sends_only_suffix(self):
+        self.mock_client.caches.create.return_value.name = "cachedContents/abc"
+        with patch.dict(os.environ, {"GEMINI_EXPLICIT_CACHE": "true"}):
+            node = Node3_Gemini(cache=SummaryCache(""))
+        node.generate_summary({"text": "first"})
+        node.generate_summary({"text": "second"})
+
+        self.mock_client.caches.create.assert_called_once()
+        kwargs = self.mock_client.models.generate_content.call_args.kwargs
+        self.assertEqual(kwargs['config'].cached_content, "cachedContents/abc")
+        self.assertNotIn(node.template.prefix, kwargs['contents'])
+        self.assertTrue(kwargs['contents'].endswith("second"))
+        # The cache carries the tool settings an uncached request would send
+        self.assertEqual(self.mock_client.caches.create.call_args.kwargs['config'].tools, [])
+        self.assertIsNone(kwargs['config'].tools)
+
+    def test_async_explicit_cache_is_created_off_the_event_loop(self):
+        threads = []
+
+        def create(**kwargs):
+            threads.append(threading.current_thread())
+            return SimpleNamespace(name="cachedContents/abc")
+        self.mock_client.caches.create.side_effect = create
+        self.mock_client.aio.models.generate_content = AsyncMock(
+            return_value=self.mock_client.models.generate_content.return_value)
+        with patch.dict(os.environ, {"GEMINI_EXPLICIT_CACHE": "true"}):
+            node = Node3_Gemini(cache=SummaryCache(""))
+
+        summary = asyncio.run(node.generate_summary_async({"text": "post body"}))
+
+        self.assertEqual(summary, "# Summary")
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.main_thread())
+
+if __name__ == '__main__':
+    unittest.main()
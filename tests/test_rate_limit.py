@@ -0,0 +1,201 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# Add project root to path to import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from google.genai import errors as genai_errors
+import httplib2
+import requests
+from googleapiclient.errors import HttpError
+from src.rate_limit import (TokenBucket, RateLimiter, AdaptiveConcurrencyLimiter, backoff_delay,
+                            parse_retry_after, throttle_info)
+from src.summary_cache import SummaryCache
+from src.nodes.node3_gemini import Node3_Gemini, SummaryGenerationError
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_burst_then_wait(self):
+        bucket = TokenBucket(rate_per_minute=60, capacity=2)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertEqual(bucket.reserve(), 0)
+        # Third request must wait about one second at 1 token/second
+        self.assertAlmostEqual(bucket.reserve(), 1.0, delta=0.05)
+
+    def test_adjust_returns_unused_tokens(self):
+        bucket = TokenBucket(rate_per_minute=60, capacity=100)
+        bucket.reserve(100)
+        bucket.adjust(-50)
+        self.assertEqual(bucket.reserve(50), 0)
+
+    def test_limiter_uses_slowest_bucket(self):
+        limiter = RateLimiter(requests_per_minute=600, tokens_per_minute=60)
+        self.assertEqual(limiter._reserve(60), 0)
+        self.assertAlmostEqual(limiter._reserve(30), 30.0, delta=0.1)
+
+    def test_backoff_is_bounded(self):
+        for attempt in range(10):
+            self.assertLessEqual(backoff_delay(attempt, base_seconds=1, max_seconds=8), 8)
+
+class TestAdaptiveConcurrencyLimiter(unittest.TestCase):
+
+    def test_grows_while_calls_succeed(self):
+        limiter = AdaptiveConcurrencyLimiter("test", initial_limit=2, max_limit=4)
+        for _ in range(10):
+            with limiter.slot():
+                pass
+        self.assertEqual(limiter.limit, 4)
+        self.assertEqual(limiter.in_flight, 0)
+
+    def test_throttled_window_backs_off_once(self):
+        limiter = AdaptiveConcurrencyLimiter("test", initial_limit=8, max_limit=8)
+        slots = [limiter.acquire() for _ in range(3)]
+        for slot in slots:
+            slot.throttle()
+            limiter.release(slot)
+        # Three 429s from the same window count as one congestion signal
+        self.assertEqual(limiter.limit, 4)
+
+        with limiter.slot() as slot:
+            slot.throttle()
+        self.assertEqual(limiter.limit, 2)
+
+    def test_retry_after_pauses_new_calls(self):
+        limiter = AdaptiveConcurrencyLimiter("test")
+        with self.assertRaises(HttpError):
+            with limiter.slot():
+                raise HttpError(httplib2.Response({'status': 429, 'retry-after': '0.2'}), b'quota')
+
+        start = time.monotonic()
+        with limiter.slot():
+            pass
+        self.assertGreaterEqual(time.monotonic() - start, 0.15)
+
+    def test_bounds_concurrent_calls(self):
+        limiter = AdaptiveConcurrencyLimiter("test", initial_limit=2, max_limit=2)
+        lock = threading.Lock()
+        state = {"active": 0, "peak": 0}
+
+        def work():
+            with limiter.slot():
+                with lock:
+                    state["active"] += 1
+                    state["peak"] = max(state["peak"], state["active"])
+                time.sleep(0.02)
+                with lock:
+                    state["active"] -= 1
+
+        threads = [threading.Thread(target=work) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(state["peak"], 2)
+
+    def test_rising_latency_backs_off(self):
+        limiter = AdaptiveConcurrencyLimiter("test", initial_limit=8, max_limit=8, latency_tolerance=2.0)
+        for latency in [0.01] * 5 + [0.2] * 2:
+            slot = limiter.acquire()
+            slot.started_at = time.monotonic() - latency
+            limiter.release(slot)
+        self.assertEqual(limiter.limit, 4)
+
+    def test_other_errors_keep_the_limit(self):
+        limiter = AdaptiveConcurrencyLimiter("test", initial_limit=3)
+        with self.assertRaises(ValueError):
+            with limiter.slot():
+                raise ValueError("bad input")
+        self.assertEqual(limiter.limit, 3)
+
+    def test_call_retries_throttled_errors_only(self):
+        limiter = AdaptiveConcurrencyLimiter("test")
+        throttled = HttpError(httplib2.Response({'status': 503, 'retry-after': '0'}), b'busy')
+        func = MagicMock(side_effect=[throttled, "ok"])
+        self.assertEqual(limiter.call(func), "ok")
+        self.assertEqual(func.call_count, 2)
+
+        missing = MagicMock(side_effect=HttpError(httplib2.Response({'status': 404}), b'not found'))
+        with self.assertRaises(HttpError):
+            limiter.call(missing)
+        self.assertEqual(missing.call_count, 1)
+
+    def test_async_slot(self):
+        limiter = AdaptiveConcurrencyLimiter("test", initial_limit=1, max_limit=1)
+
+        async def run():
+            async def call(n):
+                async with limiter.slot_async():
+                    await asyncio.sleep(0.01)
+                    return n
+            return await asyncio.gather(*(call(n) for n in range(3)))
+
+        self.assertEqual(asyncio.run(run()), [0, 1, 2])
+
+    def test_throttle_info(self):
+        drive_quota = HttpError(httplib2.Response({'status': 403}),
+                                b'{"error": {"errors": [{"reason": "userRateLimitExceeded"}]}}')
+        self.assertEqual(throttle_info(drive_quota), (True, None))
+        self.assertEqual(throttle_info(HttpError(httplib2.Response({'status': 403}), b'forbidden')), (False, None))
+        self.assertEqual(throttle_info(genai_errors.ServerError(503, {"error": {"message": "busy"}}))[0], True)
+
+        response = requests.Response()
+        response.status_code = 429
+        response.headers["Retry-After"] = "7"
+        self.assertEqual(throttle_info(requests.HTTPError(response=response)), (True, 7.0))
+        self.assertEqual(throttle_info(ValueError("x")), (False, None))
+
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after("1.5"), 1.5)
+        self.assertEqual(parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"), 0.0)
+        self.assertIsNone(parse_retry_after("soon"))
+
+class TestNode3Retries(unittest.TestCase):
+
+    def setUp(self):
+        patcher = patch('src.nodes.node3_gemini.utils.get_gemini_client')
+        self.mock_client = MagicMock()
+        patcher.start().return_value = self.mock_client
+        self.addCleanup(patcher.stop)
+        backoff = patch('src.nodes.node3_gemini.backoff_delay', return_value=0)
+        backoff.start()
+        self.addCleanup(backoff.stop)
+        self.node = Node3_Gemini(cache=SummaryCache(""))
+        self.node.rate_limiter = RateLimiter(requests_per_minute=6000)
+
+    def test_retries_429_then_succeeds(self):
+        response = MagicMock(text="# Summary")
+        self.mock_client.models.generate_content.side_effect = [
+            genai_errors.ClientError(429, {"error": {"message": "quota"}}),
+            genai_errors.ServerError(503, {"error": {"message": "unavailable"}}),
+            response,
+        ]
+
+        self.assertEqual(self.node.generate_summary({"text": "post"}), "# Summary")
+        self.assertEqual(self.mock_client.models.generate_content.call_count, 3)
+
+    def test_does_not_retry_client_errors(self):
+        self.mock_client.models.generate_content.side_effect = genai_errors.ClientError(
+            400, {"error": {"message": "bad request"}})
+
+        with self.assertRaises(SummaryGenerationError):
+            self.node.generate_summary({"text": "post"})
+        self.assertEqual(self.mock_client.models.generate_content.call_count, 1)
+
+    def test_async_batch_keeps_order(self):
+        async def generate(model, contents, config):
+            await asyncio.sleep(0.01 if "first" in contents else 0)
+            return MagicMock(text="# " + ("first" if "first" in contents else "second"))
+        self.mock_client.aio.models.generate_content = AsyncMock(side_effect=generate)
+
+        summaries = asyncio.run(self.node.generate_summaries_async([{"text": "first"}, {"text": "second"}]))
+
+        self.assertEqual(summaries, ["# first", "# second"])
+
+if __name__ == '__main__':
+    unittest.main()
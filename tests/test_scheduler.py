@@ -0,0 +1,99 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import os
+import sys
+
+# Add project root to path to import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.scheduler import AdmissionScheduler, get_remaining_time_ms
+
+def make_posts(authors):
+    return [{"id": str(100 + i), "author": author} for i, author in enumerate(authors)]
+
+class TestAdmissionScheduler(unittest.TestCase):
+
+    def test_remaining_time_prefers_env_override(self):
+        context = MagicMock()
+        context.get_remaining_time_in_millis.return_value = 60000
+        with patch.dict(os.environ, {"RUN_TIME_BUDGET_MS": ""}):
+            self.assertEqual(get_remaining_time_ms(context), 60000)
+            self.assertIsNone(get_remaining_time_ms(None))
+        with patch.dict(os.environ, {"RUN_TIME_BUDGET_MS": "5000"}):
+            self.assertEqual(get_remaining_time_ms(context), 5000)
+
+    def test_admits_what_fits_in_the_budget(self):
+        # 3 rounds of 2 messages fit into 10s - 2s reserve at 2.5s per message
+        scheduler = AdmissionScheduler(10000, workers=2, stage_latencies={"stage.summarize": 2000, "stage.write": 500},
+                                       reserve_ms=2000)
+        admitted, deferred = scheduler.admit(make_posts("abcdefgh"))
+        self.assertEqual([post["id"] for post in admitted], ["100", "101", "102", "103", "104", "105"])
+        self.assertEqual([post["id"] for post in deferred], ["106", "107"])
+
+    def test_no_budget_admits_everything(self):
+        scheduler = AdmissionScheduler(None, ordering="newest")
+        admitted, deferred = scheduler.admit(make_posts("abc"))
+        self.assertEqual([post["id"] for post in admitted], ["102", "101", "100"])
+        self.assertEqual(deferred, [])
+
+    def test_budget_too_small_defers_everything(self):
+        scheduler = AdmissionScheduler(1000, stage_latencies={"stage.summarize": 5000}, reserve_ms=0)
+        admitted, deferred = scheduler.admit(make_posts("ab"))
+        self.assertEqual((len(admitted), len(deferred)), (0, 2))
+
+    def test_fair_ordering_round_robins_authors(self):
+        scheduler = AdmissionScheduler(None, ordering="fair")
+        ordered = scheduler.order(make_posts(["a", "a", "a", "b", "c", "b"]))
+        self.assertEqual([post["id"] for post in ordered], ["100", "103", "104", "101", "105", "102"])
+
+    def test_cost_comes_from_metrics_history(self):
+        history = {
+            "stage.summarize": {"runs": 3, "count": 30, "p50": 800.0, "p95": 1500.0},
+            "stage.write": {"runs": 3, "count": 30, "p50": 100.0, "p95": 500.0},
+            "node8.notify": {"runs": 3, "count": 3, "p50": 200.0, "p95": 300.0},
+            "node2.preprocess": {"runs": 3, "count": 3, "p50": 100.0, "p95": 200.0},
+            "run": {"runs": 3, "count": 3, "p50": 9000.0, "p95": 12000.0},
+        }
+        with patch('src.scheduler.metrics.summarize_history', return_value=history):
+            scheduler = AdmissionScheduler(10000, reserve_ms=1000)
+        self.assertEqual(scheduler.message_cost_ms, 2000.0)
+        # Notification and batch preprocessing run after admission
+        self.assertEqual(scheduler.reserve_ms, 1500.0)
+        # Summarize is the bottleneck: 5 x 1.5s plus one 0.5s write fit into 10s - 1.5s reserve
+        self.assertEqual(scheduler.capacity(), 5)
+
+    def test_bottleneck_stage_limits_admission(self):
+        latencies = {"stage.folder": 200, "stage.summarize": 2000, "stage.write": 500}
+        # MAX_WORKERS alone would admit 16 per 2.7s round
+        unlimited = AdmissionScheduler(10000, workers=16, stage_latencies=latencies, reserve_ms=0)
+        self.assertEqual(unlimited.capacity(), 64)
+
+        # Gemini runs only 4 at a time: 4 per 2s of summarizing after 0.7s of folder lookup and writing
+        limited = AdmissionScheduler(10000, workers=16, stage_latencies=latencies, reserve_ms=0,
+                                     stage_concurrency={"stage.folder": 2, "stage.summarize": 4})
+        self.assertEqual(limited.capacity(), 16)
+
+        # A slow folder lookup with 2 slots becomes the bottleneck instead: 2 per 1.5s after 2.5s
+        slow_folder = AdmissionScheduler(10200, workers=16, reserve_ms=0,
+                                         stage_latencies=dict(latencies, **{"stage.folder": 1500}),
+                                         stage_concurrency={"stage.folder": 2, "stage.summarize": 4})
+        self.assertEqual(slow_folder.capacity(), 10)
+
+    def test_reserves_link_resolve_deadline_without_history(self):
+        with patch('src.scheduler.metrics.summarize_history', return_value={}), \
+                patch.dict(os.environ, {"LINK_RESOLVE_DEADLINE_SECONDS": "3"}):
+            scheduler = AdmissionScheduler(10000, reserve_ms=1000, default_message_cost_ms=2000)
+        self.assertEqual(scheduler.reserve_ms, 4000.0)
+        self.assertEqual(scheduler.capacity(), 2)
+
+    def test_stage_concurrency_is_read_when_admitting(self):
+        limits = {"stage.summarize": 2}
+        scheduler = AdmissionScheduler(10000, workers=16, reserve_ms=0, default_message_cost_ms=3000,
+                                       stage_latencies={}, stage_concurrency=lambda: dict(limits))
+        self.assertEqual(scheduler.capacity(), 6)
+        # The Gemini limiter grew since the scheduler was created
+        limits["stage.summarize"] = 4
+        self.assertEqual(scheduler.capacity(), 12)
+
+if __name__ == '__main__':
+    unittest.main()
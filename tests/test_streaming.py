@@ -0,0 +1,155 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import os
+import sys
+
+# Add project root to path to import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import src.utils as utils
+from src.summary_cache import SummaryCache
+from src.rate_limit import RateLimiter, AdaptiveConcurrencyLimiter
+from src.nodes.node3_gemini import Node3_Gemini
+from src.archive_index import ArchiveIndex, content_hash
+from src.nodes.node6_content_writing import Node6_Content_Writing, MAX_STALLED_CHUNK_ATTEMPTS
+
+def make_response(status_code, headers=None, json_data=None):
+    response = MagicMock(status_code=status_code, headers=headers or {})
+    response.json.return_value = json_data
+    return response
+
+class TestPeekFirstLine(unittest.TestCase):
+
+    def test_first_line_and_replay(self):
+        chunks = ["\n# Ti", "tle\nBo", "dy", " more"]
+
+        first_line, replay = utils.peek_first_line(iter(chunks))
+
+        self.assertEqual(first_line, "# Title")
+        self.assertEqual("".join(replay), "".join(chunks))
+        self.assertEqual(utils.format_file_name(first_line), "Title.md")
+
+    def test_empty_stream(self):
+        first_line, replay = utils.peek_first_line(iter([]))
+        self.assertEqual(first_line, "")
+        self.assertEqual(list(replay), [])
+
+class TestStreamingUpload(unittest.TestCase):
+
+    @patch('src.nodes.node6_content_writing.utils.get_drive_service')
+    def test_chunks_are_forwarded_to_resumable_session(self, mock_get_service):
+        session = MagicMock()
+        session.post.return_value = make_response(200, {'Location': 'https://upload/session'})
+        session.put.side_effect = [
+            make_response(308, {'Range': 'bytes=0-3'}),
+            # Drive only stored part of the second chunk; the rest is re-sent
+            make_response(308, {'Range': 'bytes=0-5'}),
+            make_response(308, {'Range': 'bytes=0-9'}),
+            make_response(200, json_data={'id': 'file_id', 'webViewLink': 'http://link'}),
+        ]
+        archive = ArchiveIndex(path="")
+        node = Node6_Content_Writing(archive=archive)
+        node.chunk_size = 4
+        node._local.session = session
+
+        created = node.create_file_streaming({'name': 'Title.md', 'parents': ['day'],
+                                              'appProperties': {'discord_message_id': '42'}},
+                                             iter(["# Ti", "tle\n", "Body!"]))
+
+        self.assertEqual(created['id'], 'file_id')
+        ranges = [call.kwargs['headers']['Content-Range'] for call in session.put.call_args_list]
+        self.assertEqual(ranges, ["bytes 0-3/*", "bytes 4-7/*", "bytes 6-9/*", "bytes 10-12/13"])
+        sent = [call.kwargs['data'] for call in session.put.call_args_list]
+        self.assertEqual(sent[-1], b"dy!")
+        # The streamed file is indexed like a single-request one
+        self.assertEqual(archive.get('42')['content_hash'], content_hash("# Title\nBody!"))
+        self.assertEqual(archive.get('42')['web_view_link'], 'http://link')
+
+    @patch('src.nodes.node6_content_writing.utils.get_drive_service')
+    def test_missing_range_resends_without_moving_back(self, mock_get_service):
+        session = MagicMock()
+        session.post.return_value = make_response(200, {'Location': 'https://upload/session'})
+        session.put.side_effect = [
+            make_response(308, {'Range': 'bytes=0-3'}),
+            # No Range header after bytes were committed: the chunk is re-sent from the same offset
+            make_response(308),
+            make_response(308, {'Range': 'bytes=0-7'}),
+            make_response(308, {'Range': 'bytes=0-11'}),
+            make_response(200, json_data={'id': 'file_id'}),
+        ]
+        node = Node6_Content_Writing(archive=ArchiveIndex(path=""))
+        node.chunk_size = 4
+        node._local.session = session
+
+        created = node.create_file_streaming({'name': 'Title.md'}, iter(["# Title\nBody!"]))
+
+        self.assertEqual(created['id'], 'file_id')
+        ranges = [call.kwargs['headers']['Content-Range'] for call in session.put.call_args_list]
+        self.assertEqual(ranges, ["bytes 0-3/*", "bytes 4-7/*", "bytes 4-7/*", "bytes 8-11/*", "bytes 12-12/13"])
+
+    @patch('src.nodes.node6_content_writing.utils.get_drive_service')
+    def test_upload_without_progress_gives_up(self, mock_get_service):
+        session = MagicMock()
+        session.post.return_value = make_response(200, {'Location': 'https://upload/session'})
+        session.put.return_value = make_response(308)
+        node = Node6_Content_Writing(archive=ArchiveIndex(path=""))
+        node.chunk_size = 4
+        node._local.session = session
+
+        self.assertIsNone(node.create_file_streaming({'name': 'Title.md'}, iter(["# Title\nBody!"])))
+        self.assertEqual(session.put.call_count, MAX_STALLED_CHUNK_ATTEMPTS)
+
+    @patch('src.nodes.node6_content_writing.utils.get_drive_service')
+    def test_stream_failure_does_not_finalize(self, mock_get_service):
+        session = MagicMock()
+        session.post.return_value = make_response(200, {'Location': 'https://upload/session'})
+        node = Node6_Content_Writing(archive=ArchiveIndex(path=""))
+        node._local.session = session
+
+        def broken_stream():
+            yield "# Title\n"
+            raise RuntimeError("stream cut")
+
+        self.assertIsNone(node.create_file_streaming({'name': 'Title.md'}, broken_stream()))
+        session.put.assert_not_called()
+
+class TestNode3Stream(unittest.TestCase):
+
+    @patch('src.nodes.node3_gemini.utils.get_gemini_client')
+    def test_stream_yields_chunks_and_fills_cache(self, mock_get_client):
+        mock_client = MagicMock()
+        mock_get_client.return_value = mock_client
+        mock_client.models.generate_content_stream.return_value = iter([
+            MagicMock(text="# Title\n"), MagicMock(text="Body"), MagicMock(text=None)
+        ])
+        node = Node3_Gemini(cache=SummaryCache(""))
+        node.rate_limiter = RateLimiter(requests_per_minute=6000)
+
+        chunks = list(node.generate_summary_stream({"text": "post"}))
+        cached = list(node.generate_summary_stream({"text": "post"}))
+
+        self.assertEqual(chunks, ["# Title\n", "Body"])
+        self.assertEqual(cached, ["# Title\nBody"])
+        mock_client.models.generate_content_stream.assert_called_once()
+
+    @patch('src.nodes.node3_gemini.utils.get_gemini_client')
+    def test_closing_the_replay_releases_the_concurrency_slot(self, mock_get_client):
+        mock_client = MagicMock()
+        mock_get_client.return_value = mock_client
+        mock_client.models.generate_content_stream.return_value = iter([
+            MagicMock(text="# Title\n"), MagicMock(text="Body")
+        ])
+        node = Node3_Gemini(cache=SummaryCache(""))
+        node.rate_limiter = RateLimiter(requests_per_minute=6000)
+        node.concurrency = AdaptiveConcurrencyLimiter('gemini')
+
+        first_line, replay = utils.peek_first_line(node.generate_summary_stream({"text": "post"}))
+        self.assertEqual(first_line, "# Title")
+        self.assertEqual(node.concurrency.in_flight, 1)
+
+        # e.g. the upload failed before draining the stream
+        replay.close()
+        self.assertEqual(node.concurrency.in_flight, 0)
+
+if __name__ == '__main__':
+    unittest.main()
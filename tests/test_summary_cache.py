@@ -0,0 +1,61 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import os
+import sys
+import tempfile
+
+# Add project root to path to import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.summary_cache import SummaryCache
+from src.nodes.node3_gemini import Node3_Gemini
+
+class TestSummaryCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.path = os.path.join(self.tmp_dir.name, "summary_cache.sqlite3")
+
+    def test_key_ignores_whitespace_differences(self):
+        key1 = SummaryCache.make_key("Hello   world\n", "model", "1")
+        key2 = SummaryCache.make_key(" Hello world", "model", "1")
+        self.assertEqual(key1, key2)
+        self.assertNotEqual(key1, SummaryCache.make_key("Hello world", "other-model", "1"))
+        self.assertNotEqual(key1, SummaryCache.make_key("Hello world", "model", "2"))
+
+    def test_entries_persist_across_instances(self):
+        SummaryCache(self.path).set("key", "# Summary")
+        self.assertEqual(SummaryCache(self.path).get("key"), "# Summary")
+
+    def test_expired_entries_are_ignored(self):
+        cache = SummaryCache(self.path, ttl_seconds=-1)
+        cache.set("key", "# Summary")
+        self.assertIsNone(cache.get("key"))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = SummaryCache(self.path, max_entries=2)
+        cache.set("a", "A")
+        cache.set("b", "B")
+        cache.get("a")
+        cache.set("c", "C")
+
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "A")
+
+    @patch('src.nodes.node3_gemini.utils.get_gemini_client')
+    def test_node3_cache_hit_skips_api_call(self, mock_get_client):
+        mock_client = MagicMock()
+        mock_get_client.return_value = mock_client
+        mock_client.models.generate_content.return_value.text = "# Summary\nBody"
+
+        node = Node3_Gemini(cache=SummaryCache(self.path))
+        first = node.generate_summary({"text": "Same post"})
+        second = node.generate_summary({"text": "Same  post "})
+
+        self.assertEqual(first, second)
+        mock_client.models.generate_content.assert_called_once()
+
+if __name__ == '__main__':
+    unittest.main()